@@ -7,4 +7,178 @@ SPDX-License-Identifier: GPL-2.0
 
 """
 
-# from intelligence import AIDefaultAI
+import datetime
+from random import Random
+
+from common import Debug, StrMixin
+from util import elapsedSince
+from tile import Tile, elements
+from intelligence import AIDefaultAI
+
+
+class RolloutStats(StrMixin):
+
+    """collects the results of the random wall completions for one discard candidate"""
+
+    def __init__(self, candidate):
+        self.candidate = candidate
+        self.samples = 0
+        self.wins = 0
+        self.scoreSum = 0
+        self.maxScore = 0
+
+    @property
+    def winRate(self):
+        """estimated probability to win after this discard"""
+        return self.wins / self.samples if self.samples else 0.0
+
+    @property
+    def expectation(self):
+        """estimated score, counting lost rollouts as 0"""
+        return self.scoreSum / self.samples if self.samples else 0.0
+
+    def add(self, score):
+        """score is None for a rollout not ending in Mah Jongg"""
+        self.samples += 1
+        if score is not None:
+            self.wins += 1
+            self.scoreSum += score
+            self.maxScore = max(self.maxScore, score)
+
+    def __str__(self):
+        return '%s: %d/%d won, ev=%.2f' % (
+            self.candidate.tile, self.wins, self.samples, self.expectation)
+
+
+class AIMonteCarlo(AIDefaultAI):
+
+    """the default weighting plus a lookahead: for the best discard
+    candidates, complete the wall randomly out of the tiles we have not seen yet
+    and measure how often and how high we would win. Use with --ai=MonteCarlo"""
+
+    # the budget per decision. The samples are run in batches, round robin over
+    # the candidates. Running out of time never leaves a candidate unsampled
+    maxCandidates = 4
+    maxSamples = 48
+    batchSize = 8
+    timeBudget = 0.25  # seconds
+    horizon = 8  # we look at most this many own draws ahead
+    evFactor = 1.0  # how much the expected score changes candidate.keep
+
+    def __init__(self, player=None):
+        AIDefaultAI.__init__(self, player)
+        self.__successors = {}
+        self.__policyDiscards = {}
+
+    @staticmethod
+    def alternativeFilter(aiInstance, candidates):
+        """run the rollouts after the standard filters have weighted
+        the candidates and apply the expected score to them"""
+        hand = candidates.hand
+        if hand.lenOffset != 1 or hand.won or not aiInstance.player.mayWin:
+            return candidates
+        contenders = sorted(
+            (x for x in candidates if not x.dangerous),
+            key=lambda x: x.keep)[:aiInstance.maxCandidates]
+        if len(contenders) < 2:
+            return candidates
+        for stats in aiInstance.simulate(hand, contenders):
+            stats.candidate.keep -= stats.expectation * aiInstance.evFactor
+        return candidates
+
+    def unseenTiles(self, hand):
+        """all tiles which might still come out of the wall, each of them
+        as often as it might still appear"""
+        result = []
+        for tile in sorted(elements.occurrence):
+            if not tile.isBonus:
+                result.extend([tile.concealed] * max(0, self.player.tileAvailable(tile, hand)))
+        return result
+
+    def simulate(self, hand, contenders):
+        """returns a list of RolloutStats, one per contender. Candidates
+        which cannot reach the current best anymore are dropped early"""
+        game = self.player.game
+        rnd = Random(game.seed * 1000 + len(game.moves))
+        pool = self.unseenTiles(hand)
+        draws = min(self.horizon, len(game.wall.living) // 4 if game.wall.living else 0, len(pool))
+        allStats = [RolloutStats(x) for x in contenders]
+        if not draws:
+            return allStats
+        startHands = {id(x): hand - x.candidate.tile.concealed for x in allStats}
+        active = allStats[:]
+        start = datetime.datetime.now()
+        outOfTime = False
+        while active and not outOfTime:
+            for stats in active:
+                startHand = startHands[id(stats)]
+                for _ in range(self.batchSize):
+                    # a single rollout is cheap, a whole round of batches is not
+                    if stats.samples and elapsedSince(start) > self.timeBudget:
+                        outOfTime = True
+                        break
+                    stats.add(self.rollout(startHand, rnd.sample(pool, draws)))
+            active = self.__cutOff([x for x in active if x.samples < self.maxSamples])
+        if Debug.robotAI:
+            game.debug('%s: %.3f seconds for %s' % (
+                self.name(), elapsedSince(start), ', '.join(str(x) for x in allStats)))
+        return allStats
+
+    @staticmethod
+    def __cutOff(active):
+        """early cut-off: drop candidates which cannot win against the best
+        one even if the sampling error is as large as it might be"""
+        if len(active) < 2:
+            return active
+        scale = max(x.maxScore for x in active)
+        if not scale:
+            # nobody ever won, nothing to distinguish
+            return active
+
+        def margin(stats):
+            """a crude bound for the sampling error"""
+            return scale / stats.samples ** 0.5
+        best = max(x.expectation - margin(x) for x in active)
+        return [x for x in active if x.expectation + margin(x) >= best]
+
+    def rollout(self, hand, draws):
+        """play draws with hand, discarding by a cheap policy. Return the score
+        if this ends with Mah Jongg, None otherwise"""
+        for tile in draws:
+            key = (hand.string, tile)
+            if key not in self.__successors:
+                self.__successors[key] = hand + tile
+            fullHand = self.__successors[key]
+            if fullHand.won:
+                return fullHand.total()
+            hand = fullHand - self.policyDiscard(fullHand)
+        return None
+
+    def policyDiscard(self, hand):
+        """discard the concealed tile with the fewest relatives. This is much
+        cheaper than the full weighting and good enough for rollouts"""
+        if hand.string not in self.__policyDiscards:
+            tiles = hand.tilesInHand
+
+            def usefulness(tile):
+                """same tiles count most, neighbours in a suit less"""
+                result = 3 * (tiles.count(tile) - 1)
+                if tile.lowerGroup in Tile.colors:
+                    for distance, weight in ((1, 2), (2, 1)):
+                        for value in (tile.value - distance, tile.value + distance):
+                            if 1 <= value <= 9:
+                                result += weight * bool(tiles.count(Tile(tile.group, value)))
+                return result
+            lowest = min(usefulness(x) for x in set(tiles))
+            choices = sorted(x for x in set(tiles) if usefulness(x) == lowest)
+            if hand.lastTile in choices:
+                result = hand.lastTile
+            else:
+                result = choices[0]
+            self.__policyDiscards[hand.string] = result
+        return self.__policyDiscards[hand.string]
+
+    def clearCache(self):
+        """forget the memoized rollout steps"""
+        self.__successors.clear()
+        self.__policyDiscards.clear()
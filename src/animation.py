@@ -9,6 +9,7 @@ SPDX-License-Identifier: GPL-2.0
 
 import functools
 import types
+from collections import OrderedDict
 
 from twisted.internet.defer import Deferred, succeed, fail
 
@@ -16,7 +17,7 @@ from qt import QPropertyAnimation, QParallelAnimationGroup, \
     QAbstractAnimation, QEasingCurve
 from qt import Property, QGraphicsObject, QGraphicsItem
 
-from common import Internal, Debug, isAlive, StrMixin
+from common import Internal, Options, Debug, isAlive, StrMixin
 from log import logDebug, logException, id4
 
 
@@ -159,6 +160,7 @@ class ParallelAnimationGroup(QParallelAnimationGroup, StrMixin):
         self.debug = any(x.debug for x in self.animations)
         self.debug |= 'G{}g'.format(id4(self)) in Debug.animation
         self.doAfter = list()
+        self.started = False
         if ParallelAnimationGroup.current:
             if self.debug or ParallelAnimationGroup.current.debug:
                 logDebug('Chaining Animation group G%s to G%s' %
@@ -180,6 +182,24 @@ class ParallelAnimationGroup(QParallelAnimationGroup, StrMixin):
         for group in ParallelAnimationGroup.running:
             if isAlive(group):
                 group.clear()
+        LayoutScheduler.cancelAll()
+
+    def canMerge(self, animations):
+        """True if this group has not yet started and does not
+        already animate the same properties"""
+        if self.started or not isAlive(self):
+            return False
+        busy = {(x.targetObject(), x.pName()) for x in self.animations}
+        return not any((x.targetObject(), x.pName()) in busy for x in animations)
+
+    def merge(self, animations):
+        """let this group also execute animations"""
+        assert not self.started
+        if self.debug or any(x.debug for x in animations):
+            logDebug('Merging %s into %s' % (
+                ','.join('A%s' % id4(x) for x in animations), self))
+        self.animations.extend(animations)
+        return self.deferred
 
     def showState(self, newState, oldState):
         """override Qt method"""
@@ -205,6 +225,7 @@ class ParallelAnimationGroup(QParallelAnimationGroup, StrMixin):
         if not isAlive(self):
             return fail()
         assert self.state() != QAbstractAnimation.Running
+        self.started = True
         for animation in self.animations:
             graphicsObject = animation.targetObject()
             if not isAlive(animation) or not isAlive(graphicsObject):
@@ -246,6 +267,10 @@ class ParallelAnimationGroup(QParallelAnimationGroup, StrMixin):
             if perSecond < 50:
                 logDebug('%d steps for %d animations, %.1f/sec' %
                          (self.steps, len(self.children()), perSecond))
+        if Internal.sceneStats:
+            Internal.sceneStats.count('animationGroups')
+            Internal.sceneStats.count('animations', len(self.animations))
+            Internal.sceneStats.count('animationSteps', self.steps)
         # if we have a deferred, callback now
         assert self.deferred
         if self.debug:
@@ -443,16 +468,104 @@ def afterQueuedAnimations(doAfter):
     return doAfterQueuedAnimations
 
 
+class LayoutScheduler:
+
+    """Boards do not rearrange their tiles immediately for every change.
+    They register their layout method here, and all changes to a board
+    until the next frame result in only one layout pass. Pending layout
+    passes are executed by animate(), so their animations join the same
+    animation group, or when the board is needed before that, see flush().
+
+    Options.layoutsPerFrame limits the layout passes per frame, the
+    remaining ones are done in the next frame."""
+
+    pending = OrderedDict()  # board: (layout, animationSpeed)
+    nextFrame = None
+
+    @classmethod
+    def schedule(cls, board, layout):
+        """layout() will be called once, at the latest in the next frame"""
+        if board in cls.pending:
+            if Internal.sceneStats:
+                Internal.sceneStats.count('coalescedLayouts')
+            del cls.pending[board]
+        cls.pending[board] = (layout, Internal.Preferences.animationSpeed)
+        cls.__wakeup()
+
+    @classmethod
+    def __wakeup(cls):
+        """make sure the pending layouts are done in the next frame"""
+        if cls.nextFrame is None and Internal.reactor:
+            cls.nextFrame = Internal.reactor.callLater(0, cls.__frame)
+
+    @classmethod
+    def __frame(cls):
+        """the event loop is idle"""
+        cls.nextFrame = None
+        if cls.pending:
+            animate()
+
+    @classmethod
+    def __layout(cls, board, layout, speed):
+        """with the animation speed which was valid when the change was made"""
+        if not isAlive(board):
+            return
+        prevSpeed = Internal.Preferences.animationSpeed
+        Internal.Preferences.animationSpeed = speed
+        try:
+            layout()
+        finally:
+            Internal.Preferences.animationSpeed = prevSpeed
+
+    @classmethod
+    def flush(cls, board):
+        """board is needed now: do its pending layout"""
+        if board in cls.pending:
+            cls.__layout(board, *cls.pending.pop(board))
+
+    @classmethod
+    def runFrame(cls):
+        """do pending layouts, at most Options.layoutsPerFrame"""
+        done = 0
+        while cls.pending and (not Options.layoutsPerFrame or done < Options.layoutsPerFrame):
+            board, (layout, speed) = cls.pending.popitem(last=False)
+            cls.__layout(board, layout, speed)
+            done += 1
+        if cls.pending:
+            cls.__wakeup()
+
+    @classmethod
+    def forget(cls, board):
+        """board will not need its pending layout anymore"""
+        cls.pending.pop(board, None)
+
+    @classmethod
+    def cancelAll(cls):
+        """forget all pending layouts"""
+        cls.pending.clear()
+        if cls.nextFrame is not None:
+            if cls.nextFrame.active():
+                cls.nextFrame.cancel()
+            cls.nextFrame = None
+
+
 def animate():
     """now run all prepared animations. Returns a Deferred
         so callers can attach callbacks to be executed when
         animation is over.
+        If the last animation group waits for its predecessor,
+        the new animations join it.
     """
+    if LayoutScheduler.pending:
+        LayoutScheduler.runFrame()
     if Animation.nextAnimations:
         Animation.removeImmediateAnimations()
         animations = Animation.nextAnimations
         if animations:
             Animation.nextAnimations = []
+            current = ParallelAnimationGroup.current
+            if current and current.canMerge(animations):
+                return current.merge(animations)
             return ParallelAnimationGroup(animations).deferred
     elif ParallelAnimationGroup.current:
         return ParallelAnimationGroup.current.deferred
@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2010-2016 Wolfgang Rohdewald <wolfgang@rohdewald.de>
+
+SPDX-License-Identifier: GPL-2.0
+
+Play sounds within our own process instead of starting ogg123 for
+every single one.
+
+An ogg file is decoded only once into a wav file in the cache directory.
+This happens in a thread, so the reactor never waits for ogg123. The
+decoded samples of the most recently used files are kept in memory.
+AudioEngine hands them to a sink. The null sink only gets file names. When a human plays, clips are queued
+and never overlap. In demo mode the game does not wait for voices, so
+a new clip is mixed into the one being played. Files the engine cannot
+read are handed to a fallback which plays them with ogg123.
+"""
+
+import os
+import wave
+import warnings
+import subprocess
+from collections import OrderedDict, deque
+from hashlib import md5
+
+from twisted.internet.defer import Deferred, succeed
+from twisted.internet.threads import deferToThread
+
+from common import Debug, Internal, StrMixin, cacheDir
+from log import logDebug, logError
+
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore', DeprecationWarning)
+    try:
+        import audioop
+    except ImportError:
+        # gone since python 3.13. Then clips are queued instead of mixed
+        audioop = None
+
+
+class Samples(StrMixin):
+
+    """the decoded PCM data of a sound file"""
+
+    def __init__(self, name, data, rate, channels, width):
+        self.name = name
+        self.data = data
+        self.rate = rate
+        self.channels = channels
+        self.width = width
+
+    @property
+    def frameSize(self):
+        """bytes per frame"""
+        return self.channels * self.width
+
+    @property
+    def duration(self):
+        """in seconds"""
+        return len(self.data) / (self.rate * self.frameSize)
+
+    def sameFormat(self, other):
+        """can we mix those two?"""
+        return (self.rate, self.channels, self.width) == (other.rate, other.channels, other.width)
+
+    def after(self, seconds):
+        """the part after seconds"""
+        offset = int(seconds * self.rate) * self.frameSize
+        return Samples(self.name, self.data[offset:], self.rate, self.channels, self.width)
+
+    def mixableWith(self, other):
+        """can we mix those two? 8 bit wav samples are unsigned,
+        audioop wants signed ones"""
+        return audioop is not None and self.sameFormat(other) and self.width == 2
+
+    def mixedWith(self, other):
+        """both played at the same time. audioop does this in C, so
+        the reactor does not wait for it"""
+        assert self.mixableWith(other)
+        longer, shorter = sorted((self.data, other.data), key=len, reverse=True)
+        shorter += bytes(len(longer) - len(shorter))
+        return Samples(
+            '{}+{}'.format(self.name, other.name), audioop.add(longer, shorter, self.width),
+            self.rate, self.channels, self.width)
+
+    @staticmethod
+    def fromWav(name, wavName):
+        """read a wav file"""
+        with wave.open(wavName, 'rb') as wavFile:
+            return Samples(
+                name, wavFile.readframes(wavFile.getnframes()),
+                wavFile.getframerate(), wavFile.getnchannels(), wavFile.getsampwidth())
+
+    def __str__(self):
+        return '{} {:.2f}s'.format(
+            '+'.join(os.path.basename(x) for x in self.name.split('+')), self.duration)
+
+
+class SampleCache:
+
+    """the decoded samples of the most recently used sound files.
+    Decoding is done in a thread with the ogg binary into a wav file
+    in the cache directory, so every file is only decoded once"""
+
+    maxBytes = 16 * 1024 * 1024
+    inThread = staticmethod(deferToThread)  # tests may replace this with maybeDeferred
+
+    def __init__(self, oggBinary, maxBytes=None):
+        self.oggBinary = oggBinary
+        if maxBytes is not None:
+            self.maxBytes = maxBytes
+        self.__samples = OrderedDict()
+        self.__failed = set()
+        self.__loading = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.__samples)
+
+    @staticmethod
+    def wavName(oggName):
+        """where we keep the decoded file"""
+        digest = md5(os.path.abspath(oggName).encode()).hexdigest()
+        return os.path.join(cacheDir(), 'wav', digest + '.wav')
+
+    def decode(self, oggName):
+        """returns the name of the wav file or None"""
+        if not self.oggBinary:
+            return None
+        wavName = self.wavName(oggName)
+        if os.path.exists(wavName) and os.path.getmtime(wavName) >= os.path.getmtime(oggName):
+            return wavName
+        os.makedirs(os.path.dirname(wavName), exist_ok=True)
+        tmpName = wavName + '.tmp'
+        args = [self.oggBinary, '-q', '-d', 'wav', '-f', tmpName, oggName]
+        if subprocess.call(args) or not os.path.exists(tmpName):
+            return None
+        os.replace(tmpName, wavName)
+        if Debug.sound:
+            logDebug('decoded {} to {}'.format(oggName, wavName))
+        return wavName
+
+    def read(self, fileName):
+        """decode if needed and read the samples. This blocks, so
+        load() calls it in a thread"""
+        wavName = self.decode(fileName) if fileName.endswith('.ogg') else fileName
+        if wavName is None:
+            raise OSError('not decoded')
+        return Samples.fromWav(fileName, wavName)
+
+    def failed(self, fileName):
+        """did we already fail to read fileName?"""
+        return fileName in self.__failed
+
+    def load(self, fileName):
+        """returns a Deferred firing with the samples for fileName or
+        with None if that fails. Decoding is done in a thread, never
+        in the reactor"""
+        result = self.__samples.get(fileName)
+        if result is not None:
+            self.hits += 1
+            self.__samples.move_to_end(fileName)
+            return succeed(result)
+        self.misses += 1
+        if fileName in self.__failed:
+            return succeed(None)
+        result = Deferred()
+        if fileName in self.__loading:
+            # only one thread may decode a file
+            self.__loading[fileName].append(result)
+        else:
+            self.__loading[fileName] = [result]
+            self.inThread(self.read, fileName).addCallbacks(
+                self.__loaded, self.__notLoaded,
+                callbackArgs=(fileName, ), errbackArgs=(fileName, ))
+        return result
+
+    def __loaded(self, result, fileName):
+        """back in the reactor"""
+        self.__samples[fileName] = result
+        self.size += len(result.data)
+        while self.size > self.maxBytes and len(self.__samples) > 1:
+            _, oldest = self.__samples.popitem(last=False)
+            self.size -= len(oldest.data)
+        for waiting in self.__loading.pop(fileName):
+            waiting.callback(result)
+
+    def __notLoaded(self, failure, fileName):
+        """back in the reactor"""
+        if not failure.check(OSError, EOFError, wave.Error):
+            logError('cannot play {}: {}'.format(fileName, failure.getTraceback()))
+        elif Debug.sound:
+            logDebug('cannot play {}: {}'.format(fileName, failure.getErrorMessage()))
+        self.__failed.add(fileName)
+        for waiting in self.__loading.pop(fileName):
+            waiting.callback(None)
+
+    def __str__(self):
+        return 'SampleCache: {} files, {} bytes, {} hits, {} misses'.format(
+            len(self), self.size, self.hits, self.misses)
+
+
+class NullSink:
+
+    """plays nothing but remembers the names of the files it would
+    have played. For headless runs and for tests. Needs no decoding"""
+
+    name = 'null'
+    decodes = False
+
+    def __init__(self):
+        self.played = []
+
+    @staticmethod
+    def available():
+        """always"""
+        return True
+
+    def play(self, fileName):
+        """pretend to play"""
+        self.played.append(fileName)
+
+    def stop(self):
+        """nothing to stop"""
+
+
+class QtSink:
+
+    """plays with QtMultimedia"""
+
+    name = 'qt'
+    decodes = True
+
+    def __init__(self):
+        self.__output = None
+        self.__buffer = None
+
+    @staticmethod
+    def available():
+        """is QtMultimedia installed?"""
+        try:
+            from qtpy import QtMultimedia  # pylint: disable=unused-import
+        except ImportError:
+            return False
+        return True
+
+    def play(self, samples):
+        """play, stopping what is playing now"""
+        # pylint: disable=import-outside-toplevel
+        from qtpy.QtCore import QBuffer, QByteArray, QIODevice
+        from qtpy import QtMultimedia
+        self.stop()
+        audioFormat = QtMultimedia.QAudioFormat()
+        audioFormat.setSampleRate(samples.rate)
+        audioFormat.setChannelCount(samples.channels)
+        if hasattr(QtMultimedia, 'QAudioSink'):
+            # Qt6
+            audioFormat.setSampleFormat(
+                QtMultimedia.QAudioFormat.SampleFormat.UInt8 if samples.width == 1
+                else QtMultimedia.QAudioFormat.SampleFormat.Int16)
+            self.__output = QtMultimedia.QAudioSink(audioFormat)
+        else:
+            audioFormat.setSampleSize(samples.width * 8)
+            audioFormat.setCodec('audio/pcm')
+            audioFormat.setByteOrder(QtMultimedia.QAudioFormat.LittleEndian)
+            audioFormat.setSampleType(
+                QtMultimedia.QAudioFormat.UnSignedInt if samples.width == 1
+                else QtMultimedia.QAudioFormat.SignedInt)
+            self.__output = QtMultimedia.QAudioOutput(audioFormat)
+        self.__buffer = QBuffer()
+        self.__buffer.setData(QByteArray(samples.data))
+        self.__buffer.open(QIODevice.ReadOnly)
+        self.__output.start(self.__buffer)
+
+    def stop(self):
+        """stop playing"""
+        if self.__output:
+            self.__output.stop()
+            self.__output = None
+        if self.__buffer:
+            self.__buffer.close()
+            self.__buffer = None
+
+
+class AudioEngine:
+
+    """decides when to play which clip. clock is something like the twisted
+    reactor with seconds() and callLater()"""
+
+    sinks = {x.name: x for x in (QtSink, NullSink)}
+    gap = 0.1  # seconds between queued clips
+    maxQueued = 6  # if more clips are waiting, the oldest are dropped
+
+    def __init__(self, sink, sampleCache, clock=None):
+        self.sink = sink
+        self.sampleCache = sampleCache
+        self.clock = clock or Internal.reactor
+        self.queue = deque()
+        self.loading = deque()
+        self.current = None
+        self.startedAt = None
+        self.__finishing = None
+        self.fallback = None  # called with the name of a file we cannot read
+
+    @staticmethod
+    def create(sinkName, oggBinary, clock=None):
+        """returns an AudioEngine or None if sinkName is not available"""
+        if sinkName == 'auto':
+            sinkName = 'qt'
+        sinkClass = AudioEngine.sinks.get(sinkName)
+        if sinkClass is None or not sinkClass.available():
+            return None
+        return AudioEngine(sinkClass(), SampleCache(oggBinary), clock)
+
+    @property
+    def busy(self):
+        """are we playing something?"""
+        return self.current is not None
+
+    def speak(self, fileName, mix=False):
+        """play fileName now or when the others are done. With mix,
+        start now even if something is playing. Returns False if
+        fileName cannot be played. If we only find that out after
+        decoding, fileName goes to the fallback.
+        Files still being decoded are played in the order they were asked for"""
+        if not self.sink.decodes:
+            self.sink.play(fileName)
+            return True
+        if self.sampleCache.failed(fileName):
+            return False
+        entry = [fileName, mix, None, False]  # samples, loaded
+        self.loading.append(entry)
+        self.sampleCache.load(fileName).addCallback(self.__loaded, entry)
+        return True
+
+    def __loaded(self, samples, entry):
+        """samples for entry are ready. Play all loaded entries up to the
+        first one still loading"""
+        entry[2:] = [samples, True]
+        while self.loading and self.loading[0][3]:
+            fileName, mix, samples, _ = self.loading.popleft()
+            if samples is not None:
+                self.__play(samples, mix)
+            elif self.fallback:
+                self.fallback(fileName)
+
+    def __play(self, samples, mix):
+        """start, mix or queue"""
+        if not self.busy:
+            self.__start(samples)
+        elif mix and samples.mixableWith(self.current):
+            elapsed = self.clock.seconds() - self.startedAt
+            self.__start(self.current.after(elapsed).mixedWith(samples))
+        else:
+            self.queue.append(samples)
+            while len(self.queue) > self.maxQueued:
+                dropped = self.queue.popleft()
+                if Debug.sound:
+                    logDebug('AudioEngine: too many voices, dropping {}'.format(dropped))
+
+    def stop(self):
+        """stop playing and forget the queue"""
+        self.queue.clear()
+        self.loading.clear()
+        if self.__finishing and self.__finishing.active():
+            self.__finishing.cancel()
+        self.__finishing = None
+        self.current = None
+        self.sink.stop()
+
+    def __start(self, samples):
+        """hand samples to the sink"""
+        if self.__finishing and self.__finishing.active():
+            self.__finishing.cancel()
+        self.current = samples
+        self.startedAt = self.clock.seconds()
+        if Debug.sound:
+            logDebug('AudioEngine plays {} with {} waiting'.format(samples, len(self.queue)))
+        self.sink.play(samples)
+        self.__finishing = self.clock.callLater(samples.duration + self.gap, self.__finished)
+
+    def __finished(self):
+        """the current clip is done"""
+        self.__finishing = None
+        self.current = None
+        if self.queue:
+            self.__start(self.queue.popleft())
@@ -20,6 +20,7 @@ from uitile import UITile, UIMeld
 from guiutil import Painter, rotateCenter, sceneRotation
 from meld import Meld
 from animation import AnimationSpeed, animate, AnimatedMixin
+from scenestats import timed
 from message import Message
 
 from util import stack, uniqueList
@@ -509,6 +510,8 @@ class Board(QGraphicsRectItem, StrMixin):
                 or self._lightSource != lightSource
                 or Internal.Preferences.showShadows != showShadows):
             self.prepareGeometryChange()
+            if self._tileset:
+                self._tileset.atlas.clear()
             self._tileset = tileset
             self._lightSource = lightSource
             self.setGeometry()
@@ -771,6 +774,14 @@ class FittingView(QGraphicsView):
         self.dragObject = None
         self.setFocus()
 
+    def paintEvent(self, event):
+        """measure frames for --scenestats"""
+        if Internal.sceneStats:
+            with Internal.sceneStats.timing('frame'):
+                QGraphicsView.paintEvent(self, event)
+        else:
+            QGraphicsView.paintEvent(self, event)
+
     def wheelEvent(self, event):  # pylint: disable=no-self-use
         """we do not want scrolling for the scene view.
         Instead scrolling down changes perspective like in kmahjongg"""
@@ -782,6 +793,7 @@ class FittingView(QGraphicsView):
 
     def resizeEvent(self, unusedEvent):
         """scale the scene and its background for new view size"""
+        Tileset.clearAtlases()
         Internal.Preferences.callTrigger(
             'tilesetName')  # this redraws and resizes
         Internal.Preferences.callTrigger('backgroundName')  # redraw background
@@ -937,6 +949,7 @@ class DiscardBoard(CourtBoard):
                          for y in range(self.height)]
         randomGenerator.shuffle(self.__places)
 
+    @timed('DiscardBoard.discardTile')
     def discardTile(self, uiTile):
         """add uiTile to a random position"""
         assert isinstance(uiTile, UITile)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2009-2016 Wolfgang Rohdewald <wolfgang@rohdewald.de>
+
+SPDX-License-Identifier: GPL-2.0
+
+Score many hands without playing: read hands as JSON lines,
+write scores as JSON lines. Meant for rescoring archived hands
+after changing a ruleset.
+
+Input line: {"hand": "...", "ruleset": "...", "wind": "E", "roundWind": "E", "roofOff": false}
+Only hand is needed. Everything else in the input is copied to the output,
+so an id can be passed through.
+
+Output line: the input plus "won", "points", "doubles", "limits",
+"total" and "rules", or plus "error".
+"""
+
+import sys
+import json
+from multiprocessing import Pool
+from optparse import OptionParser
+
+from common import Debug
+from wind import Wind
+from player import Players
+from game import PlayingGame
+from hand import Hand
+from rule import PredefinedRuleset
+
+
+class ScoringContext:
+
+    """holds one game per ruleset and reuses it for all hands.
+    Building the game and loading the ruleset costs much more
+    than scoring a single hand"""
+
+    def __init__(self, defaultRuleset=None):
+        if not PredefinedRuleset.classes:
+            import predefined
+            predefined.load()
+        # Do not create our players in the data base:
+        Players.createIfUnknown = str
+        self.defaultRuleset = defaultRuleset
+        self.games = {}
+
+    @staticmethod
+    def findRuleset(name):
+        """returns the name of the predefined ruleset: either an exact
+        match or the only one containing name"""
+        if not name:
+            raise ValueError('no ruleset given')
+        names = [x.name for x in PredefinedRuleset.rulesets()]
+        if name in names:
+            return name
+        matches = [x for x in names if name in x]
+        if len(matches) != 1:
+            if not matches:
+                raise ValueError('Ruleset %s is unknown' % name)
+            raise ValueError('Ruleset %s is ambiguous: %s' % (name, ', '.join(matches)))
+        return matches[0]
+
+    def game(self, rulesetName, roofOff=False):
+        """the game for this ruleset, built when first needed"""
+        key = (rulesetName, roofOff)
+        if key not in self.games:
+            ruleset = [x for x in PredefinedRuleset.rulesets() if x.name == rulesetName][0].clone()
+            ruleset.load()
+            ruleset.roofOff = roofOff
+            self.games[key] = PlayingGame(
+                [tuple([wind, str(wind.char)]) for wind in Wind.all4], ruleset)
+        return self.games[key]
+
+    def player(self, request):
+        """the player who owns the hand of request, with the winds
+        of request. Returns the ruleset name and the player"""
+        rulesetName = self.findRuleset(request.get('ruleset') or self.defaultRuleset)
+        game = self.game(rulesetName, bool(request.get('roofOff')))
+        myWind = Wind(request.get('wind', 'E'))
+        roundWind = Wind(request.get('roundWind', 'E'))
+        for idx, wind in enumerate(Wind.all4):
+            game.players[idx].wind = wind
+        game.winner = game.players[myWind]
+        game.myself = game.winner
+        game.roundsFinished = roundWind.__index__()
+        return rulesetName, game.winner
+
+    def score(self, request):
+        """request is a dict as described in the module doc string.
+        Returns the result as a dict"""
+        result = dict(request)
+        try:
+            rulesetName, player = self.player(request)
+            # every hand is different, no need to remember them
+            player.clearCache()
+            hand = Hand(player, request['hand'])
+            score = hand.score
+        except Exception as exc:  # pylint: disable=broad-except
+            result['error'] = '%s: %s' % (exc.__class__.__name__, exc)
+            return result
+        result['ruleset'] = rulesetName
+        result['won'] = hand.won
+        result['points'] = score.points
+        result['doubles'] = score.doubles
+        result['limits'] = score.limits
+        result['total'] = hand.total()
+        result['rules'] = [str(x) for x in hand.usedRules]
+        return result
+
+
+CONTEXT = None
+
+
+def _initWorker(defaultRuleset):
+    """each worker process gets its own context"""
+    global CONTEXT  # pylint: disable=global-statement
+    CONTEXT = ScoringContext(defaultRuleset)
+
+
+def _scoreLine(line):
+    """score one JSON line in a worker process"""
+    try:
+        request = json.loads(line)
+    except ValueError as exc:
+        return json.dumps({'input': line.rstrip('\n'), 'error': 'ValueError: %s' % exc})
+    if not isinstance(request, dict):
+        request = {'hand': request}
+    return json.dumps(CONTEXT.score(request), sort_keys=True)
+
+
+def scoreLines(lines, processes=None, defaultRuleset=None, chunkSize=200):
+    """a generator: for every non-empty JSON line in lines, yield the
+    result as a JSON line, in the same order. processes=None means one
+    per core, processes=1 scores within this process"""
+    lines = (x for x in lines if x.strip())
+    if processes == 1:
+        _initWorker(defaultRuleset)
+        for line in lines:
+            yield _scoreLine(line)
+        return
+    with Pool(processes, _initWorker, (defaultRuleset, )) as pool:
+        for result in pool.imap(_scoreLine, lines, chunkSize):
+            yield result
+
+
+def scoreHands(requests, processes=None, defaultRuleset=None):
+    """like scoreLines but takes and yields dicts"""
+    for line in scoreLines((json.dumps(x) for x in requests), processes, defaultRuleset):
+        yield json.loads(line)
+
+
+def parse_options():
+    """parse options"""
+    parser = OptionParser(usage='%prog [options] [FILE...]\n'
+                          'reads hands as JSON lines from FILE or stdin, writes scores to stdout')
+    parser.add_option(
+        '', '--ruleset', dest='ruleset',
+        help='use RULESET for hands not naming their ruleset',
+        metavar='RULESET')
+    parser.add_option(
+        '', '--processes', dest='processes',
+        help='use PROCESSES worker processes. Default is one per core',
+        metavar='PROCESSES', type=int, default=None)
+    parser.add_option(
+        '', '--rulesets', dest='showRulesets', action='store_true',
+        default=False, help='show all available rulesets')
+    parser.add_option(
+        '', '--debug', dest='debug',
+        help=Debug.help())
+    return parser.parse_args()
+
+
+def main():
+    """score all input lines"""
+    options, args = parse_options()
+    if options.debug:
+        errorMessage = Debug.setOptions(options.debug)
+        if errorMessage:
+            print(errorMessage)
+            sys.exit(2)
+    if options.showRulesets:
+        ScoringContext()
+        for ruleset in PredefinedRuleset.rulesets():
+            print(ruleset.name)
+        return
+    if options.ruleset:
+        try:
+            ScoringContext().findRuleset(options.ruleset)
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+
+    def allLines():
+        """from all files or from stdin"""
+        if not args:
+            yield from sys.stdin
+        for path in args:
+            with open(path, encoding='utf-8') as inFile:
+                yield from inFile
+
+    for line in scoreLines(allLines(), options.processes, options.ruleset):
+        print(line)
+
+if __name__ == '__main__':
+    main()
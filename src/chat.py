@@ -72,7 +72,7 @@ class ChatModel(QAbstractTableModel):
             elif role == Qt.DisplayRole and index.column() == 1:
                 result = chatLine.fromUser
             elif role == Qt.DisplayRole and index.column() == 2:
-                result = i18n(chatLine.message)
+                result = chatLine.translated()
             elif role == Qt.ForegroundRole and index.column() == 2:
                 palette = Internal.app.palette()  # pylint: disable=no-member
                 color = 'blue' if chatLine.isStatusMessage else palette.windowText(
@@ -276,6 +276,9 @@ class Client(pb.Referenceable):
                                   gameid=gameid, wantedGame=wantedGame, client=self,
                                   playOpen=self.table.playOpen, autoPlay=self.table.autoPlay)
         self.game.shouldSave = shouldSave
+        if self.isRobotClient():
+            # we run in the server process, self.table is a ServerTable
+            self.game.handEvaluations = self.table.game.handEvaluations
         self.__assignIntelligence()
                                   # intelligence variant is not saved for
                                   # suspended games
@@ -178,13 +178,16 @@ class Debug:
     callers = '0'
     git = False
     ruleCache = False
+    sharedHands = False
     quit = False
     preferences = False
     graphics = False
+    noAtlas = False  # paint tiles directly from the SVG, for comparison
     scoring = False
     wallSize = '0'
     i18n = False
     isalive = False
+    logJson = ''  # file name for log records as JSON lines
 
     def __init__(self):
         raise Exception('Debug is not meant to be instantiated')
@@ -288,6 +291,8 @@ class StrMixin:
     runtime overhead to check for this beforehand.
     """
 
+    __slots__ = ()  # so classes with __slots__ can use StrMixin
+
     def __repr__(self):
         clsName = self.__class__.__name__
         content = str(self)
@@ -315,6 +320,12 @@ class Options(metaclass=FixedClass):
     AI = 'DefaultAI'
     csv = None
     continueServer = False
+    maxTables = 0  # server: maximum of running tables, 0 is unlimited
+    maxRobotTables = 0  # server: maximum of running autoPlay tables, 0 is unlimited
+    maxCpuLoad = 0.0  # server: no new autoPlay tables beyond this share of one CPU, 0 is unlimited
+    audio = 'auto'  # qt, null or ogg123, see audio.AudioEngine
+    sceneStats = None  # file name, see scenestats.py
+    layoutsPerFrame = 0  # hand board layouts per frame, 0 is unlimited, see animation.LayoutScheduler
     fixed = False
 
     def __init__(self):
@@ -366,7 +377,9 @@ class __Internal:
     """
     # pylint: disable=too-many-instance-attributes
     Preferences = None
-    defaultPort = 8301
+    # also the protocol version, compared by setClientProperties.
+    # 8302: voice data is sent in base64 chunks
+    defaultPort = 8302
     logPrefix = 'C'
     isServer = False
     scaleScene = True
@@ -379,6 +392,7 @@ class __Internal:
     autoPlay = False
     logger = None
     kajonggrc = None
+    sceneStats = None
 
     def __init__(self):
         """init the loggers"""
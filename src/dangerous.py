@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2008-2016 Wolfgang Rohdewald <wolfgang@rohdewald.de>
+
+SPDX-License-Identifier: GPL-2.0
+
+"""
+
+from mi18n import i18n, i18nE
+
+
+class Dangerous:
+
+    """
+    Reasons why discarding a tile is Dangerous Game. Per tile, the
+    reasons are combined into a bit mask. The explaining texts are only
+    built when needed for display.
+    """
+
+    GreenHand = 1
+    TrueColor = 2
+    Terminals = 4
+    Winds = 8
+    Dragons = 16
+    ShortWall = 32
+
+    __texts = {
+        GreenHand: i18nE('Player %1 has 3 or 4 exposed melds, all are green'),
+        TrueColor: i18nE('Player %1 may try a True Color Game'),
+        Terminals: i18nE('Player %1 may try an All Terminals Game'),
+        Winds: i18nE('Player %1 exposed many winds'),
+        Dragons: i18nE('Player %1 exposed many dragons'),
+        ShortWall: i18nE('Short living wall: Tile is invisible, hence dangerous')}
+
+    def __init__(self):
+        raise Exception('Dangerous is not meant to be instantiated')
+
+    @staticmethod
+    def mark(dangerousTiles, tiles, reason):
+        """add reason to the bit mask of all tiles"""
+        for tile in tiles:
+            dangerousTiles[tile] = dangerousTiles.get(tile, 0) | reason
+
+    @classmethod
+    def texts(cls, reasons):
+        """reasons is a list of tuples (bit mask, player) as returned by
+        Game.dangerousFor. player is None for game wide reasons.
+        Returns one explaining text for each reason"""
+        result = []
+        for mask, player in reasons:
+            for reason, text in sorted(cls.__texts.items()):
+                if mask & reason:
+                    if player is None:
+                        result.append(i18n(text))
+                    else:
+                        result.append(i18n(text, player.localName))
+        return result
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2009-2016 Wolfgang Rohdewald <wolfgang@rohdewald.de>
+
+SPDX-License-Identifier: GPL-2.0
+
+Keep the data base small: move finished games into an archive data
+base, give free pages back to the file system, update the statistics
+of the query planner and show how much space every table uses.
+
+This may run while the server is up. The server never writes to finished
+games. Archiving happens in small transactions, and the server simply
+waits for them like for any other writer. Only a full --vacuum blocks
+the server for as long as it takes. So do it once, it then switches
+to incremental vacuum and later runs only need --incremental.
+
+The archive keeps one row per game with the names of the players, the
+hash of the ruleset and all score rows as compressed JSON.
+"""
+
+import os
+import sys
+import json
+import zlib
+import datetime
+from optparse import OptionParser
+
+from common import Internal, Options, Debug
+from query import DBHandle, Query
+
+
+class DBMaintenance:
+
+    """maintenance for the data base in Internal.db"""
+
+    archiveSchema = """
+            id integer primary key,
+            seed text,
+            autoplay integer,
+            starttime text,
+            endtime text,
+            rulesetname text,
+            rulesethash text,
+            players text,
+            scores blob"""
+
+    def __init__(self, batchSize=100):
+        self.batchSize = batchSize
+
+    @staticmethod
+    def archivePath(dbPath):
+        """the default name of the archive for dbPath"""
+        base, ext = os.path.splitext(dbPath)
+        return '{}-archive{}'.format(base, ext)
+
+    def __attachArchive(self, archivePath):
+        """attach the archive, creating its table if needed"""
+        Query('ATTACH DATABASE ? AS archive', (archivePath, ))
+        Query('create table if not exists archive.game({})'.format(self.archiveSchema))
+
+    def archive(self, days, archivePath):
+        """move finished games which ended more than days ago into the
+        archive. Returns the number of archived games"""
+        endedBefore = (datetime.datetime.now() - datetime.timedelta(days=days)).replace(
+            microsecond=0).isoformat()
+        self.__attachArchive(archivePath)
+        scoreFields = [x[1] for x in Query('pragma table_info(score)').records]
+        result = 0
+        try:
+            while True:
+                with Internal.db:  # transaction
+                    games = Query(
+                        'select g.id,g.seed,g.autoplay,g.starttime,g.endtime,r.name,r.hash,'
+                        'p0.name,p1.name,p2.name,p3.name'
+                        ' from game g left join ruleset r on r.id=g.ruleset'
+                        ' left join player p0 on p0.id=g.p0 left join player p1 on p1.id=g.p1'
+                        ' left join player p2 on p2.id=g.p2 left join player p3 on p3.id=g.p3'
+                        ' where g.endtime is not null and g.endtime<?'
+                        ' order by g.id limit ?', (endedBefore, self.batchSize)).records
+                    if not games:
+                        break
+                    rows = []
+                    for game in games:
+                        scores = Query(
+                            'select * from score where game=? order by hand,rowid', (game[0], )).records
+                        scores = [dict(zip(scoreFields, x)) for x in scores]
+                        rows.append(tuple(game[:7]) + (
+                            json.dumps(game[7:]),
+                            zlib.compress(json.dumps(scores).encode('utf-8'))))
+                    Query('insert or replace into archive.game values(?,?,?,?,?,?,?,?,?)', rows)
+                    ids = [(x[0], ) for x in games]
+                    Query('delete from score where game=?', ids)
+                    Query('delete from game where id=?', ids)
+                result += len(games)
+        finally:
+            Query('DETACH DATABASE archive')
+        return result
+
+    @staticmethod
+    def archivedGame(archivePath, gameid):
+        """the archived game as a dict, or None"""
+        Query('ATTACH DATABASE ? AS archive', (archivePath, ))
+        try:
+            records = Query('select * from archive.game where id=?', (gameid, )).records
+            if not records:
+                return None
+            fields = [x[1] for x in Query('pragma archive.table_info(game)').records]
+            result = dict(zip(fields, records[0]))
+            result['players'] = json.loads(result['players'])
+            result['scores'] = json.loads(zlib.decompress(result['scores']).decode('utf-8'))
+            return result
+        finally:
+            Query('DETACH DATABASE archive')
+
+    @staticmethod
+    def autoVacuum():
+        """0 none, 1 full, 2 incremental"""
+        return Query('pragma auto_vacuum').records[0][0]
+
+    @staticmethod
+    def freePages():
+        """pages not used by any table or index"""
+        return Query('pragma freelist_count').records[0][0]
+
+    @staticmethod
+    def vacuum():
+        """rebuild the whole file. Locks the data base until done.
+        Afterwards free pages can be released with incremental()"""
+        Query('pragma auto_vacuum=incremental')
+        Query('VACUUM')
+
+    def incremental(self):
+        """give free pages back to the file system, a few at a time.
+        Returns the number of released pages or None if the data base
+        is not in incremental vacuum mode"""
+        if self.autoVacuum() != 2:
+            return None
+        result = 0
+        while self.freePages():
+            before = self.freePages()
+            Query('pragma incremental_vacuum({})'.format(self.batchSize * 10))
+            released = before - self.freePages()
+            if not released:
+                break
+            result += released
+        return result
+
+    @staticmethod
+    def analyze():
+        """update the statistics for the query planner"""
+        Query('ANALYZE')
+
+    @staticmethod
+    def sizes():
+        """a list of (name, rows, bytes) for all tables and the total size
+        of the file. bytes is None if sqlite has no dbstat"""
+        pageSize = Query('pragma page_size').records[0][0]
+        pageCount = Query('pragma page_count').records[0][0]
+        tables = [x[0] for x in Query(
+            "select name from sqlite_master where type='table' order by name").records]
+        stats = Query(
+            'select m.tbl_name, sum(s.pgsize) from dbstat s, sqlite_master m'
+            ' where s.name=m.name group by m.tbl_name', mayFail=True, failSilent=True)
+        sizes = dict(stats.records) if not stats.failure else {}
+        result = []
+        for table in tables:
+            rows = Query('select count(*) from "{}"'.format(table)).records[0][0]
+            result.append((table, rows, sizes.get(table)))
+        result.append(('free pages', Query('pragma freelist_count').records[0][0], None))
+        result.append(('file', pageCount, pageSize * pageCount))
+        return result
+
+
+def parse_options():
+    """parse options"""
+    parser = OptionParser(usage='%prog [options]\n'
+                          'archives finished games and compacts the data base.'
+                          ' Without options, it shows the table sizes')
+    parser.add_option(
+        '', '--db', dest='dbpath',
+        help='name of the database. Default is the database of the server')
+    parser.add_option(
+        '', '--archive', dest='archive', type=int,
+        help='move games which finished more than DAYS days ago into the archive',
+        metavar='DAYS')
+    parser.add_option(
+        '', '--archivedb', dest='archivePath',
+        help='name of the archive. Default is the name of the database with -archive appended',
+        metavar='ARCHIVE')
+    parser.add_option(
+        '', '--show', dest='show', type=int,
+        help='show archived GAME as JSON', metavar='GAME')
+    parser.add_option(
+        '', '--vacuum', dest='vacuum', action='store_true', default=False,
+        help='rebuild the database file. This blocks the server until done.'
+        ' Enables --incremental for later runs')
+    parser.add_option(
+        '', '--incremental', dest='incremental', action='store_true', default=False,
+        help='give free pages back to the file system without blocking the server')
+    parser.add_option(
+        '', '--analyze', dest='analyze', action='store_true', default=False,
+        help='update the statistics used for planning queries')
+    parser.add_option(
+        '', '--sizes', dest='sizes', action='store_true', default=False,
+        help='show rows and bytes per table')
+    parser.add_option(
+        '', '--batch', dest='batchSize', type=int, default=100,
+        help='archive BATCH games per transaction. Default is %default',
+        metavar='BATCH')
+    parser.add_option(
+        '', '--debug', dest='debug',
+        help=Debug.help())
+    return parser.parse_args()
+
+
+def main():
+    """do what the options say"""
+    options, _ = parse_options()
+    if options.debug:
+        errorMessage = Debug.setOptions(options.debug)
+        if errorMessage:
+            print(errorMessage)
+            sys.exit(2)
+    Internal.isServer = True
+    if options.dbpath:
+        Options.dbPath = os.path.expanduser(options.dbpath)
+    dbPath = DBHandle.dbPath()
+    if not os.path.exists(dbPath):
+        raise SystemExit('{} does not exist'.format(dbPath))
+    archivePath = options.archivePath or DBMaintenance.archivePath(dbPath)
+    DBHandle(dbPath)
+    maintenance = DBMaintenance(options.batchSize)
+    try:
+        if options.show is not None:
+            print(json.dumps(maintenance.archivedGame(archivePath, options.show), indent=1))
+            return
+        if options.archive is not None:
+            count = maintenance.archive(options.archive, archivePath)
+            print('archived {} games into {}'.format(count, archivePath))
+        if options.vacuum:
+            maintenance.vacuum()
+            print('vacuumed {}'.format(dbPath))
+        if options.incremental:
+            released = maintenance.incremental()
+            if released is None:
+                print('{} needs --vacuum once before --incremental works'.format(dbPath))
+            else:
+                print('released {} pages'.format(released))
+        if options.analyze:
+            maintenance.analyze()
+            print('analyzed {}'.format(dbPath))
+        if options.sizes or not any((
+                options.archive is not None, options.vacuum, options.incremental, options.analyze)):
+            for name, rows, size in maintenance.sizes():
+                print('{:20} {:>10} {:>12}'.format(name, rows, '' if size is None else size))
+    finally:
+        Internal.db.close()
+
+if __name__ == '__main__':
+    main()
@@ -17,14 +17,15 @@ from functools import total_ordering
 from twisted.internet.defer import succeed
 from util import gitHead
 from kajcsv import CsvRow
-from rand import CountingRandom
-from log import logError, logWarning, logException, logDebug, i18n
+from rand import gameRandom
+from log import logError, logWarning, logException, logDebug, i18n, LazyText
 from common import Internal, IntDict, Debug, Options
 from common import StrMixin, Speeds
 from wind import Wind, East
 from query import Query
 from rule import Ruleset
 from tile import Tile, elements
+from dangerous import Dangerous
 from tilesource import TileSource
 from sound import Voice
 from wall import Wall
@@ -227,9 +228,10 @@ class Game:
         self.visibleTiles = IntDict()
         self.discardedTiles = IntDict(self.visibleTiles)
         # tile names are always lowercase
-        self.dangerousTiles = list()
+        self.dangerousTiles = {}
+        self.handEvaluations = None  # see hand.HandEvaluations
         self.csvTags = []
-        self.randomGenerator = CountingRandom(self)
+        self.randomGenerator = gameRandom(self)
         self._setHandSeed()
         self.activePlayer = None
         self.__winner = None
@@ -291,7 +293,7 @@ class Game:
         self.__winner = None
         self.__activePlayer = None
         self.prevActivePlayer = None
-        self.dangerousTiles = list()
+        self.dangerousTiles = {}
         self.discardedTiles.clear()
         assert self.visibleTiles.count() == 0
 
@@ -504,7 +506,7 @@ class Game:
 
     def initHand(self):
         """directly before starting"""
-        self.dangerousTiles = list()
+        self.dangerousTiles = {}
         self.discardedTiles.clear()
         assert self.visibleTiles.count() == 0
         if Internal.scene:
@@ -617,7 +619,7 @@ class Game:
         handId = self._prevHandId if prevHandId else self.handId
         handId = handId.prompt(withMoveCount=True)
         logDebug(
-            '%s%s: %s' % (prefix, handId, msg),
+            LazyText('{}{}: {}', prefix, handId, msg),
             withGamePrefix=False,
             btIndent=btIndent)
 
@@ -952,10 +954,7 @@ class PlayingGame(Game):
             player.handBoard.discard(tileName)
         self.lastDiscard = Tile(tileName)
         player.removeTile(self.lastDiscard)
-        if any(tileName.exposed in x[0] for x in self.dangerousTiles):
-            self.computeDangerous()
-        else:
-            self._endWallDangerous()
+        self._endWallDangerous(tileName.exposed)
         self.handDiscardCount += 1
 
     def saveHand(self):
@@ -1020,45 +1019,43 @@ class PlayingGame(Game):
                             player.name, player.voice))
 
     def dangerousFor(self, forPlayer, tile):
-        """return a list of explaining texts if discarding tile
-        would be Dangerous game for forPlayer. One text for each
-        reason - there might be more than one"""
+        """return a list of reasons if discarding tile would be Dangerous
+        game for forPlayer. A reason is a tuple (bit mask, player) where player is
+        None for game wide reasons. Dangerous.texts() explains them"""
         assert isinstance(tile, Tile), tile
         tile = tile.exposed
         result = []
-        for dang, txt in self.dangerousTiles:
-            if tile in dang:
-                result.append(txt)
+        mask = self.dangerousTiles.get(tile)
+        if mask:
+            result.append((mask, None))
         for player in forPlayer.others():
-            for dang, txt in player.dangerousTiles:
-                if tile in dang:
-                    result.append(txt)
+            mask = player.dangerousTiles.get(tile)
+            if mask:
+                result.append((mask, player))
         return result
 
     def computeDangerous(self, playerChanged=None):
         """recompute gamewide dangerous tiles. Either for playerChanged or
         for all players"""
-        self.dangerousTiles = list()
         if playerChanged:
             playerChanged.findDangerousTiles()
         else:
             for player in self.players:
                 player.findDangerousTiles()
+        self.dangerousTiles = {}
         self._endWallDangerous()
 
-    def _endWallDangerous(self):
+    def _endWallDangerous(self, visibleTile=None):
         """if end of living wall is reached, declare all invisible tiles
-        as dangerous"""
+        as dangerous. If we already did, only visibleTile just became visible"""
         if len(self.wall.living) <= 5:
-            allTiles = [x for x in defaultdict.keys(elements.occurrence)
-                        if not x.isBonus]
-            for tile in allTiles:
-                assert isinstance(tile, Tile), tile
-            # see https://www.logilab.org/ticket/23986
-            invisibleTiles = {x for x in allTiles if x not in self.visibleTiles}
-            msg = i18n('Short living wall: Tile is invisible, hence dangerous')
-            self.dangerousTiles = [x for x in self.dangerousTiles if x[1] != msg]
-            self.dangerousTiles.append((invisibleTiles, msg))
+            if self.dangerousTiles and visibleTile:
+                self.dangerousTiles.pop(visibleTile, None)
+            else:
+                # see https://www.logilab.org/ticket/23986
+                self.dangerousTiles = {
+                    x: Dangerous.ShortWall for x in defaultdict.keys(elements.occurrence)
+                    if not x.isBonus and x not in self.visibleTiles}
 
     def appendMove(self, player, command, kwargs):
         """append a Move object to self.moves"""
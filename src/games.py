@@ -21,17 +21,22 @@ from log import logException
 from query import Query
 from guiutil import MJTableView, decorateWindow
 from statesaver import StateSaver
-from common import Debug
+from common import Internal, Debug
 from modeltest import ModelTest
 
 
 class GamesModel(QAbstractTableModel):
 
-    """data for the list of games"""
+    """data for the list of games. The games are fetched page by page
+    when the view needs them, ordered by game id"""
+
+    pageSize = 200
 
     def __init__(self):
         QAbstractTableModel.__init__(self)
         self._resultRows = []
+        self.onlyPending = True
+        self.__complete = True
 
     def columnCount(self, unusedParent=None):   # pylint: disable=no-self-use
         """including the hidden col 0"""
@@ -44,13 +49,72 @@ class GamesModel(QAbstractTableModel):
             return 0
         return len(self._resultRows)
 
-    def setResultset(self, rows):
-        """new data"""
+    def setFilter(self, onlyPending):
+        """forget what we have and fetch the first page"""
         self.beginResetModel()
         try:
-            self._resultRows = rows
+            self.onlyPending = onlyPending
+            self._resultRows = []
+            self.__complete = False
         finally:
             self.endResetModel()
+        self.fetchMore()
+
+    def __page(self):
+        """the next pageSize games. The database filters them"""
+        lastId = self._resultRows[-1][0] if self._resultRows else -1
+        return Query(
+            "select g.id, g.starttime, "
+            "p0.name||'///'||p1.name||'///'||p2.name||'///'||p3.name "
+            "from game g, player p0,"
+            "player p1, player p2, player p3 "
+            "where seed is null"
+            " and p0.id=g.p0 and p1.id=g.p1 "
+            " and p2.id=g.p2 and p3.id=g.p3 "
+            "%s"
+            "and exists(select 1 from score where game=g.id) "
+            "and g.id>? order by g.id limit ?" %
+            ("and g.endtime is null " if self.onlyPending else ""),
+            (lastId, self.pageSize)).records
+
+    def canFetchMore(self, parent=QModelIndex()):
+        """are there more games in the database?"""
+        return not parent.isValid() and not self.__complete
+
+    def fetchMore(self, parent=QModelIndex()):
+        """append the next page"""
+        if not self.canFetchMore(parent):
+            return
+        records = self.__page()
+        self.__complete = len(records) < self.pageSize
+        if records:
+            first = len(self._resultRows)
+            self.beginInsertRows(QModelIndex(), first, first + len(records) - 1)
+            try:
+                self._resultRows.extend(records)
+            finally:
+                self.endInsertRows()
+
+    def rowForGame(self, game):
+        """the row of game, fetching more pages if needed. None if
+        the game is not in the list"""
+        while True:
+            for row, record in enumerate(self._resultRows):
+                if record[0] == game:
+                    return row
+            if not self.canFetchMore() or (self._resultRows and self._resultRows[-1][0] > game):
+                return None
+            self.fetchMore()
+
+    def removeGames(self, games):
+        """those games have been deleted"""
+        for row in reversed(range(len(self._resultRows))):
+            if self._resultRows[row][0] in games:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                try:
+                    del self._resultRows[row]
+                finally:
+                    self.endRemoveRows()
 
     def index(self, row, column, parent=None):
         """helper"""
@@ -174,27 +238,13 @@ class Games(QDialog):
 
     def setQuery(self):
         """define the query depending on self.OnlyPending"""
-        query = Query(
-            "select g.id, g.starttime, "
-            "p0.name||'///'||p1.name||'///'||p2.name||'///'||p3.name "
-            "from game g, player p0,"
-            "player p1, player p2, player p3 "
-            "where seed is null"
-            " and p0.id=g.p0 and p1.id=g.p1 "
-            " and p2.id=g.p2 and p3.id=g.p3 "
-            "%s"
-            "and exists(select 1 from score where game=g.id)" %
-            ("and g.endtime is null " if self.onlyPending else ""))
-        self.model.setResultset(query.records)
+        self.model.setFilter(self.onlyPending)
         self.view.hideColumn(0)
 
     def __idxForGame(self, game):
         """return the model index for game"""
-        for row in range(self.model.rowCount()):
-            idx = self.model.index(row, 0)
-            if self.model.data(idx, 0) == game:
-                return idx
-        return self.model.index(0, 0)
+        row = self.model.rowForGame(game)
+        return self.model.index(row or 0, 0)
 
     def __getSelectedGame(self):
         """return the game id of the selected game"""
@@ -221,10 +271,11 @@ class Games(QDialog):
         def answered(result, games):
             """question answered, result is True or False"""
             if result:
-                for game in games:
-                    Query("DELETE FROM score WHERE game = ?", (game, ))
-                    Query("DELETE FROM game WHERE id = ?", (game, ))
-                self.setQuery()  # just reload entire table
+                with Internal.db:  # transaction
+                    Query("DELETE FROM score WHERE game = ?", [(x, ) for x in games])
+                    Query("DELETE FROM game WHERE id = ?", [(x, ) for x in games])
+                self.model.removeGames(set(games))
+                self.selectionChanged()
         allGames = self.view.selectionModel().selectedRows(0)
         deleteGames = [x.data() for x in allGames]
         if not deleteGames:
@@ -10,11 +10,12 @@ SPDX-License-Identifier: GPL-2.0
 Read the user manual for a description of the interface to this scoring engine
 """
 
-from itertools import chain
+from itertools import chain, count
+from collections import OrderedDict
 import weakref
 from hashlib import md5
 
-from log import dbgIndent, Fmt, fmt
+from log import dbgIndent, Fmt, fmt, LazyText
 from tile import Tile, TileList
 from tilesource import TileSource
 from meld import Meld, MeldList
@@ -58,6 +59,14 @@ class Hand(StrMixin):
     # pylint: disable=too-many-instance-attributes
 
     indent = 0
+    # interns hand strings: the same string gets the same key while it is
+    # among the maxKeys most recently built ones, even across
+    # player.clearCache(). Keys are never reused, so equal keys always
+    # mean equal strings
+    maxKeys = 100000
+    __keys = OrderedDict()
+    __nextKey = count(1)
+
     class __NotWon(UserWarning):  # pylint: disable=invalid-name
 
         """should be won but is not a winning hand"""
@@ -82,6 +91,13 @@ class Hand(StrMixin):
             # I am from cache
             return
 
+        self.key = Hand.__keys.get(string)
+        if self.key is None:
+            self.key = Hand.__keys[string] = next(Hand.__nextKey)
+            while len(Hand.__keys) > Hand.maxKeys:
+                Hand.__keys.popitem(last=False)
+        else:
+            Hand.__keys.move_to_end(string)
         # shortcuts for speed:
         self._player = weakref.ref(player)
         self.ruleset = player.game.ruleset
@@ -92,6 +108,7 @@ class Hand(StrMixin):
         self.__won = None
         self.__score = None
         self.__callingHands = None
+        self.__callingDiscards = None
         self.__mjRule = None
         self.ruleCache = {}
         self.__lastTile = None
@@ -105,10 +122,19 @@ class Hand(StrMixin):
         self.usedRules = []
         self.__rest = TileList()
         self.__arranged = None
+        self.__triedMjRules = None
 
         self.__parseString(string)
         self.__won = self.lenOffset == 1 and player.mayWin
 
+        evaluations = player.handEvaluations
+        if evaluations is not None:
+            evaluationKey = self.__evaluationKey()
+            evaluation = evaluations.get(evaluationKey, self.ruleset)
+            if evaluation is not None and not Debug.sharedHands:
+                self.__useEvaluation(evaluation)
+                return
+
         if Debug.hand or (Debug.mahJongg and self.lenOffset == 1):
             self.debug(fmt('{callers}',
                            callers=callers(exclude=['__init__'])))
@@ -129,6 +155,51 @@ class Hand(StrMixin):
             if Debug.hand or (Debug.mahJongg and self.lenOffset == 1):
                 self.debug('Fixing {} {}{}'.format(self, 'won ' if self.won else '', self.score))
             Hand.indent -= 1
+        if evaluations is not None:
+            if evaluation is None:
+                evaluations.put(evaluationKey, self.ruleset, self.__evaluation())
+            elif evaluation != self.__evaluation():
+                raise AssertionError('shared evaluation for {} differs: {} / {}'.format(
+                    self, evaluation, self.__evaluation()))
+
+    def __evaluationKey(self):
+        """everything beyond the string the evaluation depends on"""
+        player = self.player
+        game = player.game
+        winner = game.winner
+        result = [self.ruleset.hash, self.key, player.wind, game.roundWind, player.mayWin,
+                  self.intelligence.__class__, self.robbedTile,
+                  game.notRotated, winner.wind if winner else None]
+        if self.lenOffset < 1:
+            # not the visible tiles: only mjRule.shouldTry looks at them
+            result.extend(x.name for x in self.__mjRulesToTry())
+        return tuple(result)
+
+    def __mjRulesToTry(self):
+        """the Mah Jongg rules worth trying for a hand with lenOffset < 1"""
+        if self.__triedMjRules is None:
+            self.__triedMjRules = [x for x in self.ruleset.mjRules if x.shouldTry(self)]
+        return self.__triedMjRules
+
+    def __evaluation(self):
+        """the result of __arrange and __calculate, for HandEvaluations.
+        Rules are not copied, so this is only valid for self.ruleset"""
+        score = self.__score or Score()
+        return (self.__won, self.__arranged, tuple(self.melds), self.__mjRule,
+                tuple((x.rule, x.meld) for x in self.usedRules),
+                (score.points, score.doubles, score.limits),
+                self.__lastMeld, tuple(self.__lastMelds))
+
+    def __useEvaluation(self, evaluation):
+        """the inverse of __evaluation"""
+        (self.__won, self.__arranged, melds, self.__mjRule, usedRules,
+         score, self.__lastMeld, lastMelds) = evaluation
+        self.melds = MeldList(melds)
+        self.usedRules = [UsedRule(*x) for x in usedRules]
+        self.__score = Score(*score, ruleset=self.ruleset)
+        self.__lastMelds = MeldList(lastMelds)
+        self.__rest = TileList()
+        self._fixed = True
 
     def __parseString(self, inString):
         """parse the string passed to Hand()"""
@@ -285,11 +356,11 @@ class Hand(StrMixin):
 
     def debug(self, msg):
         """try to use Game.debug so we get a nice prefix"""
-        idPrefix = Fmt.num_encode(hash(self))
+        idPrefix = Fmt.num_encode(self.debugId())
         if self.prevHand:
-            idPrefix += '<{}'.format(Fmt.num_encode(hash(self.prevHand)))
+            idPrefix += '<{}'.format(Fmt.num_encode(self.prevHand.debugId()))
         idPrefix = 'Hand({})'.format(idPrefix)
-        self.player.game.debug(' '.join([dbgIndent(self, self.prevHand), idPrefix, msg]))
+        self.player.game.debug(LazyText('{} {} {}', dbgIndent(self, self.prevHand), idPrefix, msg))
 
     def __applyRules(self):
         """find out which rules apply, collect in self.usedRules"""
@@ -486,6 +557,25 @@ class Hand(StrMixin):
         return rule.selectable(self) or rule.appliesToHand(self)
         # needed for activated rules
 
+    def manualRuleDeltas(self, mjStrings):
+        """mjStrings maps manual rules to the m part of the hand string
+        we get by toggling that rule. Returns a dict mapping the same rules
+        to the change of the total score. This only saves building the
+        same hand twice: every distinct m part is a new Hand, arranged
+        and scored from scratch"""
+        parts = self.string.split()
+        if not any(x[0] == 'm' for x in parts):
+            parts.append('m')
+        total = self.total()
+        deltas = {}
+        result = {}
+        for rule, mjString in mjStrings.items():
+            if mjString not in deltas:
+                string = ' '.join(mjString if x[0] == 'm' else x for x in parts)
+                deltas[mjString] = Hand(self.player, string).total() - total
+            result[rule] = deltas[mjString]
+        return result
+
     @property
     def callingHands(self):
         """the hand is calling if it only needs one tile for mah jongg.
@@ -523,6 +613,33 @@ class Hand(StrMixin):
                 self.debug(fmt('Is calling {_hiderules}'))
         return result
 
+    @property
+    def callingDiscards(self):
+        """for a hand with lenOffset 1: maps every tile we can discard
+        and still be calling to a tuple with the tiles we are then waiting for.
+        Those are the last tiles of (self - discard).callingHands"""
+        if self.__callingDiscards is None:
+            self.__callingDiscards = self.__findCallingDiscards()
+        return self.__callingDiscards
+
+    def __findCallingDiscards(self):
+        """building self - discard is expensive, so we only do that
+        for the discards some mjRule finds worth trying"""
+        result = {}
+        if ' x' in self.string or self.lenOffset != 1:
+            return result
+        discards = set()
+        for rule in self.ruleset.mjRules:
+            discards |= rule.discardCandidates(self)
+        for discard in sorted(discards):
+            callingHands = (self - discard).callingHands
+            if callingHands:
+                result[discard] = tuple(x.lastTile for x in callingHands)
+        if Debug.hand:
+            _discards = ' '.join(str(x) for x in sorted(result))  # pylint: disable=unused-variable
+            self.debug(fmt('Calling after discarding {_discards}'))
+        return result
+
     @property
     def robbedTile(self):
         """cache this here for use in rulecode"""
@@ -570,7 +687,7 @@ class Hand(StrMixin):
             rules = self.ruleset.mjRules
         for mjRule in rules:
             if ((self.lenOffset == 1 and mjRule.appliesToHand(self))
-                    or (self.lenOffset < 1 and mjRule.shouldTry(self))):
+                    or (self.lenOffset < 1 and mjRule in self.__mjRulesToTry())):
                 if self.__rest:
                     for melds, rest2 in mjRule.rearrange(self, self.__rest[:]):
                         if rest2:
@@ -655,12 +772,18 @@ class Hand(StrMixin):
     def __eq__(self, other):
         """compares hand values"""
         assert self.player == other.player
+        if self.key == other.key:
+            if Debug.hand:
+                assert self.string == other.string, \
+                    'Hand keys {}/{} do not match strings {}/{}'.format(
+                        self.key, other.key, self.string, other.string)
+            return True
+        # the key of one of them may have been evicted
         return self.string == other.string
 
     def __ne__(self, other):
         """compares hand values"""
-        assert self.player == other.player
-        return self.string != other.string
+        return not self.__eq__(other)
 
     def __matchingRules(self, rules):
         """return all matching rules for this hand"""
@@ -744,9 +867,15 @@ class Hand(StrMixin):
         return self.newString()
 
     def __hash__(self):
-        """used for debug logging to identify the hand"""
+        """not the key: that may change for the same string"""
         if not hasattr(self, 'string'):
             return 0
+        return hash(self.string)
+
+    def debugId(self):
+        """used for debug logging to identify the hand. Unlike key,
+        this does not depend on the order in which hands are built,
+        so logs of different runs can be compared"""
         md5sum = md5()
         md5sum.update(self.player.name.encode('utf-8'))
         md5sum.update(self.string.encode())
@@ -756,3 +885,39 @@ class Hand(StrMixin):
         for part in range(4):
             result = (result << 8) + digest[part]
         return result
+
+
+class HandEvaluations:
+
+    """evaluations of hands, shared between the game server and the
+    robot clients living in the server process: they all evaluate the
+    same hands. See Game.handEvaluations.
+    An entry is never changed. It is only used if the ruleset is
+    the same instance because the evaluation refers to its rules.
+    --debug=sharedHands evaluates again and compares"""
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, ruleset):
+        """the evaluation or None"""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] is not ruleset:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, ruleset, evaluation):
+        """remember the evaluation"""
+        self.entries[key] = (ruleset, evaluation)
+
+    def clear(self):
+        """for a new hand"""
+        self.entries.clear()
+
+    def __str__(self):
+        return 'HandEvaluations: {} entries, {} hits, {} misses'.format(
+            len(self.entries), self.hits, self.misses)
@@ -16,6 +16,8 @@ from uitile import UITile
 from meld import Meld, MeldList
 from hand import Hand
 from board import Board
+from animation import LayoutScheduler
+from scenestats import timed
 from sound import Sound
 
 from log import logDebug
@@ -221,6 +223,7 @@ class HandBoard(Board):
         assert len(bonusTiles) == len(result)
         return result
 
+    @timed('HandBoard.placeTiles')
     def placeTiles(self, tiles):
         """tiles are all tiles for this board.
         returns a list of those uiTiles which are placed on the board"""
@@ -274,6 +277,7 @@ class HandBoard(Board):
     def _avoidCrossingMovements(self, places):
         """not needed for all HandBoards"""
 
+    @timed('HandBoard.sync')
     def sync(self, adding=None):
         """place all tiles in HandBoard.
         adding tiles: their board is where they come from. Those tiles
@@ -325,13 +329,37 @@ class PlayingHandBoard(HandBoard):
     # pylint: disable=too-many-public-methods,too-many-instance-attributes
 
     def __init__(self, player):
+        self.__adding = []
+        self.__lastAdding = None
         HandBoard.__init__(self, player)
 
+    @property
+    def uiTiles(self):
+        """do a pending layout first"""
+        LayoutScheduler.flush(self)
+        return self._uiTiles
+
+    @uiTiles.setter
+    def uiTiles(self, value):
+        """see Board.__init__"""
+        self._uiTiles = value
+
     def sync(self, adding=None):
-        """place all tiles in HandBoard"""
-        allTiles = self.uiTiles[:]
+        """place all tiles in HandBoard. This is only done once for all
+        changes until the next frame, see LayoutScheduler"""
         if adding:
-            allTiles.extend(adding)
+            self.__adding.extend(x for x in adding if x not in self.__adding)
+        self.__lastAdding = adding
+        LayoutScheduler.schedule(self, self.__layout)
+
+    @timed('HandBoard.sync')
+    def __layout(self):
+        """place all tiles in HandBoard"""
+        adding = self.__lastAdding
+        allTiles = self._uiTiles[:]
+        allTiles.extend(x for x in self.__adding if x.board is not self)
+        self.__adding = []
+        self.__lastAdding = None
         newTiles = self.placeTiles(allTiles)
         source = adding if adding else newTiles
         focusCandidates = [x for x in source if x.focusable and x.tile.isConcealed]
@@ -344,12 +372,24 @@ class PlayingHandBoard(HandBoard):
         Internal.scene.handSelectorChanged(self)
         self.hasLogicalFocus = bool(adding)
 
-    @Board.focusTile.setter
-    def focusTile(self, uiTile):  # pylint: disable=arguments-differ
+    @property
+    def focusTile(self):
+        """do a pending layout first"""
+        LayoutScheduler.flush(self)
+        return Board.focusTile.fget(self)
+
+    @focusTile.setter
+    def focusTile(self, uiTile):
         Board.focusTile.fset(self, uiTile)
         if self.player and Internal.scene.clientDialog:
             Internal.scene.clientDialog.focusTileChanged()
 
+    def hide(self):
+        """a pending layout is no longer needed"""
+        LayoutScheduler.forget(self)
+        self.__adding = []
+        HandBoard.hide(self)
+
     def setEnabled(self, enabled):
         """enable/disable this board"""
         if isAlive(self):
@@ -753,6 +753,8 @@ class HumanClient(Client):
         """the game is over"""
         def yes(unused):
             """now that the user clicked the 'game over' prompt away, clean up"""
+            if Internal.sceneStats:
+                Internal.sceneStats.write()
             if self.game:
                 self.game.rotateWinds()
                 self.game.close().addCallback(Internal.mainWindow.close)
@@ -36,6 +36,9 @@ class AIDefaultAI:
         """return our name"""
         return self.__class__.__name__[2:]
 
+    def clearCache(self):
+        """virtual: forget whatever was cached for the current hand"""
+
     @staticmethod
     def weighSameColors(unusedAiInstance, candidates):
         """weigh tiles of same group against each other"""
@@ -197,7 +200,10 @@ class AIDefaultAI:
     @staticmethod
     def weighCallingHand(aiInstance, candidates):
         """if we can get a calling hand, prefer that"""
+        callingDiscards = candidates.hand.callingDiscards
         for candidate in candidates:
+            if candidate.tile.concealed not in callingDiscards:
+                continue
             newHand = candidates.hand - candidate.tile.concealed
             winningTiles = newHand.chancesToWin()
             if winningTiles:
@@ -15,7 +15,6 @@ SPDX-License-Identifier: GPL-2.0
 # signal.signal(signal.SIGINT, signal.SIG_DFL)
 import sys
 import os
-import logging
 
 from qt import QObject, QCommandLineParser, QCommandLineOption, Qt, QGuiApplication
 from qtpy import QT5
@@ -23,6 +22,7 @@ from kde import KApplication
 from mi18n import i18n, MLocale
 
 from common import Options, SingleshotOptions, Internal, Debug
+from logwriter import logQueued, logShutdown
 # do not import modules using twisted before our reactor is running
 
 def initRulesets():
@@ -95,6 +95,11 @@ def defineOptions():
     option('rulesets', i18n('show all available rulesets'), optName='showRulesets')
     option('game', i18n('for testing purposes: Initializes the random generator'),
            'seed(/firsthand)(..(lasthand))', '0')
+    option('audio', i18n('play sounds with AUDIO: auto, qt, ogg123 or null'), 'AUDIO', 'auto')
+    option('scenestats', i18n('write rendering statistics to FILE when the game is over. Intended only for testing'),
+           'FILE', '', optName='sceneStats')
+    option('layouts', i18n('do at most LAYOUTS hand layouts per frame, 0 is unlimited. Intended only for testing'),
+           'LAYOUTS', '0', argType=int, optName='layoutsPerFrame')
     option('nogui', i18n('show no graphical user interface. Intended only for testing'), optName='gui')
     option('socket', i18n('use a dedicated server listening on SOCKET. Intended only for testing'), 'SOCKET', '')
     option('port', i18n('use a dedicated server listening on PORT. Intended only for testing'), 'PORT', '')
@@ -112,8 +117,8 @@ def parseOptions():
             if option.optName == 'debug':
                 msg = Debug.setOptions(value)
                 if msg:
-                    Internal.logger.debug(msg)
-                    logging.shutdown()
+                    logQueued(msg)
+                    logShutdown()
                     sys.exit(2)
                 continue
             if option.optName in SingleshotOptions.__dict__:
@@ -167,7 +172,7 @@ if Debug.neutral:
 
 if Debug.locate:
     # this has been read before Debug.locate is set
-    Internal.logger.debug('Configuration in %s', Internal.kajonggrc.path)
+    logQueued('Configuration in {}'.format(Internal.kajonggrc.path))
 
 if Debug.events:
     EVHANDLER = EvHandler()
@@ -176,11 +181,14 @@ if Debug.events:
 from config import SetupPreferences
 SetupPreferences()
 
+if Options.sceneStats:
+    from scenestats import SceneStatistics
+    Internal.sceneStats = SceneStatistics(Options.sceneStats)
+
 if Options.csv:
     if gitHead() == 'current':
-        Internal.logger.debug(
-            'You cannot write to %s with changes uncommitted to git',
-            Options.csv)
+        logQueued(
+            'You cannot write to {} with changes uncommitted to git'.format(Options.csv))
         sys.exit(2)
 from mainwindow import MainWindow
 if QT5:
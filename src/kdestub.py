@@ -39,6 +39,7 @@ from mi18n import MLocale, KDETranslator, i18n, i18nc
 
 from common import Internal, isAlive, Debug
 from util import popenReadlines
+from logwriter import logQueued
 from statesaver import StateSaver
 
 if os.name != 'nt':
@@ -77,7 +78,7 @@ class KApplication(QApplication):
             self.installTranslator(translator)
             self.translators.append(translator)
             if Debug.i18n:
-                Internal.logger.debug('Installed Qt translator from %s', qmName)
+                logQueued('Installed Qt translator from {}'.format(qmName))
 
 
     def initQtTranslator(self):
@@ -8,18 +8,17 @@ SPDX-License-Identifier: GPL-2.0
 """
 
 import logging
-import os
 import string
 
-from locale import getpreferredencoding
 from sys import _getframe
 
 # util must not import twisted or we need to change kajongg.py
 
 from common import Internal, Debug # pylint: disable=redefined-builtin
 from qt import Qt, QEvent
-from util import elapsedSince, traceback, gitHead, callers
+from util import traceback, callers
 from mi18n import i18n
+from logwriter import LazyText, LogRecord, LogWriter
 from dialogs import Sorry, Information, NoPrompt
 
 
@@ -66,36 +65,45 @@ def id4(obj):
         return obj.uid
     return '.' if Debug.neutral else Fmt.num_encode(id(obj))
 
+def __fmtTemplate(text):
+    """For something like {self} return 'self:{self}'"""
+    if '}' not in text:
+        return text
+    parts = []
+    for part in text.split('}'):
+        if '{' not in part:
+            parts.append(part)
+        else:
+            part2 = part.split('{')
+            if part2[1] == 'callers':
+                if part2[0]:
+                    parts.append('%s:{%s}' % (part2[0], part2[1]))
+                else:
+                    parts.append('{%s}' % part2[1])
+            else:
+                showName = part2[1] + ':'
+                if showName.startswith('_hide'):
+                    showName = ''
+                if showName.startswith('self.'):
+                    showName = showName[5:]
+                parts.append('%s%s{%s}' % (part2[0], showName, part2[1]))
+    return ''.join(parts)
+
+__fmtTemplates = {}
+
 def fmt(text, **kwargs):
     """use the context dict for finding arguments.
     For something like {self} output 'self:selfValue'"""
-    if '}' in text:
-        parts = []
-        for part in text.split('}'):
-            if '{' not in part:
-                parts.append(part)
-            else:
-                part2 = part.split('{')
-                if part2[1] == 'callers':
-                    if part2[0]:
-                        parts.append('%s:{%s}' % (part2[0], part2[1]))
-                    else:
-                        parts.append('{%s}' % part2[1])
-                else:
-                    showName = part2[1] + ':'
-                    if showName.startswith('_hide'):
-                        showName = ''
-                    if showName.startswith('self.'):
-                        showName = showName[5:]
-                    parts.append('%s%s{%s}' % (part2[0], showName, part2[1]))
-        text = ''.join(parts)
-    argdict = _getframe(1).f_locals
+    if text not in __fmtTemplates:
+        __fmtTemplates[text] = __fmtTemplate(text)
+    text = __fmtTemplates[text]
+    # a copy: the LogWriter thread formats it later
+    argdict = dict(_getframe(1).f_locals)
     argdict.update(kwargs)
     if 'self' in argdict:
         # formatter.format will not accept 'self' as keyword
-        argdict['SELF'] = argdict['self']
-        del argdict['self']
-    return Fmt.formatter.format(text, **argdict)
+        argdict['SELF'] = argdict.pop('self')
+    return LazyText(text, formatter=Fmt.formatter, **argdict)
 
 
 def translateServerMessage(msg):
@@ -117,41 +125,8 @@ def dbgIndent(this, parent):
 
 
 def __logUnicodeMessage(prio, msg):
-    """if we can encode the str msg to ascii, do so.
-    Otherwise convert the str object into an utf-8 encoded
-    str object.
-    The logger module would log the str object with the
-    marker feff at the beginning of every message, we do not want that."""
-    msg = msg.encode(getpreferredencoding(), 'ignore')[:4000]
-    msg = msg.decode(getpreferredencoding())
-    Internal.logger.log(prio, msg)
-
-
-def __enrichMessage(msg, withGamePrefix=True):
-    """
-    Add some optional prefixes to msg: S/C, process id, time, git commit.
-
-    @param msg: The original message.
-    @type msg: C{str}
-    @param withGamePrefix: If set, prepend the game prefix.
-    @type withGamePrefix: C{Boolean}
-    @rtype: C{str}
-    """
-    result = msg  # set the default
-    if withGamePrefix and Internal.logPrefix:
-        result = '{prefix}{process}: {msg}'.format(
-            prefix=Internal.logPrefix,
-            process=os.getpid() if Debug.process else '',
-            msg=msg)
-    if Debug.time:
-        result = '{:08.4f} {}'.format(elapsedSince(Debug.time), result)
-    if Debug.git:
-        head = gitHead()
-        if head not in ('current', None):
-            result = 'git:{}/p3 {}'.format(head, result)
-    if int(Debug.callers):
-        result = '  ' + result
-    return result
+    """queue an additional line like a stack frame for LogWriter"""
+    LogWriter.put(LogRecord(prio, msg, enrich=False))
 
 
 def __exceptionToString(exception):
@@ -180,14 +155,23 @@ def __exceptionToString(exception):
     return ' '.join(parts)
 
 
+def messageText(msg):
+    """the str for msg. For log records, the LogWriter thread does this"""
+    if isinstance(msg, Exception):
+        msg = __exceptionToString(msg)
+    return translateServerMessage(str(msg))
+
+
 def logMessage(msg, prio, showDialog, showStack=False, withGamePrefix=True):
     """writes info message to log and to stdout"""
     # pylint: disable=R0912
-    if isinstance(msg, Exception):
-        msg = __exceptionToString(msg)
-    msg = str(msg)
-    msg = translateServerMessage(msg)
-    __logUnicodeMessage(prio, __enrichMessage(msg, withGamePrefix))
+    showDialog = showDialog and not Internal.isServer
+    if showDialog:
+        # the dialog needs it now
+        msg = messageText(msg)
+    LogWriter.put(LogRecord(
+        prio, msg, withGamePrefix=withGamePrefix,
+        convert=None if showDialog else messageText))
     if showStack:
         if showStack is True:
             lower = 2
@@ -198,7 +182,10 @@ def logMessage(msg, prio, showDialog, showStack=False, withGamePrefix=True):
                 __logUnicodeMessage(prio, '  ' + line.strip())
     if int(Debug.callers):
         __logUnicodeMessage(prio, callers(int(Debug.callers)))
-    if showDialog and not Internal.isServer:
+    if prio >= logging.ERROR:
+        # the caller might end the process right now
+        LogWriter.flush()
+    if showDialog:
         return Information(msg) if prio == logging.INFO else Sorry(msg, always=True)
     return NoPrompt(msg)
 
@@ -218,7 +205,7 @@ def logDebug(msg, showStack=False, withGamePrefix=True, btIndent=None):
     if btIndent is set, message is indented by depth(backtrace)-btIndent"""
     if btIndent:
         depth = traceback.extract_stack()
-        msg = ' ' * (len(depth) - btIndent) + msg
+        msg = LazyText('{}{}', ' ' * (len(depth) - btIndent), msg)
     return logMessage(msg, logging.DEBUG, False, showStack=showStack, withGamePrefix=withGamePrefix)
 
 
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2008-2016 Wolfgang Rohdewald <wolfgang@rohdewald.de>
+
+SPDX-License-Identifier: GPL-2.0
+
+The background writer for log records. This does not import twisted
+(directly or not), so modules which run before the reactor is installed
+like mi18n and kdestub can log through the same queue as everybody else.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import string
+import threading
+import time
+import traceback
+
+from locale import getpreferredencoding
+
+from common import Internal, Debug
+from util import elapsedSince, gitHead
+
+
+class ProcessInfo:
+
+    """what every log line of this process may show. Finding the git
+    commit needs several git subprocesses, so we do that only once"""
+
+    __gitHead = False  # False means not yet asked
+    pid = os.getpid()
+
+    @classmethod
+    def gitHead(cls):
+        """the git commit as returned by util.gitHead, cached"""
+        if cls.__gitHead is False:
+            cls.__gitHead = gitHead()
+        return cls.__gitHead
+
+    @classmethod
+    def afterFork(cls):
+        """the child process has another pid"""
+        cls.pid = os.getpid()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=ProcessInfo.afterFork)
+
+
+class LazyText:
+
+    """a text which is only built when the LogWriter thread writes it.
+    The arguments must not change after logging"""
+
+    __slots__ = ('template', 'args', 'kwargs', 'formatter')
+    plainFormatter = string.Formatter()
+
+    def __init__(self, template, *args, formatter=None, **kwargs):
+        self.template = template
+        self.args = args
+        self.kwargs = kwargs
+        self.formatter = formatter or self.plainFormatter
+
+    def __str__(self):
+        return self.formatter.vformat(self.template, self.args, self.kwargs)
+
+
+class LogRecord:
+
+    """what the caller knows about a message. Everything else is done by
+    the LogWriter thread, including making a str out of msg with
+    convert or str()"""
+
+    __slots__ = ('prio', 'msg', 'convert', 'enrich', 'prefix', 'created', 'elapsed')
+
+    def __init__(self, prio, msg, enrich=True, withGamePrefix=True, convert=None):
+        self.prio = prio
+        self.msg = msg
+        self.convert = convert
+        self.enrich = enrich
+        self.prefix = Internal.logPrefix if enrich and withGamePrefix else ''
+        self.created = time.time()
+        self.elapsed = elapsedSince(Debug.time) if Debug.time else None
+
+    def message(self):
+        """msg as a str. Only called in the LogWriter thread"""
+        if self.convert:
+            self.msg = self.convert(self.msg)
+            self.convert = None
+        elif not isinstance(self.msg, str):
+            self.msg = str(self.msg)
+        return self.msg
+
+    def text(self):
+        """
+        Add some optional prefixes to msg: S/C, process id, time, git commit.
+        Encode to the preferred encoding: the logger module would log the
+        str object with the marker feff at the beginning of every message,
+        we do not want that.
+
+        @rtype: C{str}
+        """
+        result = self.message()
+        if self.enrich:
+            if self.prefix:
+                result = '{prefix}{process}: {msg}'.format(
+                    prefix=self.prefix,
+                    process=ProcessInfo.pid if Debug.process else '',
+                    msg=result)
+            if self.elapsed is not None:
+                result = '{:08.4f} {}'.format(self.elapsed, result)
+            if Debug.git:
+                head = ProcessInfo.gitHead()
+                if head not in ('current', None):
+                    result = 'git:{}/p3 {}'.format(head, result)
+            if int(Debug.callers):
+                result = '  ' + result
+        result = result.encode(getpreferredencoding(), 'ignore')[:4000]
+        return result.decode(getpreferredencoding())
+
+    def json(self):
+        """for machine analysis: one JSON object, no formatting"""
+        return json.dumps(dict(
+            time=self.created, elapsed=self.elapsed, level=logging.getLevelName(self.prio),
+            prefix=self.prefix, pid=ProcessInfo.pid,
+            git=ProcessInfo.gitHead() if Debug.git else None, msg=self.message()))
+
+
+class LogWriter(threading.Thread):
+
+    """Formats and writes log records in the background. The caller only
+    pays for putting a LogRecord into a bounded queue. If the queue is
+    full, the caller waits: we never lose log lines.
+    With --debug=logJson:FILENAME, all records are also appended to
+    FILENAME as JSON lines."""
+
+    maxQueued = 10000
+    instance = None
+
+    def __init__(self):
+        threading.Thread.__init__(self, name='LogWriter', daemon=True)
+        self.queue = queue.Queue(self.maxQueued)
+        self.jsonFile = None
+        self.start()
+
+    @classmethod
+    def put(cls, record):
+        """queue record for writing"""
+        if cls.instance is None:
+            cls.instance = LogWriter()
+        cls.instance.queue.put(record)
+
+    @classmethod
+    def flush(cls):
+        """wait until everything is written"""
+        if cls.instance is not None:
+            cls.instance.queue.join()
+
+    @classmethod
+    def stop(cls):
+        """write the rest and end the thread"""
+        if cls.instance is not None:
+            instance = cls.instance
+            cls.instance = None
+            instance.queue.put(None)
+            instance.join()
+
+    @classmethod
+    def afterFork(cls):
+        """the thread of the parent process does not exist in the child"""
+        cls.instance = None
+
+    def run(self):
+        while True:
+            record = self.queue.get()
+            try:
+                if record is None:
+                    if self.jsonFile:
+                        self.jsonFile.close()
+                    return
+                self.write(record)
+            except Exception:  # pylint: disable=broad-except
+                # nowhere to log this, we must not stop writing
+                traceback.print_exc()
+            finally:
+                self.queue.task_done()
+
+    def write(self, record):
+        """write one record to the logger and to the JSON file"""
+        Internal.logger.log(record.prio, record.text())
+        if Debug.logJson:
+            if self.jsonFile is None:
+                self.jsonFile = open(Debug.logJson, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+            self.jsonFile.write(record.json())
+            self.jsonFile.write('\n')
+            if self.queue.empty():
+                self.jsonFile.flush()
+
+atexit.register(LogWriter.stop)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=LogWriter.afterFork)
+
+
+def logQueued(msg, prio=logging.DEBUG):
+    """for modules which may not import log. No game prefix"""
+    LogWriter.put(LogRecord(prio, msg, withGamePrefix=False))
+
+
+def logShutdown():
+    """write all queued records, then shut down logging. Use this before
+    leaving the process with os._exit(), which does not call atexit"""
+    LogWriter.stop()
+    logging.shutdown()
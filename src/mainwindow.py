@@ -16,9 +16,9 @@ from itertools import chain
 import cgitb
 import tempfile
 import webbrowser
-import logging
 
 from log import logError, logDebug
+from logwriter import logShutdown
 from common import Options, Internal, isAlive, Debug, handleSignals
 
 
@@ -482,7 +482,7 @@ class MainWindow(KXmlGuiWindow):
         except NameError:
             pass
         checkMemory()
-        logging.shutdown()
+        logShutdown()
         if Debug.quit:
             logDebug('aboutToQuit ending')
 
@@ -43,6 +43,13 @@ class Meld(TileList, StrMixin):
 
     __hash__ = None
     cache = {}
+    __slots__ = (
+        'case', 'key', 'isExposed', 'isConcealed', 'isSingle', 'isPair', 'isChow', 'isPung',
+        'isKong', 'isClaimedKong', 'isKnitted', 'isDragonMeld', 'isWindMeld', 'isHonorMeld',
+        'isBonus', 'isKnown', 'isPungKong', 'isDeclared', 'group', 'lowerGroup',
+        '__staticRules', '__dynamicRules', '__staticDoublingRules', '__dynamicDoublingRules',
+        '__hasRules', '__hasDoublingRules',
+        'concealed', 'exposed', 'declared', 'exposedClaimed', '_fixed')
 
     def __new__(cls, newContent=None):
         """try to use cache"""
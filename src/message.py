@@ -8,8 +8,9 @@ SPDX-License-Identifier: GPL-2.0
 """
 
 import datetime
+from base64 import b64decode
 
-from log import logWarning, logException, logDebug
+from log import logWarning, logException, logDebug, translateServerMessage, SERVERMARK
 from mi18n import i18n, i18nc, i18ncE
 from sound import Voice
 from tile import Tile, TileList
@@ -354,7 +355,7 @@ class MessageOriginalCall(NotifyAtOnceMessage, ServerMessage):
         """for the action button which will send this message"""
         assert isinstance(tile, Tile), tile
         myself = button.client.game.myself
-        isCalling = bool((myself.hand - tile).callingHands)
+        isCalling = tile.concealed in myself.hand.callingDiscards
         if not isCalling:
             txt = i18n(
                 'discarding %1 and declaring Original Call makes this hand unwinnable',
@@ -613,20 +614,27 @@ class MessageVoiceId(ServerMessage):
         if Internal.Preferences.useSounds and Options.gui:
             move.player.voice = Voice.locate(move.source)
             if not move.player.voice:
-                return Message.ClientWantsVoiceData, move.source
+                return Message.ClientWantsVoiceData, (move.source, Voice.partialSize(move.source))
         return None
 
 
 class MessageVoiceData(ServerMessage):
 
-    """we got voice sounds from the server, assign them to the player voice"""
+    """we got a chunk of voice sounds from the server. With the
+    last chunk, assign them to the player voice. If what we got
+    so far is unusable, ask for all of it again"""
 
     def clientAction(self, client, move):
         """server sent us voice sounds about somebody else"""
-        move.player.voice = Voice(move.md5sum, move.source)
-        if Debug.sound:
-            logDebug('%s gets voice data %s from server, language=%s' % (
-                move.player, move.player.voice, move.player.voice.language()))
+        voice = Voice.receiveChunk(
+            move.md5sum, move.offset, b64decode(move.source), move.size, move.archiveDigest)
+        if voice is False:
+            return Message.ClientWantsVoiceData, (move.md5sum, 0)
+        if voice:
+            move.player.voice = voice
+            if Debug.sound:
+                logDebug('%s gets voice data %s from server, language=%s' % (
+                    move.player, move.player.voice, move.player.voice.language()))
 
 
 class MessageAssignVoices(ServerMessage):
@@ -873,15 +881,19 @@ class ChatMessage(StrMixin):
         local = self.localtimestamp()
         # pylint: disable=no-member
         # pylint says something about NotImplemented, check with later versions
-        _ = i18n(self.message)
-        if self.isStatusMessage:
-            _ = '[{}]'.format(_)
         return '%02d:%02d:%02d %s: %s' % (
             local.hour,
             local.minute,
             local.second,
             self.fromUser,
-            i18n(self.message))
+            self.translated())
+
+    def translated(self):
+        """the message in the local language. Status messages
+        from the server may have arguments, see srvMessage"""
+        if SERVERMARK in self.message:
+            return translateServerMessage(self.message)
+        return i18n(self.message)
 
     def asList(self):
         """encode me for network transfer"""
@@ -28,6 +28,7 @@ from qt import *
 
 from common import Internal, Debug
 from util import uniqueList
+from logwriter import logQueued
 
 import gettext
 
@@ -186,7 +187,7 @@ class MLocale:
         languages = cls.currentLanguages()
         cls.translation = gettext.NullTranslations()
         if Debug.i18n:
-            Internal.logger.debug('Trying to install translations for %s', ','.join(languages))
+            logQueued('Trying to install translations for {}'.format(','.join(languages)))
         for language in languages:
             for context in ('kajongg', 'libkmahjongg5', 'kxmlgui5', 'kconfigwidgets5', 'libc'):
                 directories = cls.localeDirectories()
@@ -195,12 +196,12 @@ class MLocale:
                         cls.translation.add_fallback(gettext.translation(
                             context, resourceDir, languages=[language]))
                         if Debug.i18n:
-                            Internal.logger.debug(
-                                'Found %s translation for %s in %s', language, context, resourceDir)
+                            logQueued('Found {} translation for {} in {}'.format(
+                                language, context, resourceDir))
                         break
                     except IOError as _:
                         if Debug.i18n:
-                            Internal.logger.debug(str(_))
+                            logQueued(str(_))
         cls.translation.install()
 
     @staticmethod
@@ -211,7 +212,7 @@ class MLocale:
             os.path.join(os.path.dirname(sys.argv[0]), 'share/locale'))
         result = [x for x in candidates if os.path.exists(x)]
         if not result and Debug.i18n:
-            Internal.logger.debug('no locale path found. We have:%s', os.listdir('.'))
+            logQueued('no locale path found. We have:{}'.format(os.listdir('.')))
 
         if LOCALEPATH and os.path.exists(LOCALEPATH):
             result.insert(0, LOCALEPATH)
@@ -257,7 +258,7 @@ class MLocale:
                 else:
                     result.append(localename)
         if Debug.i18n:
-            Internal.logger.debug('get_localenames: %s', format(','.join(result)))
+            logQueued('get_localenames: {}'.format(','.join(result)))
         return result
 
     @classmethod
@@ -274,8 +275,8 @@ class MLocale:
             if _[0]:
                 languages.append(_[0])
         if Debug.i18n:
-            Internal.logger.debug('languages from locale: %s', ','.join(languages) if languages else None)
-            Internal.logger.debug('looking for translations in %s', ','.join(cls.localeDirectories()))
+            logQueued('languages from locale: {}'.format(','.join(languages) if languages else None))
+            logQueued('looking for translations in {}'.format(','.join(cls.localeDirectories())))
         installed_languages = set()
         for resourceDir in cls.localeDirectories():
             installed_languages |= set(os.listdir(resourceDir))
@@ -289,7 +290,7 @@ class MLocale:
         if 'en_US' not in languages:
             languages.extend(['en_US', 'en'])
         if Debug.i18n:
-            Internal.logger.debug('languages available: %s', ':'.join(languages) if languages else None)
+            logQueued('languages available: {}'.format(':'.join(languages) if languages else None))
         cls.__cached_availableLanguages = ':'.join(languages)
         return cls.__cached_availableLanguages
 
@@ -319,6 +320,6 @@ class MLocale:
             _ = os.path.join(directory, lang, 'LC_MESSAGES', 'kajongg.mo')
             if os.path.exists(_):
                 if Debug.i18n:
-                    Internal.logger.debug('language %s installed in %s', lang, _)
+                    logQueued('language {} installed in {}'.format(lang, _))
                 return True
         return False
@@ -109,7 +109,9 @@ class Resource:
 
     def __init__(self, unusedName):
         """continue __build"""
-        self.group = KConfig(self.path).group(self.configGroupName)
+        # the group only holds a weakref to its config
+        self.config = KConfig(self.path)
+        self.group = self.config.group(self.configGroupName)
 
         self.name = self.group.readEntry("Name") or i18n("unknown name")
         self.author = self.group.readEntry("Author") or i18n("unknown author")
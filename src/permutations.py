@@ -97,13 +97,14 @@ class Permutations:
     colorPermCache = {}
 
     @classmethod
-    def usefulPermutations(cls, values):
+    def usefulPermutations(cls, color, values):
         """return all variants usable for standard MJ formt (4 melds plus 1 pair),
         and also the variant with the most pungs. At least one will be returned.
-        This is meant for the standard MJ format (4 pungs/kongs/chows plus 1 pair)"""
-        values = tuple(values)
-        if values not in cls.colorPermCache:
-            variants = cls.permute(values)
+        This is meant for the standard MJ format (4 pungs/kongs/chows plus 1 pair).
+        The variants are lists of Meld in color"""
+        cacheKey = (color, tuple(values))
+        if cacheKey not in cls.colorPermCache:
+            variants = cls.permute(cacheKey[1])
             result = []
             maxPungs = -1
             maxPungVariant = minMeldVariant = None
@@ -126,15 +127,28 @@ class Permutations:
             if not result:
                 # if nothing seems useful, return all possible permutations
                 result.extend(variants)
-            cls.colorPermCache[values] = tuple(result)
-        return cls.colorPermCache[values]
+            # building the Melds costs more than finding the variants
+            cls.colorPermCache[cacheKey] = tuple(
+                [Meld(Tile(color, x) for x in meld) for meld in variant] for variant in result)
+        return cls.colorPermCache[cacheKey]
 
     @classmethod
     def __colorVariants(cls, color, values):
         """generates all possible meld variants out of original
         where values is a string like '113445'.
         Returns lists of Meld"""
-        allValues = sorted(values)
+        combinations = [cls.usefulPermutations(color, x) for x in cls.__groups(sorted(values))]
+        result = []
+        for variant in itertools.product(*combinations):
+            melds = sum(variant, [])
+            if melds:
+                result.append(melds)
+        return result
+
+    @staticmethod
+    def __groups(allValues):
+        """split sorted values where there is a gap: no meld can span it"""
+        allValues = list(allValues)
         vSet = set(allValues)
         groups = []
         for border in sorted(x + 1 for x in sorted(vSet) if x + 1 not in vSet):
@@ -142,13 +156,23 @@ class Permutations:
             if content:
                 groups.append(content)
                 allValues = [x for x in allValues if x > border]
-        combinations = [cls.usefulPermutations(x) for x in groups]
-        result = []
-        for variant in itertools.product(*combinations):
-            melds = []
-            for block in variant:
-                for meld in block:
-                    melds.append(Meld(Tile(color, x) for x in meld))
-            if melds:
-                result.append(melds)
-        return result
+        return groups
+
+    meldCountsCache = {}
+
+    @classmethod
+    def meldCounts(cls, values):
+        """values is a sorted tuple of int, range 1..9, from one color.
+        Returns a frozenset of (melds, chows) for every way of grouping
+        them into melds without singles, like rearranging does.
+        An empty frozenset means there is no such way"""
+        if values not in cls.meldCountsCache:
+            result = {(0, 0)}
+            for group in cls.__groups(values):
+                groupCounts = {
+                    (len(variant), sum(len(set(meld)) == 3 for meld in variant))
+                    for variant in cls.permute(tuple(group))
+                    if all(len(meld) > 1 for meld in variant)}
+                result = {(x[0] + y[0], x[1] + y[1]) for x in result for y in groupCounts}
+            cls.meldCountsCache[values] = frozenset(result)
+        return cls.meldCountsCache[values]
@@ -8,10 +8,9 @@ SPDX-License-Identifier: GPL-2.0
 """
 
 import weakref
-from collections import defaultdict
 
 from log import logException, logWarning
-from mi18n import i18n, i18nc, i18nE
+from mi18n import i18nc, i18nE
 from common import IntDict, Debug
 from common import StrMixin, Internal
 from wind import East
@@ -23,6 +22,7 @@ from permutations import Permutations
 from message import Message
 from hand import Hand
 from intelligence import AIDefaultAI
+from dangerous import Dangerous
 
 
 class Players(list, StrMixin):
@@ -151,6 +151,11 @@ class Player(StrMixin):
             return False
         return self.name < other.name
 
+    @property
+    def handEvaluations(self):
+        """shared with other games in this process"""
+        return self.game.handEvaluations if self.game else None
+
     def clearCache(self):
         """clears the cache with Hands"""
         if Debug.hand and self.handCache:
@@ -158,6 +163,7 @@ class Player(StrMixin):
                 '%s: cache hits:%d misses:%d' %
                 (self, self.cacheHits, self.cacheMisses))
         self.handCache.clear()
+        self.intelligence.clearCache()
         Permutations.cache.clear()
         self.cacheHits = 0
         self.cacheMisses = 0
@@ -200,7 +206,7 @@ class Player(StrMixin):
         self.__mayWin = True
         self.__payment = 0
         self.originalCall = False
-        self.dangerousTiles = list()
+        self.dangerousTiles = {}
         self.claimedNoChoice = False
         self.playedDangerous = False
         self.usedDangerousFrom = None
@@ -475,6 +481,42 @@ class Player(StrMixin):
         return False
 
 
+class Sayable(dict):
+
+    """what the player may legally say as answer to move. Maps
+    messages to the arguments for the answer, False or None mean
+    he may not say it. An entry is only computed when first asked
+    for, and all entries are forgotten if the hand changes"""
+
+    def __init__(self, player, move, answers):
+        dict.__init__(self)
+        self._player = weakref.ref(player)
+        self.move = move
+        self.answers = answers
+        self.__hand = None
+
+    @property
+    def player(self):
+        """hide weakref"""
+        return self._player()
+
+    def __getitem__(self, message):
+        hand = self.player.hand
+        if hand is not self.__hand:
+            self.clear()
+            self.__hand = hand
+        return dict.__getitem__(self, message)
+
+    def __missing__(self, message):
+        player = self.player
+        if message in self.answers and message in player.sayables:
+            result = player.sayables[message](player, self.move)
+        else:
+            result = True
+        self[message] = result
+        return result
+
+
 class PlayingPlayer(Player):
 
     """a player in a computer game as opposed to a ScoringPlayer"""
@@ -606,14 +648,13 @@ class PlayingPlayer(Player):
 
     def __maySayOriginalCall(self, unusedMove):
         """return True if Original Call is possible"""
-        for tileName in sorted(set(self.concealedTiles)):
-            newHand = self.hand - tileName
-            if newHand.callingHands:
-                if Debug.originalCall:
-                    self.game.debug(
-                        '%s may say Original Call by discarding %s from %s' %
-                        (self, tileName, self.hand))
-                return True
+        callingDiscards = self.hand.callingDiscards
+        if callingDiscards:
+            if Debug.originalCall:
+                self.game.debug(
+                    '%s may say Original Call by discarding %s from %s' %
+                    (self, min(callingDiscards), self.hand))
+            return True
         return False
 
     sayables = {
@@ -624,13 +665,9 @@ class PlayingPlayer(Player):
         Message.OriginalCall: __maySayOriginalCall}
 
     def computeSayable(self, move, answers):
-        """find out what the player can legally say with this hand"""
-        self.sayable = {}
-        for message in Message.defined.values():
-            if message in answers and message in self.sayables:
-                self.sayable[message] = self.sayables[message](self, move)
-            else:
-                self.sayable[message] = True
+        """find out what the player can legally say with this hand.
+        This is only done when asked for, see Sayable"""
+        self.sayable = Sayable(self, move, answers)
 
     def maybeDangerous(self, msg):
         """could answering with msg lead to dangerous game?
@@ -797,43 +834,44 @@ class PlayingPlayer(Player):
         return meld
 
     def findDangerousTiles(self):
-        """update the list of dangerous tile"""
-        pName = self.localName
-        dangerous = list()
+        """update the dangerous tiles: for each tile a bit mask
+        with the reasons, see L{Dangerous}"""
+        dangerous = {}
         expMeldCount = len(self._exposedMelds)
+        # visibleTiles may hold tiles with count 0
+        visible = [x for x, count in self.visibleTiles.items() if count]
         if expMeldCount >= 3:
-            if all(x in elements.greenHandTiles for x in self.visibleTiles):
-                dangerous.append((elements.greenHandTiles,
-                                  i18n('Player %1 has 3 or 4 exposed melds, all are green', pName)))
-            group = list(defaultdict.keys(self.visibleTiles))[0].group
-            # see https://www.logilab.org/ticket/23986
+            if all(x in elements.greenHandTiles for x in visible):
+                Dangerous.mark(dangerous, elements.greenHandTiles, Dangerous.GreenHand)
+            group = visible[0].group
             assert group.islower(), self.visibleTiles
             if group in Tile.colors:
-                if all(x.group == group for x in self.visibleTiles):
+                if all(x.group == group for x in visible):
                     suitTiles = {Tile(group, x) for x in Tile.numbers}
                     if self.visibleTiles.count(suitTiles) >= 9:
-                        dangerous.append(
-                            (suitTiles, i18n('Player %1 may try a True Color Game', pName)))
-                elif all(x.value in Tile.terminals for x in self.visibleTiles):
-                    dangerous.append((elements.terminals,
-                                      i18n('Player %1 may try an All Terminals Game', pName)))
+                        Dangerous.mark(dangerous, suitTiles, Dangerous.TrueColor)
+                elif all(x.value in Tile.terminals for x in visible):
+                    Dangerous.mark(dangerous, elements.terminals, Dangerous.Terminals)
         if expMeldCount >= 2:
-            windMelds = sum(self.visibleTiles[x] >= 3 for x in elements.winds)
+            windMelds = sum(self.visibleTiles.count([x]) >= 3 for x in elements.winds)
             dragonMelds = sum(
-                self.visibleTiles[x] >= 3 for x in elements.dragons)
+                self.visibleTiles.count([x]) >= 3 for x in elements.dragons)
             windsDangerous = dragonsDangerous = False
             if windMelds + dragonMelds == expMeldCount and expMeldCount >= 3:
                 windsDangerous = dragonsDangerous = True
             windsDangerous = windsDangerous or windMelds >= 3
             dragonsDangerous = dragonsDangerous or dragonMelds >= 2
             if windsDangerous:
-                dangerous.append(
-                    ({x for x in elements.winds if x not in self.visibleTiles},
-                     i18n('Player %1 exposed many winds', pName)))
+                Dangerous.mark(
+                    dangerous, (x for x in elements.winds if x not in self.visibleTiles),
+                    Dangerous.Winds)
             if dragonsDangerous:
-                dangerous.append(
-                    ({x for x in elements.dragons if x not in self.visibleTiles},
-                     i18n('Player %1 exposed many dragons', pName)))
+                Dangerous.mark(
+                    dangerous, (x for x in elements.dragons if x not in self.visibleTiles),
+                    Dangerous.Dragons)
         self.dangerousTiles = dangerous
         if dangerous and Debug.dangerousGame:
-            self.game.debug('dangerous:%s' % dangerous)
+            reasons = 0
+            for mask in dangerous.values():
+                reasons |= mask
+            self.game.debug('dangerous:%s' % ' / '.join(Dangerous.texts([(reasons, self)])))
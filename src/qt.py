@@ -68,6 +68,7 @@ from qtpy.QtWidgets import QGridLayout
 from qtpy.QtWidgets import QHBoxLayout
 from qtpy.QtWidgets import QHeaderView
 from qtpy.QtGui import QIcon
+from qtpy.QtGui import QImage
 from qtpy.QtGui import QImageReader
 from qtpy.QtCore import QItemSelectionModel
 from qtpy.QtWidgets import QLabel
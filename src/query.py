@@ -396,6 +396,8 @@ class PrepareDB:
                     Query('UPDATE general SET schemaversion=?', (version,))
                 logInfo(i18n('Database %1 updated from schema %2 to %3',
                              Internal.db.path, currentVersion, version), showDialog=True)
+            with Internal.db:  # transaction
+                self.createIndexes()
         except sqlite3.Error as exc:
             logException('opening %s: %s' % (self.path, exc.message))
         finally:
@@ -427,10 +429,7 @@ class PrepareDB:
         """creates empty tables"""
         for table in ['player', 'game', 'score', 'ruleset', 'rule', 'general']:
             cls.createTable(table)
-        cls.createIndex('idxgame', 'score(game)')
-        # this makes finding suspended games much faster in the presence
-        # of many test games (with autoplay=1)
-        cls.createIndex('idxautoplay', 'game(autoplay)')
+        cls.createIndexes()
 
         if Internal.isServer:
             Query('ALTER TABLE player add password text')
@@ -438,6 +437,17 @@ class PrepareDB:
             cls.createTable('passwords')
             cls.createTable('server')
 
+    @classmethod
+    def createIndexes(cls):
+        """create all missing indexes"""
+        cls.createIndex('idxgame', 'score(game)')
+        # this makes finding suspended games much faster in the presence
+        # of many test games (with autoplay=1)
+        cls.createIndex('idxautoplay', 'game(autoplay)')
+        # for the pages of the games dialog: game ids of unfinished games
+        # without seed come ordered by id from this index
+        cls.createIndex('idxseedendtime', 'game(seed,endtime)')
+
     @staticmethod
     def createIndex(name, cmd):
         """only try to create it if it does not yet exist. Do not use create if not exists because
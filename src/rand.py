@@ -13,73 +13,138 @@ from random import Random
 from util import callers
 from common import Debug
 
-class CountRandomCalls:
 
-    """a helper class for logging count of random calls"""
+class GameRandom(Random):
 
-    def __init__(self, rnd, what):
-        self.rnd = rnd
-        self.what = what
-        self.oldCount = CountingRandom.count
+    """The random generator of a game. This is what we use unless
+    --debug=random is given, so do not add anything here: every call
+    should directly be the one from Random"""
 
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc_value, trback):
-        if Debug.random:
-            self.rnd.game.debug(
-                '{} out of {} calls to random by {} from {}'.format(
-                    CountingRandom.count - self.oldCount,
-                    CountingRandom.count,
-                    self.what,
-                    callers()))
+    def random(self):
+        """Only defined because Random then also derives randrange, choice,
+        shuffle and sample from random() instead of from getrandbits().
+        Kajongg always did it that way, and the games for a given seed
+        must remain the same"""
+        return Random.random(self)
 
+    def choice(self, seq):
+        """Choose a random element from a non-empty sequence.
+        Do not draw a random number if there is only one element:
+        all games ever played by kajongg depend on this"""
+        if len(seq) == 1:
+            return seq[0]
+        return Random.choice(self, seq)
 
-class CountingRandom(Random):
 
-    """counts how often random() is called and prints debug info"""
+class TracingRandom(GameRandom):
 
-    count = 0
+    """Installed for --debug=random. Every draw is logged and recorded in
+    a compact form: seed, name of the method, size of the population and
+    the result where it is small. With the same seed, replay() repeats
+    exactly the same draws, so two runs can be compared draw by draw"""
 
     def __init__(self, game, value=None):
         self._game = weakref.ref(game)
-        Random.__init__(self, value)
-        CountingRandom.count = 0
+        self.draws = None
+        self.__nested = 0
+        GameRandom.__init__(self, value)
+        self.draws = []
 
     @property
     def game(self):
         """hide the fact that game is a weakref"""
         return self._game()
 
-    def random(self):
-        """the central randomizator"""
-        CountingRandom.count += 1
-        return Random.random(self)
+    def __draw(self, method, *args, **kwargs):
+        """call method of GameRandom. Calls to random() from within
+        are not recorded, replaying method repeats them"""
+        self.__nested += 1
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.__nested -= 1
+
+    def __record(self, entry, withLog=True):
+        """append to draws and tell the debug log"""
+        self.draws.append(entry)
+        if withLog:
+            self.game.debug('random #{}: {} from {}'.format(
+                len(self.draws), ' '.join(str(x) for x in entry), callers()))
 
     def seed(self, a=None, version=2):
-        CountingRandom.count = 0
-        Random.seed(self, a, version)
-        if Debug.random:
-            self.game.debug('Random gets seed %s' % a)
+        GameRandom.seed(self, a, version)
+        if self.draws is not None:
+            # not when called by Random.__init__
+            self.__record(('seed', a))
+
+    def random(self):
+        """the central randomizator"""
+        result = GameRandom.random(self)
+        if not self.__nested:
+            # no log: Game.seed calls this while there is no handId yet
+            self.__record(('random', result), withLog=False)
+        return result
 
     def randrange(self, start, stop=None, step=1):
-        with CountRandomCalls(self, 'randrange({},{},step={})'.format(
-            start, stop, step)):
-            return Random.randrange(self, start, stop, step)
+        result = self.__draw(GameRandom.randrange, start, stop, step)
+        self.__record(('randrange', start, stop, step, result))
+        return result
 
     def choice(self, seq):
-        """Choose a random element from a non-empty sequence."""
+        """Choose a random element from a non-empty sequence.
+        Record the drawn index: seq.index() would find the first
+        of equal elements"""
+        if not seq:
+            raise IndexError('Cannot choose from an empty sequence')
         if len(seq) == 1:
-            return seq[0]
-        with CountRandomCalls(self, 'choice({})'.format(seq)):
-            return Random.choice(self, seq)
+            index = 0
+        else:
+            # this is what Random.choice does
+            index = self.__draw(GameRandom.randrange, len(seq))
+        self.__record(('choice', len(seq), index))
+        return seq[index]
 
     def sample(self, population, k, *, counts=None):
-        """add debug output to sample. Chooses k unique random elements"""
-        with CountRandomCalls(self, 'sample({}, {})'.format(population, k)):
-            return Random.sample(self, population, k, counts=counts)
+        """Chooses k unique random elements"""
+        if counts is not None:
+            # we do not record the counts, so we could not replay this
+            raise TypeError('TracingRandom.sample does not support counts')
+        result = self.__draw(GameRandom.sample, population, k)
+        self.__record(('sample', len(population), k))
+        return result
 
     def shuffle(self, x):
-        """add debug output to shuffle. Shuffles list x in place."""
-        with CountRandomCalls(self, 'shuffle({})'.format(x)):
-            Random.shuffle(self, x)
+        """Shuffles list x in place."""
+        self.__draw(GameRandom.shuffle, x)
+        self.__record(('shuffle', len(x)))
+
+    @staticmethod
+    def replay(draws):
+        """repeat draws with a new generator. Returns the index of the
+        first draw giving a different result, or None"""
+        rnd = GameRandom()
+        for idx, entry in enumerate(draws):
+            method, args = entry[0], entry[1:]
+            if method == 'seed':
+                rnd.seed(args[0])
+            elif method == 'random':
+                if rnd.random() != args[0]:
+                    return idx
+            elif method == 'randrange':
+                if rnd.randrange(*args[:3]) != args[3]:
+                    return idx
+            elif method == 'choice':
+                if rnd.choice(range(args[0])) != args[1]:
+                    return idx
+            elif method == 'sample':
+                rnd.sample(range(args[0]), args[1])
+            elif method == 'shuffle':
+                rnd.shuffle(list(range(args[0])))
+        return None
+
+
+def gameRandom(game):
+    """returns the random generator for game"""
+    if Debug.random:
+        return TracingRandom(game)
+    return GameRandom()
@@ -37,6 +37,11 @@ class RuleCode:
         This is used to find all winning hands which only need
         one tile: The calling hands (after calling)
 
+    discardCandidates(cls, hand):
+        For a hand with lenOffset 1, return all tiles in hand which
+        might leave a hand calling for this rule if discarded.
+        This may return too many but never too few.
+
     """
 
     cache = ()
@@ -49,11 +54,25 @@ class RuleCode:
 # pylint: disable=no-self-argument, no-self-use, no-value-for-parameter, no-member
 # pylint: disable=too-many-function-args, unused-argument, arguments-differ
 
+def onlyDiscard(hand, foreign):
+    """foreign are the tiles which cannot be in the winning hand.
+    We can discard one of them but not two"""
+    foreign = list(foreign)
+    if not foreign:
+        return set(hand.tilesInHand)
+    if len(foreign) > 1:
+        return set()
+    return {x for x in hand.tilesInHand if x.exposed is foreign[0].exposed}
+
+
 class MJRule(RuleCode):
 
     def computeLastMelds(hand):
         """return all possible last melds"""
 
+    def discardCandidates(hand):
+        return set(hand.tilesInHand)
+
 
 class DragonPungKong(RuleCode):
 
@@ -461,6 +480,71 @@ class StandardMahJongg(MJRule):
                         result.append(Tile(group, value + 1))
         return set(result)
 
+    def discardCandidates(cls, hand):
+        """this only looks at how many melds every suit can give.
+        Permutations caches that per suit, so all discards and all
+        waits share it for the suits they do not change"""
+        declaredMelds = hand.declaredMelds
+        if any(len(x) < 3 for x in declaredMelds):
+            # discarding moves them back into the hand
+            return set(hand.tilesInHand)
+        meldsWanted = 5 - len(declaredMelds)
+        chowsAllowed = hand.ruleset.maxChows - sum(x.isChow for x in declaredMelds)
+        lastMeld = hand.lastMeld
+        result = set()
+        for discard in set(hand.tilesInHand):
+            if lastMeld and lastMeld.isDeclared and discard.exposed in lastMeld.exposed:
+                # discarding moves lastMeld back into the hand
+                result.add(discard)
+                continue
+            rest = hand.tilesInHand[:]
+            rest.remove(discard)
+            if cls.mayWait(rest, meldsWanted, chowsAllowed):
+                result.add(discard)
+        return result
+
+    def mayWait(cls, rest, meldsWanted, chowsAllowed):
+        """could one more tile make meldsWanted melds out of rest?"""
+        honors = IntDict()
+        values = {x: [] for x in Tile.colors}
+        for tile in rest:
+            if tile.isHonor:
+                honors[tile.exposed] += 1
+            else:
+                values[tile.lowerGroup].append(tile.value)
+        meldCounts = {x: Permutations.meldCounts(tuple(sorted(y))) for x, y in values.items()}
+        badHonors = [x for x, y in honors.items() if y not in (2, 3)]
+        brokenColors = [x for x, y in meldCounts.items() if not y]
+        if len(badHonors) + len(brokenColors) > 1:
+            return False
+        if not brokenColors:
+            # wait for an honor making a pair or a pung
+            for honor in badHonors or list(honors):
+                if honors[honor] in (1, 2) and all(
+                        honors[x] in (2, 3) for x in honors if x is not honor):
+                    if cls.meldCountsFit(meldCounts.values(), meldsWanted - len(honors), chowsAllowed):
+                        return True
+        if badHonors:
+            return False
+        for color in brokenColors or list(values):
+            others = [y for x, y in meldCounts.items() if x != color]
+            colorValues = values[color]
+            for value in range(1, 10):
+                if any(abs(value - x) < 3 for x in colorValues):
+                    counts = Permutations.meldCounts(tuple(sorted(colorValues + [value])))
+                    if counts and cls.meldCountsFit(others + [counts], meldsWanted - len(honors), chowsAllowed):
+                        return True
+        return False
+
+    def meldCountsFit(meldCounts, meldsWanted, chowsAllowed):
+        """meldCounts holds for every color the possible (melds, chows).
+        Can they add up to meldsWanted melds with at most chowsAllowed chows?"""
+        sums = {(0, 0)}
+        for counts in meldCounts:
+            sums = {(x[0] + y[0], x[1] + y[1]) for x in sums for y in counts
+                    if x[1] + y[1] <= chowsAllowed}
+        return any(x[0] == meldsWanted for x in sums)
+
     def shouldTry(hand, maxMissing=10):
         return True
 
@@ -505,6 +589,13 @@ class WrigglingSnake(MJRule):
         return (len({x.exposed for x in hand.tiles}) + maxMissing > 12
                 and all(not x.isChow for x in hand.declaredMelds))
 
+    def discardCandidates(hand):
+        result = set()
+        for color in Tile.colors:
+            result |= onlyDiscard(hand, (
+                x for x in hand.tiles if x.lowerGroup not in (color, Tile.wind)))
+        return result
+
     def computeLastMelds(hand):
         return [hand.lastTile.pair] if hand.lastTile.value == 1 else [hand.lastTile.single]
 
@@ -577,6 +668,9 @@ class TripleKnitting(MJRule):
         triples.append(rest)
         return [Meld(x) for x in triples if hand.lastTile in x]
 
+    def discardCandidates(hand):
+        return onlyDiscard(hand, (x for x in hand.tiles if x.isHonor))
+
     def claimness(cls, hand, discard):
         result = IntDict()
         if cls.shouldTry(hand):
@@ -679,6 +773,14 @@ class Knitting(MJRule):
             hand.string, couples, rest)
         return [Meld(x) for x in couples if hand.lastTile in x]
 
+    def discardCandidates(hand):
+        result = set()
+        for color in Tile.colors:
+            # the winning hand has no tiles of color
+            result |= onlyDiscard(hand, (
+                x for x in hand.tiles if x.isHonor or x.lowerGroup == color))
+        return result
+
     def claimness(cls, hand, discard):
         result = IntDict()
         if cls.shouldTry(hand):
@@ -779,6 +881,9 @@ class AllPairHonors(MJRule):
     def computeLastMelds(hand):
         return [hand.lastTile.pair]
 
+    def discardCandidates(hand):
+        return onlyDiscard(hand, (x for x in hand.tiles if x.value in Tile.minors))
+
     def claimness(hand, discard):
         result = IntDict()
         if AllPairHonors.shouldTry(hand):
@@ -1007,6 +1112,12 @@ class GatesOfHeaven(StandardMahJongg):
     def computeLastMelds(hand):
         return [x for x in hand.melds if hand.lastTile in x]
 
+    def discardCandidates(hand):
+        result = set()
+        for color in Tile.colors:
+            result |= onlyDiscard(hand, (x for x in hand.tiles if x.lowerGroup != color))
+        return result
+
     def shouldTry(hand, maxMissing=None):
         if hand.declaredMelds:
             return False
@@ -1141,6 +1252,9 @@ class ThirteenOrphans(MJRule):
                 result[Message.Chow] = -999
         return result
 
+    def discardCandidates(hand):
+        return onlyDiscard(hand, (x for x in hand.tiles if x.value in Tile.minors))
+
     def appliesToHand(hand):
         return {x.exposed for x in hand.tiles} == elements.majors
 
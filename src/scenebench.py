@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2009-2016 Wolfgang Rohdewald <wolfgang@rohdewald.de>
+
+SPDX-License-Identifier: GPL-2.0
+
+Measure rendering while robots play: start kajongg in demo mode
+without a display (QT_QPA_PLATFORM=offscreen) and with a fixed
+animation speed, let it play the wanted hands and report what
+kajongg --scenestats collected: frame times, paint calls per tile,
+the time for HandBoard.sync and friends, and memory.
+
+The same arguments give the same game, so the output can be kept as
+a baseline and compared with later runs.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+from optparse import OptionParser
+
+from common import Debug
+
+
+def parse_options():
+    """parse options"""
+    parser = OptionParser(usage='%prog [options]\n'
+                          'lets robots play offscreen and reports how the scene renders')
+    parser.add_option(
+        '', '--ruleset', dest='ruleset', default='Classical Chinese DMJL',
+        help='play with RULESET. Default is %default', metavar='RULESET')
+    parser.add_option(
+        '', '--game', dest='game', default='1/E1..E1',
+        help='play GAME like kajongg --game. Default is %default', metavar='GAME')
+    parser.add_option(
+        '', '--speed', dest='speed', type=int, default=90,
+        help='animation SPEED from 0 (slow) to 99 (no animation). Default is %default',
+        metavar='SPEED')
+    parser.add_option(
+        '', '--noshadows', dest='noShadows', action='store_true',
+        default=False, help='show tiles without borders and shadows')
+    parser.add_option(
+        '', '--layouts', dest='layouts', type=int, default=0,
+        help='do at most LAYOUTS hand layouts per frame, 0 is unlimited. Default is %default',
+        metavar='LAYOUTS')
+    parser.add_option(
+        '', '--runs', dest='runs', type=int, default=1,
+        help='play the game RUNS times. Default is %default', metavar='RUNS')
+    parser.add_option(
+        '', '--timeout', dest='timeout', type=int, default=900,
+        help='give up a run after SECONDS. Default is %default', metavar='SECONDS')
+    parser.add_option(
+        '', '--json', dest='json', action='store_true', default=False,
+        help='print the statistics of all runs as JSON')
+    parser.add_option(
+        '', '--debug', dest='debug',
+        help=Debug.help())
+    return parser.parse_args()
+
+
+def writeConfig(directory, options):
+    """our own kajonggrc: the animation speed must be fixed and
+    we do not want to change the real configuration"""
+    realConfig = os.path.join(
+        os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config'), 'kajonggrc')
+    general = ''
+    if os.path.exists(realConfig):
+        # use the same tilesets and background
+        with open(realConfig, encoding='utf-8') as inFile:
+            general = ''.join(
+                x for x in inFile
+                if x.split('=')[0] in ('tilesetName', 'windTilesetName', 'backgroundName'))
+    with open(os.path.join(directory, 'kajonggrc'), 'w', encoding='utf-8') as outFile:
+        outFile.write('[General]\n{}\n[Display]\nanimationSpeed={}\nshowShadows={}\n'
+                      'useSounds=False\n'.format(
+                          general, options.speed, not options.noShadows))
+
+
+def runGame(options):
+    """play one game, return its statistics or None"""
+    directory = tempfile.mkdtemp(prefix='scenebench')
+    try:
+        writeConfig(directory, options)
+        statsName = os.path.join(directory, 'stats.json')
+        env = dict(os.environ, QT_QPA_PLATFORM='offscreen', XDG_CONFIG_HOME=directory)
+        cmd = [sys.executable, 'kajongg.py', '--demo', '--audio=null',
+               '--ruleset={}'.format(options.ruleset),
+               '--game={}'.format(options.game),
+               '--scenestats={}'.format(statsName),
+               '--layouts={}'.format(options.layouts)]
+        if options.debug:
+            cmd.append('--debug={}'.format(options.debug))
+        try:
+            subprocess.run(
+                cmd, env=env, timeout=options.timeout, check=False,
+                cwd=os.path.dirname(os.path.abspath(__file__)))
+        except subprocess.TimeoutExpired:
+            print('timeout after {} seconds'.format(options.timeout), file=sys.stderr)
+            return None
+        if not os.path.exists(statsName):
+            print('kajongg did not write statistics', file=sys.stderr)
+            return None
+        with open(statsName, encoding='utf-8') as inFile:
+            return json.load(inFile)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def report(stats):
+    """print one run in a stable readable format"""
+    print('{:30} {:>10}'.format('seconds', stats['seconds']))
+    print('{:30} {:>10}'.format('frames', stats['frames']))
+    print('{:30} {:>10}'.format('paint calls', stats['paintCalls']))
+    print('{:30} {:>10}'.format('paint calls per tile', stats['paintCallsPerTile']))
+    for name, value in sorted(stats['counts'].items()):
+        print('{:30} {:>10}'.format(name, value))
+    print()
+    print('{:30} {:>6} {:>9} {:>8} {:>8} {:>8} {:>8}'.format(
+        'milliseconds', 'count', 'total', 'p50', 'p90', 'p99', 'max'))
+    for name, timing in sorted(stats['timings'].items()):
+        print('{:30} {:>6} {:>9.1f} {:>8.2f} {:>8.2f} {:>8.2f} {:>8.2f}'.format(
+            name, timing['count'], timing['total'],
+            timing['p50'], timing['p90'], timing['p99'], timing['max']))
+    print()
+    for name, value in sorted(stats['memory'].items()):
+        print('{:30} {:>10}'.format(name, value))
+
+
+def main():
+    """play and report"""
+    options, _ = parse_options()
+    if options.debug:
+        errorMessage = Debug.setOptions(options.debug)
+        if errorMessage:
+            print(errorMessage)
+            sys.exit(2)
+    results = []
+    for run in range(options.runs):
+        stats = runGame(options)
+        if stats is None:
+            sys.exit(1)
+        results.append(stats)
+        if not options.json:
+            if options.runs > 1:
+                print('run {}'.format(run + 1))
+            report(stats)
+            print()
+    if options.json:
+        print(json.dumps(results, indent=1, sort_keys=True))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2009-2016 Wolfgang Rohdewald <wolfgang@rohdewald.de>
+
+SPDX-License-Identifier: GPL-2.0
+
+Statistics about rendering the scene while a game is played. They are
+only collected if kajongg is started with --scenestats=FILE, and
+written to FILE as JSON when the game is over. See scenebench.py
+"""
+
+import os
+import time
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+from common import Internal
+
+
+def percentiles(values):
+    """a dict with the usual percentiles of values, nearest rank"""
+    if not values:
+        return {}
+    values = sorted(values)
+    result = {}
+    for percent in (50, 90, 99):
+        result['p{}'.format(percent)] = values[max(0, (len(values) * percent + 99) // 100 - 1)]
+    result['max'] = values[-1]
+    return result
+
+
+def timed(name):
+    """a decorator: the duration of every call is recorded under name
+    if we collect statistics"""
+    def decorator(func):
+        """the decorator"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            """record the duration"""
+            if Internal.sceneStats is None:
+                return func(*args, **kwargs)
+            with Internal.sceneStats.timing(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SceneStatistics:
+
+    """what we know about rendering the scene so far. All times are
+    in milliseconds"""
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.started = time.perf_counter()
+        self.timings = defaultdict(list)
+        self.counts = defaultdict(int)
+        self.paintCalls = defaultdict(int)
+
+    @contextmanager
+    def timing(self, name):
+        """measure the duration of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name].append((time.perf_counter() - start) * 1000)
+
+    def count(self, name, value=1):
+        """count something"""
+        self.counts[name] += value
+
+    def painted(self, uiTile):
+        """UITile.paint was called"""
+        self.paintCalls[uiTile.uid] += 1
+
+    @staticmethod
+    def memory():
+        """what the process and the scene use"""
+        # pylint: disable=import-outside-toplevel
+        from uitile import UITile
+        result = {}
+        if resource:
+            # KiB on Linux
+            result['maxRssKiB'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        scene = Internal.scene
+        if scene:
+            items = scene.items()
+            result['sceneItems'] = len(items)
+            result['sceneTiles'] = sum(isinstance(x, UITile) for x in items)
+            tilesets = {x.tileset for x in items if isinstance(x, UITile) and x.tileset}
+            result['atlasPixmaps'] = sum(len(x.atlas) for x in tilesets)
+            result['atlasKiB'] = sum(x.atlas.byteCount() for x in tilesets) // 1024
+        return result
+
+    def result(self):
+        """everything as a dict"""
+        paintCalls = sum(self.paintCalls.values())
+        return {
+            'seconds': round(time.perf_counter() - self.started, 3),
+            'frames': len(self.timings.get('frame', [])),
+            'paintCalls': paintCalls,
+            'paintedTiles': len(self.paintCalls),
+            'paintCallsPerTile': round(paintCalls / len(self.paintCalls), 2) if self.paintCalls else 0,
+            'counts': dict(self.counts),
+            'timings': {
+                name: dict(
+                    count=len(values), total=round(sum(values), 3),
+                    **{x: round(y, 3) for x, y in percentiles(values).items()})
+                for name, values in self.timings.items()},
+            'memory': self.memory()}
+
+    def write(self):
+        """write the result to our file"""
+        tmpName = self.fileName + '.tmp'
+        with open(tmpName, 'w', encoding='utf-8') as outFile:
+            json.dump(self.result(), outFile, indent=1, sort_keys=True)
+        os.replace(tmpName, self.fileName)
@@ -361,39 +361,45 @@ class ScoringPlayer(VisiblePlayer, Player):
             return
         currentScore = self.hand.score
         hasManualScore = self.hasManualScore()
+        deltas = {}
+        needed = 0
+        if not hasManualScore:
+            # this also takes lastTile and lastMeld from the scene
+            hand = self.computeHand()
+            checkedRules = [x.rule for x in self.manualRuleBoxes if x.isChecked()]
+            toggled = {}
+            for box in self.manualRuleBoxes:
+                if box != sender and not box.rule.hasNonValueAction():
+                    # if the action would only influence the score and the rule does not change
+                    # the score, ignore the rule. If however the action does other things like
+                    # penalties leave it applicable
+                    if box.rule in checkedRules:
+                        rules = [x for x in checkedRules if x != box.rule]
+                    else:
+                        rules = checkedRules + [box.rule]
+                    toggled[box.rule] = self.__mjstring(rules)
+            deltas = hand.manualRuleDeltas(toggled)
+            # toggling must give more than currentScore
+            needed = currentScore.total() - hand.total()
         for box in self.manualRuleBoxes:
             applicable = bool(self.hand.manualRuleMayApply(box.rule))
             if hasManualScore:
                 # only those rules which do not affect the score can be applied
                 applicable = applicable and box.rule.hasNonValueAction()
-            elif box != sender:
-                applicable = applicable and self.__ruleChangesScore(
-                    box, currentScore)
+            elif box.rule in deltas:
+                applicable = applicable and deltas[box.rule] > needed
             box.setApplicable(applicable)
 
-    def __ruleChangesScore(self, box, currentScore):
-        """does the rule actually influence the result?
-        if the action would only influence the score and the rule does not change the score,
-        ignore the rule. If however the action does other things like penalties leave it applicable"""
-        if box.rule.hasNonValueAction():
-            return True
-        with BlockSignals(box):
-            try:
-                checked = box.isChecked()
-                box.setChecked(not checked)
-                newHand = self.computeHand()
-            finally:
-                box.setChecked(checked)
-        return newHand.score > currentScore
-
-    def __mjstring(self):
-        """compile hand info into a string as needed by the scoring engine"""
+    def __mjstring(self, rules=None):
+        """compile hand info into a string as needed by the scoring engine.
+        rules are the checked manual rules, default is to ask the boxes"""
         if self.lastTile and self.lastTile.isConcealed:
             lastSource = TileSource.LivingWall.char
         else:
             lastSource = TileSource.LivingWallDiscard.char
         announcements = set()
-        rules = [x.rule for x in self.manualRuleBoxes if x.isChecked()]
+        if rules is None:
+            rules = [x.rule for x in self.manualRuleBoxes if x.isChecked()]
         for rule in rules:
             options = rule.options
             if 'lastsource' in options:
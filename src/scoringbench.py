@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2009-2016 Wolfgang Rohdewald <wolfgang@rohdewald.de>
+
+SPDX-License-Identifier: GPL-2.0
+
+Measure the speed of the scoring engine.
+
+--generate=FILE writes a corpus of hands as JSON lines in the format
+bulkscore.py reads: the final hands of robot games played with fixed
+seeds, and the hands of scoringtest.py, which cover the special Mah
+Jongg patterns. The robots play differently after changes to the
+code, so keep the corpus and use the same file for all commits you
+want to compare.
+
+Otherwise the hands of the corpus are scored per ruleset, twice:
+  cold: all caches of the player are cleared before every hand
+  warm: after the cold pass, only the hand cache is cleared
+and for every hand we measure
+  hand: building the Hand, including arrange and applyRules
+  arrange: Hand.__arrange
+  applyRules: Hand.__applyRules
+  callingHands: Hand.__findAllCallingHands for hands with 13 tiles,
+      and for all hands where applyRules needs it
+Nested calls like the variants tried by __arrange count for the
+outermost call. The phases overlap: some rules find the calling
+hands within applyRules, and finding them arranges more hands.
+
+--json=FILE writes the result, --compare=FILE compares it with
+the result of an older run.
+"""
+
+import os
+import sys
+import ast
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+import sqlite3
+import functools
+from hashlib import md5
+from collections import defaultdict
+from optparse import OptionParser
+from multiprocessing.pool import ThreadPool
+
+from common import Debug
+from bulkscore import ScoringContext
+from scenestats import percentiles
+
+RULESETS = ('Classical Chinese DMJL', 'Classical Chinese BMJA')
+
+
+def robotHands(ruleset, seed, rounds, timeout):
+    """play a game with robots only and return its final hands"""
+    directory = tempfile.mkdtemp(prefix='scoringbench')
+    try:
+        # a separate HOME also means a separate socket for the local server
+        os.makedirs(os.path.join(directory, '.config'))
+        env = dict(os.environ, HOME=directory, QT_QPA_PLATFORM='offscreen')
+        for name in ('XDG_CONFIG_HOME', 'XDG_DATA_HOME', 'XDG_CACHE_HOME'):
+            env.pop(name, None)
+        cmd = [sys.executable, 'kajongg.py', '--nogui', '--player=Tüster 1',
+               '--ruleset={}'.format(ruleset), '--game={}'.format(seed),
+               '--rounds={}'.format(rounds)]
+        try:
+            subprocess.run(
+                cmd, env=env, timeout=timeout, check=False,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                cwd=os.path.dirname(os.path.abspath(__file__)))
+        except subprocess.TimeoutExpired:
+            print('{} game {}: timeout after {} seconds'.format(
+                ruleset, seed, timeout), file=sys.stderr)
+        dbName = os.path.join(directory, '.local', 'share', 'kajongg', 'kajongg3.db')
+        if not os.path.exists(dbName):
+            return []
+        connection = sqlite3.connect(dbName)
+        try:
+            records = connection.execute(
+                'select s.hand,s.data,s.wind,s.prevailing,s.won from score s, game g'
+                ' where s.game=g.id and g.seed=? and not s.penalty'
+                ' order by s.hand,s.wind', (str(seed), )).fetchall()
+        except sqlite3.Error:
+            records = []
+        finally:
+            connection.close()
+        return [dict(hand=x[1], ruleset=ruleset, wind=x[2], roundWind=x[3],
+                     won=bool(x[4]), source='game {} hand {}'.format(seed, x[0]))
+                for x in records]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def testHands():
+    """the literal hands passed to scoreTest and callingTest in scoringtest.py"""
+    winds = {'East': 'E', 'South': 'S', 'West': 'W', 'North': 'N'}
+    fileName = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scoringtest.py')
+    with open(fileName, encoding='utf-8') as inFile:
+        tree = ast.parse(inFile.read())
+    result = []
+    for testClass in (x for x in tree.body if isinstance(x, ast.ClassDef)):
+        for node in ast.walk(testClass):
+            if not (isinstance(node, ast.Call)
+                    and isinstance(node.func, ast.Attribute)
+                    and node.func.attr in ('scoreTest', 'callingTest')
+                    and node.args and isinstance(node.args[0], ast.Constant)):
+                continue
+            request = dict(hand=node.args[0].value, wind='E', roundWind='E')
+            for keyword in node.keywords:
+                if keyword.arg in ('myWind', 'roundWind') and isinstance(keyword.value, ast.Name):
+                    request['wind' if keyword.arg == 'myWind' else 'roundWind'] = \
+                        winds.get(keyword.value.id, 'E')
+            for ruleset in RULESETS:
+                result.append(dict(request, ruleset=ruleset,
+                                   source='scoringtest {}'.format(testClass.name)))
+    return result
+
+
+def generate(options):
+    """write the corpus"""
+    jobs = [(ruleset, seed) for ruleset in options.rulesets for seed in range(1, options.games + 1)]
+    hands = []
+    # every game is a process of its own, the threads only wait for them
+    with ThreadPool(options.processes) as pool:
+        for result in pool.starmap(
+                robotHands, ((x[0], x[1], options.rounds, options.timeout) for x in jobs)):
+            hands.extend(result)
+    played = len(hands)
+    hands.extend(testHands())
+    # scoringtest.py also has hands which are expected to fail
+    context = ScoringContext()
+    hands = [x for x in hands if 'error' not in context.score(x)]
+    with open(options.generate, 'w', encoding='utf-8') as outFile:
+        for hand in hands:
+            outFile.write(json.dumps(hand, sort_keys=True) + '\n')
+    print('{}: {} hands from {} games, {} hands from scoringtest.py'.format(
+        options.generate, played, len(jobs), len(hands) - played))
+
+
+class Phases:
+
+    """measures the time spent in some private methods of Hand while
+    active. Nested calls count for the outermost call"""
+
+    methods = {
+        'arrange': '_Hand__arrange', 'applyRules': '_Hand__applyRules',
+        'callingHands': '_Hand__findAllCallingHands'}
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.__depth = defaultdict(int)
+        self.__originals = {}
+
+    def __wrap(self, name, method):
+        """the measuring replacement for method"""
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            """measure the outermost call"""
+            self.__depth[name] += 1
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.__depth[name] -= 1
+                if not self.__depth[name]:
+                    self.seconds[name] += time.perf_counter() - start
+        return wrapper
+
+    def __enter__(self):
+        from hand import Hand  # pylint: disable=import-outside-toplevel
+        for name, attr in self.methods.items():
+            self.__originals[attr] = getattr(Hand, attr)
+            setattr(Hand, attr, self.__wrap(name, self.__originals[attr]))
+        return self
+
+    def __exit__(self, exc_type, exc_value, trback):
+        from hand import Hand  # pylint: disable=import-outside-toplevel
+        for attr, method in self.__originals.items():
+            setattr(Hand, attr, method)
+
+
+def measure(context, requests, cold, errors):
+    """score all requests, returns a dict: phase -> list of milliseconds per hand.
+    Requests which cannot be scored are appended to errors"""
+    # pylint: disable=import-outside-toplevel
+    from hand import Hand
+    result = defaultdict(list)
+    with Phases() as phases:
+        for request in requests:
+            _, player = context.player(request)
+            if cold:
+                player.clearCache()
+            else:
+                player.handCache.clear()
+            before = dict(phases.seconds)
+            start = time.perf_counter()
+            try:
+                hand = Hand(player, request['hand'])
+            except Exception:  # pylint: disable=broad-except
+                errors.append(request)
+                continue
+            result['hand'].append((time.perf_counter() - start) * 1000)
+            for name in ('arrange', 'applyRules'):
+                result[name].append((phases.seconds[name] - before.get(name, 0.0)) * 1000)
+            if hand.lenOffset == 0:
+                # unless applyRules already needed them
+                _ = hand.callingHands
+            seconds = phases.seconds['callingHands'] - before.get('callingHands', 0.0)
+            if hand.lenOffset == 0 or seconds:
+                result['callingHands'].append(seconds * 1000)
+    return result
+
+
+def summary(values):
+    """count, total and percentiles in milliseconds"""
+    result = dict(count=len(values), total=round(sum(values), 3))
+    result.update((x, round(y, 4)) for x, y in percentiles(values).items())
+    return result
+
+
+def benchmark(options):
+    """score the corpus, returns the result"""
+    with open(options.corpus, 'rb') as inFile:
+        content = inFile.read()
+    requests = [json.loads(x) for x in content.decode('utf-8').splitlines() if x.strip()]
+    context = ScoringContext()
+    byRuleset = defaultdict(list)
+    for request in requests:
+        byRuleset[context.findRuleset(request['ruleset'])].append(request)
+    result = dict(corpus=os.path.basename(options.corpus),
+                  corpusMd5=md5(content).hexdigest(), rulesets={})
+    try:
+        result['commit'] = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    for rulesetName, rulesetRequests in sorted(byRuleset.items()):
+        rulesetResult = dict(hands=len(rulesetRequests))
+        for mode in ('cold', 'warm'):
+            errors = []
+            timings = measure(context, rulesetRequests, mode == 'cold', errors)
+            rulesetResult[mode] = {x: summary(y) for x, y in timings.items()}
+        rulesetResult['errors'] = len(errors)
+        for request in errors:
+            print('{}: cannot score {} from {}'.format(
+                rulesetName, request['hand'], request.get('source')), file=sys.stderr)
+        result['rulesets'][rulesetName] = rulesetResult
+    return result
+
+
+def report(result, old=None):
+    """print result, compared with old if given"""
+    if old and old.get('corpusMd5') != result['corpusMd5']:
+        print('the old result was measured with a different corpus')
+        old = None
+    for rulesetName, rulesetResult in sorted(result['rulesets'].items()):
+        print('{}: {} hands'.format(rulesetName, rulesetResult['hands']))
+        if rulesetResult['errors']:
+            print('{} hands could not be scored'.format(rulesetResult['errors']))
+        print('{:20} {:>6} {:>9} {:>8} {:>8} {:>8} {:>8}{}'.format(
+            'milliseconds', 'count', 'total', 'p50', 'p90', 'p99', 'max',
+            '   old total' if old else ''))
+        for mode in ('cold', 'warm'):
+            for phase, timing in sorted(rulesetResult[mode].items()):
+                line = '{:20} {:>6} {:>9.1f} {:>8.3f} {:>8.3f} {:>8.3f} {:>8.3f}'.format(
+                    '{} {}'.format(mode, phase), timing['count'], timing['total'],
+                    timing['p50'], timing['p90'], timing['p99'], timing['max'])
+                if old:
+                    try:
+                        oldTotal = old['rulesets'][rulesetName][mode][phase]['total']
+                        line += ' {:>11.1f} {:+.0%}'.format(
+                            oldTotal, timing['total'] / oldTotal - 1 if oldTotal else 0)
+                    except KeyError:
+                        pass
+                print(line)
+        print()
+
+
+def parse_options():
+    """parse options"""
+    parser = OptionParser(usage='%prog [options]\n'
+                          'measures how fast hands are scored')
+    parser.add_option(
+        '', '--generate', dest='generate',
+        help='write a new corpus to FILE', metavar='FILE')
+    parser.add_option(
+        '', '--games', dest='games', type=int, default=20,
+        help='--generate: play GAMES games per ruleset. Default is %default', metavar='GAMES')
+    parser.add_option(
+        '', '--rounds', dest='rounds', type=int, default=1,
+        help='--generate: play ROUNDS rounds per game. Default is %default', metavar='ROUNDS')
+    parser.add_option(
+        '', '--ruleset', dest='rulesets', action='append',
+        help='--generate: play with RULESET. Can be given more than once.'
+        ' Default are the classical chinese rulesets', metavar='RULESET')
+    parser.add_option(
+        '', '--processes', dest='processes', type=int, default=os.cpu_count(),
+        help='--generate: play PROCESSES games at the same time. Default is %default',
+        metavar='PROCESSES')
+    parser.add_option(
+        '', '--timeout', dest='timeout', type=int, default=900,
+        help='--generate: give up a game after SECONDS. Default is %default', metavar='SECONDS')
+    parser.add_option(
+        '', '--corpus', dest='corpus',
+        help='score the hands in FILE', metavar='FILE')
+    parser.add_option(
+        '', '--json', dest='json',
+        help='write the result to FILE', metavar='FILE')
+    parser.add_option(
+        '', '--compare', dest='compare',
+        help='compare with an older result in FILE', metavar='FILE')
+    parser.add_option(
+        '', '--debug', dest='debug',
+        help=Debug.help())
+    return parser.parse_args()
+
+
+def main():
+    """generate or measure"""
+    options, _ = parse_options()
+    if options.debug:
+        errorMessage = Debug.setOptions(options.debug)
+        if errorMessage:
+            print(errorMessage)
+            sys.exit(2)
+    if options.generate:
+        options.rulesets = options.rulesets or list(RULESETS)
+        generate(options)
+        return
+    if not options.corpus:
+        raise SystemExit('either --generate or --corpus is needed')
+    old = None
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as inFile:
+            old = json.load(inFile)
+    result = benchmark(options)
+    report(result, old)
+    if options.json:
+        tmpName = options.json + '.tmp'
+        with open(tmpName, 'w', encoding='utf-8') as outFile:
+            json.dump(result, outFile, indent=1, sort_keys=True)
+        os.replace(tmpName, options.json)
+
+if __name__ == '__main__':
+    main()
@@ -168,7 +168,11 @@ class ScoreModel(TreeModel):
         super().__init__(parent)
         self.scoreTable = parent
         self.rootItem = ScoreRootItem(None)
+        self.gameid = self.scoreTable.game.gameid
+        self.nameids = []
+        self.lastRowid = 0
         self.minY = self.maxY = None
+        self.__extremes = dict()  # key: (player, column), value: (min, max)
         self.loadData()
 
     def chart(self, rect, index, playerItem):
@@ -244,19 +248,17 @@ class ScoreModel(TreeModel):
         return None
 
     def loadData(self):
-        """loads all data from the data base into a 2D matrix formatted like the wanted tree"""
+        """build the tree formatted like the wanted tree and load all hands
+        from the data base. Every player has one list of hands, shared
+        by the player items in all groups"""
         game = self.scoreTable.game
-        data = []
-        records = Query(
-            'select player,rotated,notrotated,penalty,won,prevailing,wind,points,payments,balance,manualrules'
-            ' from score where game=? order by player,hand', (game.gameid,)).records
         humans = sorted(
             (x for x in game.players if not x.name.startswith('Robot')))
         robots = sorted(
             (x for x in game.players if x.name.startswith('Robot')))
-        data = [tuple([player.localName, [HandResult(*x[1:]) for x in records
-                                          if x[0] == player.nameid]]) for player in humans + robots]
-        self.__findMinMaxChartPoints(data)
+        players = humans + robots
+        self.nameids = [x.nameid for x in players]
+        data = [tuple([player.localName, []]) for player in players]
         parent = QModelIndex()
         groupIndex = self.index(self.rootItem.childCount(), 0, parent)
         groupNames = [i18nc('kajongg', 'Score'), i18nc('kajongg', 'Payments'),
@@ -266,20 +268,62 @@ class ScoreModel(TreeModel):
             listIndex = self.index(idx, 0, groupIndex)
             for idx1, item in enumerate(data):
                 self.insertRows(idx1, list([ScorePlayerItem(item)]), listIndex)
+        self.appendHands()
 
-    def __findMinMaxChartPoints(self, data):
+    def appendHands(self):
+        """append the hands saved since the last call. Only the new
+        columns and the last chart segment before them change, unless
+        the chart gets new extremes.
+        Returns the first new column or None"""
+        records = Query(
+            'select rowid,player,rotated,notrotated,penalty,won,prevailing,wind,points,payments,balance,manualrules'
+            ' from score where game=? and rowid>? order by hand,rowid', (self.gameid, self.lastRowid)).records
+        if not records:
+            return None
+        self.lastRowid = max(x[0] for x in records)
+        groupItem = self.rootItem.children[0]
+        oldColumns = groupItem.columnCount()
+        newHands = [[HandResult(*x[2:]) for x in records if x[1] == nameid]
+                    for nameid in self.nameids]
+        newColumns = oldColumns + len(newHands[0])
+        if newColumns > oldColumns:
+            self.beginInsertColumns(QModelIndex(), oldColumns, newColumns - 1)
+        firstChanged = newColumns
+        for playerItem, hands in zip(groupItem.children, newHands):
+            if hands:
+                firstChanged = min(firstChanged, len(playerItem.hands()) + 1)
+                playerItem.hands().extend(hands)
+        if newColumns > oldColumns:
+            self.endInsertColumns()
+        if self.__findMinMaxChartPoints(firstChanged):
+            # the scale changed: the chart needs to be painted again
+            chartChanged = 1
+        else:
+            chartChanged = max(1, firstChanged - 1)
+        lastColumn = self.rootItem.columnCount() - 1
+        for groupRow in range(4):
+            parent = self.index(groupRow, 0, QModelIndex())
+            firstColumn = chartChanged if groupRow == 3 else firstChanged
+            if firstColumn <= lastColumn:
+                self.dataChanged.emit(
+                    self.index(0, firstColumn, parent),
+                    self.index(len(self.nameids) - 1, lastColumn, parent))
+        return oldColumns if newColumns > oldColumns else None
+
+    def __findMinMaxChartPoints(self, firstColumn):
         """find and save the extremes of the spline. They can be higher than
-        the pure balance values"""
-        self.minY = 9999999
-        self.maxY = -9999999
-        for item in data:
-            playerItem = ScorePlayerItem(item)
-            for col in range(len(playerItem.hands())):
-                points = list(playerItem.chartPoints(col + 1, self.steps))
-                self.minY = min(self.minY, min(points))
-                self.maxY = max(self.maxY, max(points))
+        the pure balance values. Only columns starting with the one before
+        firstColumn can have changed. Returns True if the extremes changed"""
+        for playerItem in self.rootItem.children[3].children:
+            for column in range(max(1, firstColumn - 1), len(playerItem.hands()) + 1):
+                points = list(playerItem.chartPoints(column, self.steps))
+                self.__extremes[(playerItem.row(), column)] = (min(points), max(points))
+        oldValues = self.minY, self.maxY
+        self.minY = min((x[0] for x in self.__extremes.values()), default=9999999)
+        self.maxY = max((x[1] for x in self.__extremes.values()), default=-9999999)
         self.minY -= 2  # antialiasing might cross the cell border
         self.maxY += 2
+        return (self.minY, self.maxY) != oldValues
 
 
 class HandResult:
@@ -361,15 +405,17 @@ class ScoreViewRight(QTreeView):
         if event.type() == QEvent.FontChange:
             self.setColWidth()
 
-    def setColWidth(self):
-        """we want a fixed column width sufficient for all values"""
+    def setColWidth(self, firstColumn=1):
+        """we want a fixed column width sufficient for all values.
+        Columns before firstColumn already have that width"""
         colRange = range(1, self.header().count())
         if colRange:
-            for col in colRange:
+            for col in colRange[firstColumn - 1:]:
                 self.resizeColumnToContents(col)
             width = max(self.columnWidth(x) for x in colRange)
             for col in colRange:
-                self.setColumnWidth(col, width)
+                if self.columnWidth(col) != width:
+                    self.setColumnWidth(col, width)
 
 
 class HorizontalScrollBar(QScrollBar):
@@ -473,6 +519,10 @@ class ScoreTable(QWidget):
         if not self.game:
             # keep scores of previous game on display
             return
+        self.__setTitle()
+        if self.scoreModel and self.scoreModel.gameid == self.game.gameid:
+            self.appendHands()
+            return
         if self.scoreModel:
             expandGroups = [
                 self.viewLeft.isExpanded(
@@ -480,12 +530,6 @@ class ScoreTable(QWidget):
                 for x in range(4)]
         else:
             expandGroups = [True, False, True, True]
-        gameid = str(self.game.seed or self.game.gameid)
-        if self.game.finished():
-            title = i18n('Final scores for game <numid>%1</numid>', gameid)
-        else:
-            title = i18n('Scores for game <numid>%1</numid>', gameid)
-        decorateWindow(self, title)
         self.ruleTree.rulesets = list([self.game.ruleset])
         self.scoreModel = ScoreModel(self)
         if Debug.modelTest:
@@ -520,6 +564,26 @@ class ScoreTable(QWidget):
         # we need a timer since the scrollbar is not yet visible
         QTimer.singleShot(0, self.scrollRight)
 
+    def __setTitle(self):
+        """the window title shows the game"""
+        gameid = str(self.game.seed or self.game.gameid)
+        if self.game.finished():
+            title = i18n('Final scores for game <numid>%1</numid>', gameid)
+        else:
+            title = i18n('Scores for game <numid>%1</numid>', gameid)
+        decorateWindow(self, title)
+
+    def appendHands(self):
+        """the model only loads the new hands. Columns and the chart
+        of older hands remain as they are"""
+        firstColumn = self.scoreModel.appendHands()
+        if firstColumn is None:
+            return
+        for col in range(firstColumn, self.viewLeft.header().count()):
+            self.viewLeft.header().setSectionHidden(col, True)
+        self.viewRight.setColWidth(firstColumn)
+        QTimer.singleShot(0, self.scrollRight)
+
     def scrollRight(self):
         """make sure the latest hand is visible"""
         scrollBar = self.viewRight.horizontalScrollBar()
@@ -8,6 +8,10 @@ SPDX-License-Identifier: GPL-2.0
 
 """
 
+import os
+import wave
+import shutil
+import tempfile
 import unittest
 
 from common import Debug  # pylint: disable=unused-import
@@ -15,8 +19,16 @@ from wind import Wind, East, South, West, North
 from player import Players
 from game import PlayingGame
 from hand import Hand, Score
-from tile import TileList
+from tile import Tile, TileList
+from dangerous import Dangerous
+from intelligence import DiscardCandidates
+from altint import AIMonteCarlo
+from rand import GameRandom, TracingRandom
 from predefined import ClassicalChineseDMJL, ClassicalChineseBMJA
+from audio import SampleCache, AudioEngine, NullSink
+
+from twisted.internet.defer import Deferred, maybeDeferred
+from twisted.internet.task import Clock
 
 RULESETS = []
 
@@ -65,6 +77,13 @@ class NoWin(Expected):
         Expected.__init__(self, False, points, doubles, limits)
 
 
+class RecordingSink(NullSink):
+
+    """remembers the samples it would have played"""
+
+    decodes = True
+
+
 class Helpers:
 
     """for my test classes"""
@@ -134,6 +153,108 @@ class Helpers:
                             '%s: %s may be completed by %s but testresult is %s' % (
                                 ruleset.name, string, completingTiles or 'None', testSays or 'None'))
 
+    def discardTest(self, string):
+        """callingDiscards must find what discarding every single tile finds"""
+        for idx, ruleset in enumerate(RULESETS):
+            game = GAMES[idx]
+            game.players[0].clearCache()
+            hand = Hand(game.players[0], string)
+            expected = {}
+            for tile in sorted(set(hand.tilesInHand)):
+                callingHands = (hand - tile).callingHands
+                if callingHands:
+                    expected[tile] = tuple(x.lastTile for x in callingHands)
+            self.assertTrue(hand.callingDiscards == expected,
+                            '%s: %s callingDiscards are %s, expected %s' % (
+                                ruleset.name, string, hand.callingDiscards, expected))
+
+    def derivedTest(self, string):
+        """hands derived by - and + must score like hands built from their string"""
+        for idx, ruleset in enumerate(RULESETS):
+            player = GAMES[idx].players[0]
+            player.clearCache()
+            hand = Hand(player, string)
+            derived = []
+            for tile in sorted(set(hand.tilesInHand)):
+                minus = hand - tile
+                derived.append(minus)
+                derived.extend(minus.callingHands)
+            results = [(x.string, x.won, x.score, x.explain()) for x in derived]
+            for result in results:
+                player.clearCache()
+                fresh = Hand(player, result[0])
+                self.assertTrue(result == (fresh.string, fresh.won, fresh.score, fresh.explain()),
+                                '%s: %s derived from %s scores %s, built from its string %s' % (
+                                    ruleset.name, result[0], string, result[2], fresh.score))
+
+    def manualRuleTest(self, string, mjStrings):
+        """manualRuleDeltas must give what building the hands gives"""
+        for idx, ruleset in enumerate(RULESETS):
+            player = GAMES[idx].players[0]
+            player.clearCache()
+            hand = Hand(player, string)
+            deltas = hand.manualRuleDeltas(dict(enumerate(mjStrings)))
+            for key, mjString in enumerate(mjStrings):
+                player.clearCache()
+                fresh = Hand(player, ' '.join(mjString if x[0] == 'm' else x for x in string.split()))
+                self.assertTrue(deltas[key] == fresh.total() - hand.total(),
+                                '%s: %s with %s: delta %s, built %s' % (
+                                    ruleset.name, string, mjString, deltas[key], fresh.total() - hand.total()))
+
+    def monteCarloTest(self, string):
+        """the rollouts of AIMonteCarlo only depend on the seed of the game.
+        Returns the discards found for every ruleset"""
+        result = []
+        # roofOff does not change the rollouts
+        for idx, ruleset in enumerate(RULESETS[:2]):
+            game = GAMES[idx]
+            player = game.players[0]
+            game.wall.living = [Tile.unknown] * 60
+            try:
+                answers = []
+                for _ in range(2):
+                    player.clearCache()
+                    ai = AIMonteCarlo(player)
+                    ai.timeBudget = 1000
+                    ai.maxSamples = ai.batchSize
+                    hand = Hand(player, string)
+                    candidates = ai.weighDiscardCandidates(DiscardCandidates(player, hand))
+                    answers.append((candidates.best(), [str(x) for x in candidates]))
+                player.clearCache()
+                ai.timeBudget = 0
+                stats = ai.simulate(hand, list(candidates)[:ai.maxCandidates])
+            finally:
+                game.wall.living = None
+            self.assertTrue(answers[0] == answers[1], '%s: %s gives %s and %s' % (
+                ruleset.name, string, answers[0], answers[1]))
+            # out of time right away: still one sample for every candidate
+            self.assertTrue(all(x.samples == 1 for x in stats), '%s: %s' % (
+                ruleset.name, ', '.join(str(x) for x in stats)))
+            result.append(answers[0][0])
+        return result
+
+    @staticmethod
+    def wavFile(directory, name, seconds, value):
+        """write a 16 bit mono wav file where every sample is value"""
+        fileName = os.path.join(directory, name + '.wav')
+        with wave.open(fileName, 'wb') as wavFile:
+            wavFile.setnchannels(1)
+            wavFile.setsampwidth(2)
+            wavFile.setframerate(1000)
+            wavFile.writeframes(value.to_bytes(2, 'little', signed=True) * int(seconds * 1000))
+        return fileName
+
+    def audioTest(self, test):
+        """call test with a directory for wav files and
+        a SampleCache that does not need threads"""
+        directory = tempfile.mkdtemp()
+        try:
+            cache = SampleCache(None)
+            cache.inThread = maybeDeferred
+            test(directory, cache)
+        finally:
+            shutil.rmtree(directory)
+
     def dumpCase(self, hand, expected, total):
         """dump test case"""
         assert self
@@ -683,6 +804,21 @@ class OriginalCall(Base):
                        [NoWin(20, 1), NoWin(20, 2)], myWind=North)
 
 
+class CallingDiscards(Base):
+
+    """which discards leave a calling hand"""
+
+    def testMe(self):
+        self.discardTest('RS1S2S3S4S5S6S7B1B2B3C5C6C9Dr')
+        self.discardTest('RS1S1S3S4S5S6S7B1B2B9C5C6DrDr')
+        self.discardTest('b1b1b1 RS1S2S3S5S6S7B3B4C5C6Wn')
+        self.discardTest('RS1S1S1S2S3S4S5S6S7S8S9S9S9B1')
+        self.discardTest('RS1S2S3S4S5S6S7S8S9WeWsWwWnB4')
+        self.discardTest('RS2S2B2B2S3B3S4B4S6B6S8B8S9C9')
+        self.discardTest('RC1C9S1S9B1B9DrDgDbWeWsWwWnS5')
+        self.discardTest('RDrDrDgDgDbDbWeWeWsWsWwWnS1S2')
+
+
 class RobbingKong(Base):
 
     """robbing the kong"""
@@ -944,6 +1080,274 @@ class Recursion(Base):
             'c6c6c6C6 fe fs RS8S8C1C2C3C4C5C7C8C9 LC7', [NoWin(16), NoWin(16, 1)])
 
 
+class HandKey(Base):
+
+    """hands with the same string are equal, even after clearCache"""
+
+    def testMe(self):
+        player = GAMES[0].players[0]
+        string = 's1s2s3 s4s5s6 b7b7b7 c5c5 RDrDrDr Lc5c5c5'
+        player.clearCache()
+        before = Hand(player, string)
+        player.clearCache()
+        after = Hand(player, string)
+        self.assertIsNot(before, after)
+        self.assertEqual(before, after)
+        self.assertEqual(hash(before), hash(after))
+        self.assertNotEqual(before, Hand(player, 's1s2s3 s4s5s6 b7b7b7 c5c5 RDrDrDr Ls1s1s2s3'))
+        # after the key of string is evicted, a new hand gets another key
+        maxKeys = Hand.maxKeys
+        try:
+            Hand.maxKeys = 2
+            player.clearCache()
+            for other in ('s1s2s3 s4s5s6 b7b7b7 c5c5 RDrDrDr Ls4s4s5s6',
+                          's1s2s3 s4s5s6 b7b7b7 c5c5 RDrDrDr Lb7b7b7b7'):
+                Hand(player, other)
+            player.clearCache()
+            evicted = Hand(player, string)
+        finally:
+            Hand.maxKeys = maxKeys
+        self.assertNotEqual(before.key, evicted.key)
+        self.assertEqual(before, evicted)
+        self.assertEqual(hash(before), hash(evicted))
+        self.assertEqual(len({before, after, evicted}), 1)
+
+
+class Derived(Base):
+
+    """adding and removing tiles gives the same hands as building them"""
+
+    def testMe(self):
+        self.derivedTest('s1s2s3 s4s5s6 b7b7b7 c5c5 RDrDrDr Lc5c5c5')
+        self.derivedTest('RB1B1B1B2B3B4B5B5B6B7B8B9B9B9 LB5')
+        self.derivedTest('b1b1b1B1 RS2S3S4S5S6S7S8S8S8DrDr LS8S8S8S8')
+        self.derivedTest('RC1C9B9B1S1S9WeDgWsWnWwDbDrS1 LDgDg')
+
+
+class ManualRules(Base):
+
+    """toggling manual rules changes the score like building the hand does"""
+
+    def testMe(self):
+        self.manualRuleTest('s1s2s3 s4s5s6 b7b7b7 c5c5 RDrDrDr mw Lc5c5c5',
+                            ['mwa', 'mz', 'md', 'mw', 'mwa', 'mZ'])
+        self.manualRuleTest('RS1S2S3S4S5S6B7B7B7C5C5DrDrDr mw LC5C5C5',
+                            ['mwa', 'mz', 'me', 'md', 'mZ'])
+
+
+class MonteCarlo(Base):
+
+    """the same seed gives the same discard, and time is checked per sample"""
+
+    def testMe(self):
+        self.monteCarloTest('RS1S2S3B4B5B6C7C8WeWeDbDbS9S9 LS9')
+        self.monteCarloTest('RS1S1S2S3B4B5B6B8C7C7C8WeDbDr LDr')
+
+
+class DangerousGame(Base):
+
+    """the reasons why discarding a tile is dangerous"""
+
+    def testMe(self):
+        # pylint: disable=protected-access
+        game = GAMES[0]
+        east, south, west, north = game.players
+        try:
+            game.wall.living = [Tile.unknown] * 20
+            south.addConcealedTiles(TileList('B2B2B3B3B4B4'))
+            for tile in ('b2', 'b3', 'b4'):
+                south.exposeMeld(TileList(tile.upper() * 2), calledTile=Tile(tile.upper()))
+            green = Dangerous.GreenHand | Dangerous.TrueColor
+            self.assertEqual(game.dangerousFor(east, Tile('b6')), [(green, south)])
+            self.assertEqual(game.dangerousFor(east, Tile('Dg')), [(Dangerous.GreenHand, south)])
+            self.assertEqual(game.dangerousFor(east, Tile('b1')), [(Dangerous.TrueColor, south)])
+            self.assertEqual(game.dangerousFor(east, Tile('s6')), [])
+            self.assertEqual(game.dangerousFor(south, Tile('b6')), [])
+            self.assertEqual(len(Dangerous.texts(game.dangerousFor(east, Tile('b6')))), 2)
+            west.addConcealedTiles(TileList('WeWeWsWsDrDr'))
+            for tile in ('we', 'ws', 'dr'):
+                west.exposeMeld(TileList(tile.capitalize() * 2), calledTile=Tile(tile.capitalize()))
+            self.assertEqual(game.dangerousFor(east, Tile('Wn')), [(Dangerous.Winds, west)])
+            self.assertEqual(game.dangerousFor(east, Tile('Dg')), [
+                (Dangerous.GreenHand, south), (Dangerous.Dragons, west)])
+            self.assertEqual(game.dangerousFor(east, Tile('We')), [])
+            self.assertEqual(game.dangerousFor(west, Tile('Wn')), [])
+            # the end of the living wall: everything not yet seen is dangerous
+            game.wall.living = [Tile.unknown] * 5
+            game.computeDangerous()
+            self.assertEqual(game.dangerousFor(north, Tile('c5')), [(Dangerous.ShortWall, None)])
+            self.assertEqual(game.dangerousFor(north, Tile('Wn')), [
+                (Dangerous.ShortWall, None), (Dangerous.Winds, west)])
+            self.assertEqual(game.dangerousFor(north, Tile('b2')), [(green, south)])
+            self.assertEqual(game.dangerousFor(north, Tile('fe')), [])
+            game._endWallDangerous(Tile('c5'))
+            self.assertEqual(game.dangerousFor(north, Tile('c5')), [])
+            self.assertEqual(game.dangerousFor(north, Tile('c6')), [(Dangerous.ShortWall, None)])
+        finally:
+            for player in game.players:
+                player.clearHand()
+            game.dangerousTiles = {}
+            game.wall.living = None
+
+
+class RandomSequence(Base):
+
+    """a seed always gives the same game: GameRandom must draw like
+    Random did in kajongg before TracingRandom existed"""
+
+    expected = [0.135987169086, 'c', 'x', 8, 84, [14, 19, 18], [5, 0, 2, 7, 9, 1, 8, 6, 3, 4]]
+
+    @staticmethod
+    def draw(rnd):
+        """the kinds of draws a game does"""
+        rnd.seed(4711)
+        result = [round(rnd.random(), 12), rnd.choice('abcdefghij'), rnd.choice(['x']),
+                  rnd.randrange(144), rnd.choice(range(136)), rnd.sample(range(20), 3)]
+        shuffled = list(range(10))
+        rnd.shuffle(shuffled)
+        result.append(shuffled)
+        return result
+
+    def testMe(self):
+        self.assertEqual(self.draw(GameRandom()), self.expected)
+        self.assertEqual(self.draw(TracingRandom(GAMES[0])), self.expected)
+
+
+class RandomReplay(Base):
+
+    """replaying the draws of TracingRandom repeats a hand"""
+
+    @staticmethod
+    def playHand(game):
+        """draw like the server and a robot do at the start of a hand.
+        Returns what was drawn"""
+        # pylint: disable=protected-access
+        game._setHandSeed()
+        wall = list(range(len(game.wall.tiles)))
+        game.randomGenerator.shuffle(wall)
+        game.throwDices()
+        discard = game.randomGenerator.choice([Tile('b1'), Tile('b1'), Tile('dr')])
+        return wall, game.divideAt, discard
+
+    def testMe(self):
+        game = GAMES[0]
+        original = game.randomGenerator
+        try:
+            game.randomGenerator = TracingRandom(game)
+            played = self.playHand(game)
+            draws = game.randomGenerator.draws
+            self.assertIsNone(TracingRandom.replay(draws))
+            game.randomGenerator = GameRandom()
+            self.assertEqual(self.playHand(game), played)
+            # the second b1 is a different draw than the first one
+            for idx, entry in enumerate(draws):
+                if entry[0] == 'choice':
+                    wrong = list(draws)
+                    wrong[idx] = entry[:2] + (1 - entry[2], )
+                    self.assertEqual(TracingRandom.replay(wrong), idx)
+        finally:
+            game.randomGenerator = original
+            game.divideAt = None
+
+
+class AudioCache(Base):
+
+    """SampleCache keeps the most recently used samples"""
+
+    def cacheTest(self, directory, cache):
+        """evicts the least recently used file"""
+        names = [self.wavFile(directory, x, 1.0, 1000) for x in 'abc']
+        cache.maxBytes = 2 * 2000
+        results = []
+        for name in names:
+            cache.load(name).addCallback(results.append)
+        self.assertEqual([x.name for x in results], names)
+        self.assertEqual((len(cache), cache.size, cache.misses), (2, 4000, 3))
+        cache.load(names[1]).addCallback(results.append)
+        self.assertEqual(cache.hits, 1)
+        self.assertIs(results[-1], results[1])
+        cache.load(names[0]).addCallback(results.append)
+        self.assertEqual((len(cache), cache.misses), (2, 4))
+        cache.load(names[1])
+        self.assertEqual(cache.hits, 2)
+        cache.load(names[2])
+        self.assertEqual(cache.misses, 5)
+        missing = os.path.join(directory, 'missing.wav')
+        cache.load(missing).addCallback(results.append)
+        self.assertIsNone(results[-1])
+        self.assertTrue(cache.failed(missing))
+
+    def testMe(self):
+        self.audioTest(self.cacheTest)
+
+
+class AudioQueue(Base):
+
+    """AudioEngine plays clips in the order they were asked for"""
+
+    def queueTest(self, directory, cache):
+        """queued clips do not overlap even if they are loaded in another order"""
+        clock = Clock()
+        engine = AudioEngine(RecordingSink(), cache, clock)
+        pending = []
+
+        def later(func, *args):
+            """load when the test says so"""
+            result = Deferred()
+            pending.append((result, func, args))
+            return result
+        cache.inThread = later
+        names = [self.wavFile(directory, x, 0.5, 1000) for x in 'abc']
+        for name in names:
+            engine.speak(name)
+        for result, func, args in reversed(pending):
+            result.callback(func(*args))
+        self.assertEqual([x.name for x in engine.sink.played], names[:1])
+        clock.advance(0.5 + engine.gap)
+        self.assertEqual([x.name for x in engine.sink.played], names[:2])
+        clock.advance(0.5 + engine.gap)
+        self.assertEqual([x.name for x in engine.sink.played], names)
+        clock.advance(0.5 + engine.gap)
+        self.assertFalse(engine.busy)
+
+    def mixTest(self, directory, cache):
+        """in demo mode a new clip is mixed into the playing one"""
+        clock = Clock()
+        engine = AudioEngine(RecordingSink(), cache, clock)
+        first = self.wavFile(directory, 'first', 1.0, 20000)
+        second = self.wavFile(directory, 'second', 1.0, 20000)
+        engine.speak(first, mix=True)
+        clock.advance(0.25)
+        engine.speak(second, mix=True)
+        played = engine.sink.played
+        self.assertEqual(played[-1].name, first + '+' + second)
+        self.assertEqual(played[-1].duration, 1.0)
+        mixed = played[-1].data
+        self.assertEqual(mixed[:2], (32767).to_bytes(2, 'little'))
+        self.assertEqual(mixed[-2:], (20000).to_bytes(2, 'little'))
+        # 0.75 seconds of the first clip were left
+        self.assertEqual(mixed[1498:1500], (32767).to_bytes(2, 'little'))
+        self.assertEqual(mixed[1500:1502], (20000).to_bytes(2, 'little'))
+
+    def fallbackTest(self, directory, cache):
+        """what we cannot read goes to the fallback"""
+        engine = AudioEngine(RecordingSink(), cache, Clock())
+        fallen = []
+        engine.fallback = fallen.append
+        missing = os.path.join(directory, 'missing.ogg')
+        clip = self.wavFile(directory, 'clip', 0.5, 1000)
+        self.assertTrue(engine.speak(missing))
+        self.assertTrue(engine.speak(clip))
+        self.assertEqual([x.name for x in engine.sink.played], [clip])
+        self.assertEqual(fallen, [missing])
+        self.assertFalse(engine.speak(missing))
+
+    def testMe(self):
+        self.audioTest(self.queueTest)
+        self.audioTest(self.mixTest)
+        self.audioTest(self.fallbackTest)
+
+
 class TstProgram(unittest.TestProgram):
 
     """we want global access to this program so we can check for verbosity in our tests"""
@@ -15,11 +15,14 @@ O'Reilly Media, Inc., ISBN 0-596-10032-9
 
 import sys
 import os
-import logging
 import datetime
+import heapq
+from itertools import count
 
 from zope.interface import implementer
 
+from logwriter import logShutdown
+
 
 def cleanExit(*unusedArgs): # pylint: disable=unused-argument
     """we want to cleanly close sqlite3 files"""
@@ -33,10 +36,10 @@ def cleanExit(*unusedArgs): # pylint: disable=unused-argument
             Internal.db.close()
                               # setting to None does not call close(), do we
                               # need close?
-        logging.shutdown()
+        logShutdown()
         os._exit(0)  # pylint: disable=protected-access
     except NameError:
-        logging.shutdown()
+        logShutdown()
     try:
         reactor.stop()
     except NameError:
@@ -120,7 +123,13 @@ class MJServer:
 
     def __init__(self):
         self.tables = {}
-        self.srvUsers = list()
+        self.waitingTables = []  # (table, user), waiting for admission
+        self.gameDuration = 300.0  # moving average in seconds, for estimates
+        self.srvUsers = dict()  # used as an ordered set
+        self.userTables = dict()  # user: set of tables where he is seated
+        self.pingDeadlines = list()  # heap of (deadline, sequence, user)
+        self.pingSequence = dict()  # user: sequence of his valid heap entry
+        self.__pingCounter = count()
         Players.load()
         self.lastPing = datetime.datetime.now()
         self.checkPings()
@@ -135,7 +144,8 @@ class MJServer:
     def login(self, user):
         """accept a new user"""
         if user not in self.srvUsers:
-            self.srvUsers.append(user)
+            self.srvUsers[user] = None
+            self.__schedulePing(user, user.lastPing + self.pingTimeout)
             self.loadSuspendedTables(user)
 
     def callRemote(self, user, *args, **kwargs):
@@ -161,24 +171,56 @@ class MJServer:
             except ReactorNotRunning:
                 pass
 
+    pingTimeout = datetime.timedelta(seconds=60)
+
+    def __schedulePing(self, user, deadline):
+        """check user again at deadline"""
+        sequence = next(self.__pingCounter)
+        self.pingSequence[user] = sequence
+        heapq.heappush(self.pingDeadlines, (deadline, sequence, user))
+
+    def __expiredUsers(self):
+        """pop users without ping since pingTimeout from the heap. User.pinged
+        only updates lastPing, so an entry may be too early: then reschedule it.
+        Every entry is looked at only when its deadline has come, so
+        idle users cost nothing"""
+        now = datetime.datetime.now()
+        result = []
+        while self.pingDeadlines and self.pingDeadlines[0][0] <= now:
+            _, sequence, user = heapq.heappop(self.pingDeadlines)
+            if self.pingSequence.get(user) != sequence:
+                # logged out or rescheduled
+                continue
+            deadline = user.lastPing + self.pingTimeout
+            if deadline > now:
+                self.__schedulePing(user, deadline)
+            else:
+                del self.pingSequence[user]
+                result.append(user)
+        return result
+
     def checkPings(self):
         """are all clients still alive? If not log them out"""
+        # first, so an exception below does not stop the pings
+        reactor.callLater(10, self.checkPings)
         since = elapsedSince(self.lastPing)
         if self.srvUsers and since > 30:
             if Debug.quit:
                 logDebug('no ping since {} seconds but we still have users:{}'.format(
-                    elapsedSince(self.lastPing), self.srvUsers))
+                    elapsedSince(self.lastPing), list(self.srvUsers)))
         if not self.srvUsers and since > 30:
             # no user at all since 30 seconds, but we did already have a user
             self.__stopAfterLastDisconnect()
-        for user in self.srvUsers:
-            if elapsedSince(user.lastPing) > 60:
+        for user in self.__expiredUsers():
+            if user in self.srvUsers:
                 logInfo(
                     'No messages from %s since 60 seconds, clearing connection now' %
                     user.name)
                 user.mind = None
                 self.logout(user)
-        reactor.callLater(10, self.checkPings)
+        if self.waitingTables:
+            # the cpu load may have gone down
+            self.__admitWaitingSafely()
 
     @staticmethod
     def ignoreLostConnection(failure):
@@ -275,7 +317,7 @@ class MJServer:
         block = DeferredBlock(table)
         block.tell(
             None,
-            self.srvUsers,
+            list(self.srvUsers),
             Message.TableChanged,
             source=table.asSimpleList())
         if len(table.users) == table.maxSeats():
@@ -284,15 +326,29 @@ class MJServer:
 
             def startTable(unused):
                 """now all players know about our join"""
-                table.readyForGameStart(table.owner)
+                self.__startTable(table, table.owner)
             block.callback(startTable)
         else:
             block.callback(False)
         return True
 
+    def seated(self, user, table):
+        """maintain the index for tablesWith"""
+        self.userTables.setdefault(user, set()).add(table)
+
+    def unseated(self, user, table):
+        """maintain the index for tablesWith"""
+        tables = self.userTables.get(user)
+        if tables:
+            tables.discard(table)
+            if not tables:
+                del self.userTables[user]
+
     def tablesWith(self, user):
-        """table ids with user, except table 'without'"""
-        return [x.tableid for x in self.tables.values() if user in x.users]
+        """ids of the tables with user"""
+        return sorted(
+            x.tableid for x in self.userTables.get(user, ())
+            if self.tables.get(x.tableid) is x)
 
     def leaveTable(self, user, tableid, message, *args):
         """user leaves table. If no human user is left on a new table, remove it"""
@@ -309,7 +365,7 @@ class MJServer:
                         block = DeferredBlock(table)
                         block.tell(
                             None,
-                            self.srvUsers,
+                            list(self.srvUsers),
                             Message.TableChanged,
                             source=table.asSimpleList())
                         block.callback(False)
@@ -317,7 +373,95 @@ class MJServer:
 
     def startGame(self, user, tableid):
         """try to start the game"""
-        return self._lookupTable(tableid).readyForGameStart(user)
+        return self.__startTable(self._lookupTable(tableid), user)
+
+    @staticmethod
+    def __limitReached(running, limit):
+        """limit 0 means unlimited"""
+        return limit and len(running) >= limit
+
+    @staticmethod
+    def __cpuLoad(running):
+        """the share of one CPU used by the running tables, measured by
+        ServerTable.cpuSeconds since their start, and the expected
+        load of one more table"""
+        loads = [x.cpuSeconds / max(elapsedSince(x.admittedAt), 1.0) for x in running]
+        if not loads:
+            return 0.0, 0.0
+        return sum(loads), sum(loads) / len(loads)
+
+    def __mayStart(self, table):
+        """admission control: are we below the limits? Only tables
+        with robots only wait for the CPU, so they cannot make
+        human players wait for their claims"""
+        running = [x for x in self.tables.values() if x.admitted]
+        if self.__limitReached(running, Options.maxTables):
+            return False
+        if table.autoPlay:
+            if self.__limitReached([x for x in running if x.autoPlay], Options.maxRobotTables):
+                return False
+            if Options.maxCpuLoad:
+                load, perTable = self.__cpuLoad(running)
+                if load + perTable > Options.maxCpuLoad:
+                    if Debug.table:
+                        logDebug('Table %s: cpu load %.2f + %.2f exceeds %.2f' % (
+                            table, load, perTable, Options.maxCpuLoad))
+                    return False
+        return True
+
+    def __startTable(self, table, user):
+        """start the game now or queue it if we are saturated"""
+        if table.admitted:
+            return table.readyForGameStart(user)
+        if any(x[0] is table for x in self.waitingTables):
+            return None
+        if len(table.users) < table.maxSeats() and table.owner != user:
+            # let readyForGameStart raise the error right now
+            return table.readyForGameStart(user)
+        if self.__mayStart(table):
+            return self.__admit(table, user)
+        self.waitingTables.append((table, user))
+        self.__tellWaiting(table)
+        return None
+
+    def __admit(self, table, user):
+        """the table may start"""
+        table.admitted = True
+        table.admittedAt = datetime.datetime.now()
+        return table.readyForGameStart(user)
+
+    def __estimatedWait(self, table):
+        """seconds until table will probably start"""
+        position = [x[0] for x in self.waitingTables].index(table) + 1
+        slots = Options.maxRobotTables if table.autoPlay and Options.maxRobotTables else Options.maxTables
+        return int(position * self.gameDuration / max(slots or 1, 1))
+
+    def __tellWaiting(self, table):
+        """tell the users of table how long they have to wait"""
+        wait = self.__estimatedWait(table)
+        if Debug.table:
+            logDebug('Table %s: server is saturated, queued. Estimated start in %d seconds' % (
+                table, wait))
+        message = srvMessage(i18nE('The server is busy, the game will probably start in %1 seconds'), wait)
+        table.sendChatMessage(ChatMessage(
+            table.tableid, table.owner.name, message.decode('utf-8'), isStatusMessage=True))
+
+    def __admitWaiting(self):
+        """start queued tables in the order they came in as far as the limits allow.
+        A robot table waiting for the robot limit does not block human tables"""
+        for table, user in list(self.waitingTables):
+            if self.__mayStart(table):
+                self.waitingTables.remove((table, user))
+                self.__admit(table, user)
+
+    def __admitWaitingSafely(self):
+        """a table failing to start must not break the caller"""
+        maybeDeferred(self.__admitWaiting).addErrback(self.__admitFailed)
+
+    @staticmethod
+    def __admitFailed(failure):
+        """log why queued tables could not be started"""
+        logError('cannot admit waiting tables: {}'.format(failure.getTraceback()))
 
     def removeTable(self, table, reason, message, *args):
         """remove a table"""
@@ -328,29 +472,45 @@ class MJServer:
             logDebug(
                 '%s%s ' % (('%s:' % table.game.seed) if table.game else '',
                            i18n(message, *args)), withGamePrefix=None)
+        self.waitingTables = [x for x in self.waitingTables if x[0] is not table]
         if table.tableid in self.tables:
             del self.tables[table.tableid]
+            if table.admitted:
+                self.__tableDone(table)
             if reason == 'silent':
                 tellUsers = []
             else:
-                tellUsers = table.users if table.running else self.srvUsers
+                tellUsers = table.users if table.running else list(self.srvUsers)
             for user in tellUsers:
                 # this may in turn call removeTable again!
                 self.callRemote(user, reason, table.tableid, message, *args)
             for user in table.users:
                 table.delUser(user)
+            for user in table.users:
+                self.unseated(user, table)
             if Debug.table:
                 logDebug(
                     'removing table %d: %s %s' %
                     (table.tableid, i18n(message, *args), reason))
         if table.game:
             table.game.close()
+        self.__admitWaitingSafely()
+
+    def __tableDone(self, table):
+        """update the estimated game duration"""
+        duration = elapsedSince(table.admittedAt)
+        if table.running:
+            self.gameDuration = 0.8 * self.gameDuration + 0.2 * duration
+        if Debug.table:
+            logDebug('Table %s: ran %.1f seconds, cpu %.3f seconds' % (
+                table, duration, table.cpuSeconds))
 
     def logout(self, user):
         """remove user from all tables"""
         if user not in self.srvUsers:
             return
-        self.srvUsers.remove(user)
+        del self.srvUsers[user]
+        self.pingSequence.pop(user, None)
         for tableid in self.tablesWith(user):
             self.leaveTable(
                 user,
@@ -440,6 +600,16 @@ def parseArgs():
     parser.add_option(
         '', '--continue', dest='continueServer', action='store_true',
         help=i18n('do not terminate local game server after last client disconnects'), default=False)
+    parser.add_option(
+        '', '--maxtables', dest='maxTables', type=int, default=0,
+        help=i18n('start at most MAXTABLES games at the same time, queue others. 0 is unlimited'))
+    parser.add_option(
+        '', '--maxrobottables', dest='maxRobotTables', type=int, default=0,
+        help=i18n('start at most MAXROBOTTABLES games without human players at the same time. 0 is unlimited'))
+    parser.add_option(
+        '', '--maxcpu', dest='maxCpuLoad', type=float, default=0.0,
+        help=i18n('do not start games without human players while running games use more than'
+                  ' MAXCPU of one CPU, like 0.7. 0 is unlimited'))
     parser.add_option('', '--debug', dest='debug',
                       help=Debug.help())
     (options, args) = parser.parse_args()
@@ -447,6 +617,9 @@ def parseArgs():
         logWarning(i18n('unrecognized arguments:%1', ' '.join(args)))
         sys.exit(2)
     Options.continueServer |= options.continueServer
+    Options.maxTables = options.maxTables
+    Options.maxRobotTables = options.maxRobotTables
+    Options.maxCpuLoad = options.maxCpuLoad
     if options.dbpath:
         Options.dbPath = os.path.expanduser(options.dbpath)
     if options.socket:
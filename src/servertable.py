@@ -13,7 +13,9 @@ O'Reilly Media, Inc., ISBN 0-596-10032-9
 
 import os
 import random
+import time
 import traceback
+from base64 import b64encode
 from itertools import chain
 from twisted.spread import pb
 
@@ -22,11 +24,12 @@ from wind import Wind
 from tilesource import TileSource
 from util import Duration
 from message import Message, ChatMessage
-from log import logDebug, logError
+from log import logDebug, logError, logWarning
 from mi18n import i18nE, i18n, i18ncE
 from deferredutil import DeferredBlock
 from tile import Tile, TileList, elements
 from meld import Meld, MeldList
+from dangerous import Dangerous
 from query import Query
 from client import Client, Table
 from wall import WallEmpty
@@ -34,6 +37,7 @@ from sound import Voice
 from servercommon import srvError
 from user import User
 from game import PlayingGame
+from hand import HandEvaluations
 
 if os.name != 'nt':
     import resource
@@ -56,6 +60,8 @@ class ServerGame(PlayingGame):
             playOpen,
             autoPlay)
         self.shouldSave = True
+        # our robot clients evaluate the same hands
+        self.handEvaluations = HandEvaluations()
 
     def throwDices(self):
         """set random living and kongBox
@@ -68,6 +74,9 @@ class ServerGame(PlayingGame):
         """Happens only on server: every player gets 13 tiles (including east)"""
         self.throwDices()
         self.wall.divide()
+        if Debug.hand:
+            self.debug(str(self.handEvaluations))
+        self.handEvaluations.clear()
         for player in self.players:
             player.clearHand()
             # 13 tiles at least, with names as given by wall
@@ -98,9 +107,15 @@ class ServerTable(Table, StrMixin):
         self.server = server
         self.owner = owner
         self.users = [owner] if owner else []
+        if owner:
+            server.seated(owner, self)
         self.remotes = {}   # maps client connections to users
         self.game = None
         self.client = None
+        self.admitted = False  # the server let us start
+        self.admittedAt = None
+        self.cpuSeconds = 0.0  # spent in moved and processAnswers
+        self.__cpuNesting = 0
         server.tables[self.tableid] = self
         if Debug.table:
             logDebug('new table %s' % self)
@@ -158,6 +173,7 @@ class ServerTable(Table, StrMixin):
         if len(self.users) == self.maxSeats():
             raise srvError(pb.Error, i18nE('All seats are already taken'))
         self.users.append(user)
+        self.server.seated(user, self)
         if Debug.table:
             logDebug('%s seated on table %s' % (user.name, self))
         self.sendChatMessage(ChatMessage(self.tableid, user.name,
@@ -168,6 +184,7 @@ class ServerTable(Table, StrMixin):
         if user in self.users:
             self.running = False
             self.users.remove(user)
+            self.server.unseated(user, self)
             self.sendChatMessage(ChatMessage(self.tableid, user.name,
                                              i18nE('leaves the table'), isStatusMessage=True))
             if user is self.owner:
@@ -413,15 +430,19 @@ class ServerTable(Table, StrMixin):
             if request.answer == Message.ClientWantsVoiceData:
                 # another human player requests sounds for voiceId
                 voiceId = request.args[0]
+                # the client may already have a part of it
+                offset = request.args[1] if len(request.args) > 1 else 0
                 voiceFor = [x for x in self.game.players if isinstance(self.remotes[x], User)
                             and self.remotes[x].voiceId == voiceId][0]
-                voiceFor.voice = Voice(voiceId)
+                alreadyAsked = any(x[1] is voiceFor for x in voiceDataRequests)
+                if not alreadyAsked:
+                    voiceFor.voice = Voice(voiceId)
                 if Debug.sound:
                     logDebug(
-                        'client %s wants voice data %s for %s' %
-                        (request.user.name, request.args[0], voiceFor))
-                voiceDataRequests.append((request.user, voiceFor))
-                if not voiceFor.voice.oggFiles():
+                        'client %s wants voice data %s for %s from offset %d' %
+                        (request.user.name, request.args[0], voiceFor, offset))
+                voiceDataRequests.append((request.user, voiceFor, offset))
+                if not alreadyAsked and not voiceFor.voice.oggFiles():
                     # the server does not have it, ask the client with that
                     # voice
                     block.tell(
@@ -433,26 +454,59 @@ class ServerTable(Table, StrMixin):
     def sendVoiceData(self, requests, voiceDataRequests):
         """sends voice sounds to other human players"""
         self.processAnswers(requests)
-        block = DeferredBlock(self)
-        for voiceDataRequester, voiceFor in voiceDataRequests:
+        transfers = []
+        for voiceDataRequester, voiceFor, offset in voiceDataRequests:
             # this player requested sounds for voiceFor
             voice = voiceFor.voice
-            content = voice.archiveContent
-            if content:
+            if voice.archiveSize():
                 if Debug.sound:
                     logDebug(
                         'server got voice data %s for %s from client' %
                         (voiceFor.voice, voiceFor.name))
-                block.tell(
-                    voiceFor,
-                    voiceDataRequester,
-                    Message.VoiceData,
-                    md5sum=voice.md5sum,
-                    source=content)
+                # the first chunk tells the digest of the archive
+                transfers.append([voiceDataRequester, voiceFor, offset, True, False])
             elif Debug.sound:
                 logDebug('server got empty voice data %s for %s from client' % (
                     voice, voiceFor.name))
-        block.callback(self.assignVoices)
+        self.sendVoiceChunks(None, transfers)
+
+    def sendVoiceChunks(self, requests, transfers):
+        """send the next chunk for all unfinished transfers. Only one
+        chunk per transfer is underway, so we never hold a whole archive.
+        A client may ask once per transfer to start again"""
+        if requests:
+            restarts = [x for x in requests if x.answer == Message.ClientWantsVoiceData]
+            for request in restarts:
+                for transfer in transfers:
+                    if transfer[0] is request.user and transfer[1].voice.md5sum == request.args[0]:
+                        if transfer[4]:
+                            logWarning('%s: voice data %s is still unusable, giving up' % (
+                                request.user.name, request.args[0]))
+                            transfer[2] = transfer[1].voice.archiveSize()
+                        else:
+                            transfer[2:] = [request.args[1], True, True]
+            self.processAnswers([x for x in requests if x.answer != Message.ClientWantsVoiceData])
+        transfers = [x for x in transfers if x[2] < x[1].voice.archiveSize()]
+        if not transfers:
+            self.assignVoices()
+            return
+        block = DeferredBlock(self)
+        for transfer in transfers:
+            voiceDataRequester, voiceFor, offset, withDigest, _ = transfer
+            voice = voiceFor.voice
+            chunk = voice.archiveChunk(offset)
+            block.tell(
+                voiceFor,
+                voiceDataRequester,
+                Message.VoiceData,
+                md5sum=voice.md5sum,
+                source=b64encode(chunk).decode('ascii'),
+                offset=offset,
+                size=voice.archiveSize(),
+                archiveDigest=voice.archiveDigest() if withDigest else None)
+            transfer[2] += len(chunk)
+            transfer[3] = False
+        block.callback(self.sendVoiceChunks, transfers)
 
     def assignVoices(self, unusedResults=None):
         """now all human players have all voice data needed"""
@@ -508,15 +562,15 @@ class ServerTable(Table, StrMixin):
                 'player %s discarded %s but does not have it' %
                 (player, tile))
             return
-        dangerousText = self.game.dangerousFor(player, tile)
+        dangerousReasons = self.game.dangerousFor(player, tile)
         mustPlayDangerous = player.mustPlayDangerous()
         violates = player.violatesOriginalCall(tile)
         self.game.hasDiscarded(player, tile)
         block = DeferredBlock(self)
         block.tellAll(player, Message.Discard, tile=tile)
-        block.callback(self._clientDiscarded2, msg, dangerousText, mustPlayDangerous, violates)
+        block.callback(self._clientDiscarded2, msg, dangerousReasons, mustPlayDangerous, violates)
 
-    def _clientDiscarded2(self, unusedResults, msg, dangerousText, mustPlayDangerous, violates):
+    def _clientDiscarded2(self, unusedResults, msg, dangerousReasons, mustPlayDangerous, violates):
         """client told us he discarded a tile. Continue, check for violating original call"""
         block = DeferredBlock(self)
         player = msg.player
@@ -526,9 +580,9 @@ class ServerTable(Table, StrMixin):
                 logDebug('%s just violated OC with %s' % (player, tile))
             player.mayWin = False
             block.tellAll(player, Message.ViolatesOriginalCall)
-        block.callback(self._clientDiscarded3, msg, dangerousText, mustPlayDangerous)
+        block.callback(self._clientDiscarded3, msg, dangerousReasons, mustPlayDangerous)
 
-    def _clientDiscarded3(self, unusedResults, msg, dangerousText, mustPlayDangerous):
+    def _clientDiscarded3(self, unusedResults, msg, dangerousReasons, mustPlayDangerous):
         """client told us he discarded a tile. Continue, check for calling"""
         block = DeferredBlock(self)
         player = msg.player
@@ -536,18 +590,19 @@ class ServerTable(Table, StrMixin):
             if player.hand.callingHands:
                 player.isCalling = True
                 block.tellAll(player, Message.Calling)
-        block.callback(self._clientDiscarded4, msg, dangerousText, mustPlayDangerous)
+        block.callback(self._clientDiscarded4, msg, dangerousReasons, mustPlayDangerous)
 
-    def _clientDiscarded4(self, unusedResults, msg, dangerousText, mustPlayDangerous):
+    def _clientDiscarded4(self, unusedResults, msg, dangerousReasons, mustPlayDangerous):
         """client told us he discarded a tile. Continue, check for dangerous game"""
         block = DeferredBlock(self)
         player = msg.player
-        if dangerousText:
+        if dangerousReasons:
             if mustPlayDangerous and not player.lastSource.isDiscarded:
                 if Debug.dangerousGame:
                     tile = Tile(msg.args[0])
                     logDebug('%s claims no choice. Discarded %s, keeping %s. %s' %
-                             (player, tile, ''.join(player.concealedTiles), ' / '.join(dangerousText)))
+                             (player, tile, ''.join(player.concealedTiles),
+                              ' / '.join(Dangerous.texts(dangerousReasons))))
                 player.claimedNoChoice = True
                 block.tellAll(
                     player,
@@ -558,7 +613,8 @@ class ServerTable(Table, StrMixin):
                 if Debug.dangerousGame:
                     tile = Tile(msg.args[0])
                     logDebug('%s played dangerous. Discarded %s, keeping %s. %s' %
-                             (player, tile, ''.join(player.concealedTiles), ' / '.join(dangerousText)))
+                             (player, tile, ''.join(player.concealedTiles),
+                              ' / '.join(Dangerous.texts(dangerousReasons))))
                 block.tellAll(
                     player,
                     Message.DangerousGame,
@@ -844,8 +900,27 @@ class ServerTable(Table, StrMixin):
                 Message.AskForClaims,
                 self.moved)
 
+    def __cpuStart(self):
+        """start measuring. moved calls processAnswers, count only once"""
+        self.__cpuNesting += 1
+        return time.thread_time() if self.__cpuNesting == 1 else None
+
+    def __cpuStop(self, start):
+        """add to cpuSeconds"""
+        self.__cpuNesting -= 1
+        if start is not None:
+            self.cpuSeconds += time.thread_time() - start
+
     def processAnswers(self, requests):
         """a player did something"""
+        start = self.__cpuStart()
+        try:
+            return self.__processAnswers(requests)
+        finally:
+            self.__cpuStop(start)
+
+    def __processAnswers(self, requests):
+        """see processAnswers"""
         if not self.running:
             return None
         answers = self.prioritize(requests)
@@ -866,9 +941,13 @@ class ServerTable(Table, StrMixin):
             if len(stck) > 30:
                 logDebug('stack size:%d' % len(stck))
                 logDebug(stck)
-        answers = self.processAnswers(requests)
-        if not answers:
-            self.nextTurn()
+        start = self.__cpuStart()
+        try:
+            answers = self.processAnswers(requests)
+            if not answers:
+                self.nextTurn()
+        finally:
+            self.__cpuStop(start)
 
     def tellAll(self, player, command, callback=None, **kwargs):
         """tell something about player to all players"""
@@ -8,19 +8,22 @@ SPDX-License-Identifier: GPL-2.0
 """
 
 import os
+import shutil
 import tarfile
 import subprocess
 import datetime
 from io import BytesIO
 from hashlib import md5
+from glob import glob, escape
 
-from common import Debug, Internal, StrMixin, cacheDir
+from common import Debug, Internal, Options, StrMixin, cacheDir
 from util import which, removeIfExists, uniqueList, elapsedSince
 from log import logWarning, i18n, logDebug, logException
 
 from qt import QStandardPaths
 
 from tile import Tile
+from audio import AudioEngine
 
         # Phonon does not work with short files - it plays them
         # simultaneously or only parts of them. Mar 2010, KDE 4.4. True for mp3
@@ -42,6 +45,7 @@ class Sound:
     thusly ensuring no two instances try to speak"""
     __oggBinary = None
     __bonusOgg = None
+    __engine = None
     playProcesses = []
     lastCleaned = None
 
@@ -69,6 +73,25 @@ class Sound:
                 logDebug('ogg123 found:' + Sound.__oggBinary)
         return Sound.__oggBinary
 
+    @staticmethod
+    def engine():
+        """the AudioEngine or None if we have to start a process for every sound"""
+        if Sound.__engine is None:
+            Sound.__engine = False
+            if Options.audio == 'null':
+                # plays nothing, so it does not need the ogg binary
+                Sound.__engine = AudioEngine.create(Options.audio, None)
+            else:
+                oggBinary = Sound.findOggBinary()
+                if oggBinary and os.name != 'nt' and Options.audio != 'ogg123':
+                    Sound.__engine = AudioEngine.create(Options.audio, oggBinary) or False
+                    if Sound.__engine:
+                        Sound.__engine.fallback = Sound.__startProcess
+            if Debug.sound:
+                logDebug('AudioEngine: {}'.format(
+                    Sound.__engine.sink.name if Sound.__engine else 'none'))
+        return Sound.__engine
+
     @staticmethod
     def cleanProcesses():
         """terminate ogg123 children"""
@@ -101,17 +124,30 @@ class Sound:
     @staticmethod
     def speak(what):
         """this is what the user of this module will call."""
-        # pylint: disable=too-many-branches
         if not Internal.Preferences.useSounds:
             return
         game = Internal.scene.game
+        engine = Sound.engine()
+        if engine:
+            # the engine queues when a human plays and mixes in demo mode.
+            # What it cannot read is played by ogg123
+            if os.path.exists(what) and not engine.speak(what, mix=bool(game and game.autoPlay)):
+                Sound.__startProcess(what)
+            return
+        Sound.__startProcess(what)
+
+    @staticmethod
+    def __startProcess(what):
+        """play what with ogg123, one process per sound"""
+        # pylint: disable=too-many-branches
+        game = Internal.scene.game
         reactor = Internal.reactor
         if game and not game.autoPlay and Sound.playProcesses:
             # in normal play, wait a moment between two speaks. Otherwise
             # sometimes too many simultaneous speaks make them ununderstandable
             lastSpeakStart = max(x.startTime for x in Sound.playProcesses)
             if elapsedSince(lastSpeakStart) < 0.3:
-                reactor.callLater(1, Sound.speak, what)
+                reactor.callLater(1, Sound.__startProcess, what)
                 return
         if os.path.exists(what):
             oggBinary = Sound.findOggBinary()
@@ -175,12 +211,18 @@ class Voice(StrMixin):
     """this administers voice sounds.
 
     When transporting voices between players, a compressed tarfile
-    is generated at source and transferred to destination. At
-    destination, no tarfile is written, only the content. It makes
+    is generated at source and transferred to destination in chunks
+    of chunkSize. At destination, the chunks are collected in a partial
+    file named by the md5sum and the digest of the tarfile, so an
+    interrupted transfer can be resumed unless the tarfile changed.
+    When complete, only the content is kept in a directory named by
+    the md5sum, so every voice is only transferred once. It makes
     only sense to cache the voice in a tarfile at source."""
 
     __availableVoices = []
+    __md5sums = {}  # directory: (signature of ogg files, md5sum)
     md5sumLength = 32 # magical constant
+    chunkSize = 256 * 1024  # twisted pb limits the size of a message
 
     def __init__(self, directory, content=None):
         """give this name a voice"""
@@ -259,6 +301,12 @@ class Voice(StrMixin):
                         'locate found %s by name in %s' %
                         (name, voice.directory))
                 return voice
+        if len(name) == Voice.md5sumLength:
+            received = Voice(name)
+            if received.oggFiles():
+                if Debug.sound:
+                    logDebug('locate found %s in %s' % (name, received.directory))
+                return received
         if Debug.sound:
             logDebug('Personal sound for %s not found' % (name))
         return None
@@ -335,12 +383,25 @@ class Voice(StrMixin):
             self.__md5sum = None
             logDebug('no ogg files in %s' % self)
             return
-        md5sum = md5()
+        signature = []
         for oggFile in ogg:
-            md5sum.update(
-                open(os.path.join(self.directory, oggFile), 'rb').read())
-        # the md5 stamp goes into the old archive directory 'username'
-        self.__md5sum = md5sum.hexdigest()
+            stat = os.stat(os.path.join(self.directory, oggFile))
+            signature.append((oggFile, stat.st_size, stat.st_mtime_ns))
+        signature = tuple(signature)
+        cached = Voice.__md5sums.get(self.directory)
+        if cached and cached[0] == signature:
+            self.__md5sum = cached[1]
+        else:
+            md5sum = md5()
+            for oggFile in ogg:
+                with open(os.path.join(self.directory, oggFile), 'rb') as inFile:
+                    block = inFile.read(self.chunkSize)
+                    while block:
+                        md5sum.update(block)
+                        block = inFile.read(self.chunkSize)
+            # the md5 stamp goes into the old archive directory 'username'
+            self.__md5sum = md5sum.hexdigest()
+            Voice.__md5sums[self.directory] = (signature, self.__md5sum)
         existingMd5sum = self.savedmd5Sum()
         md5Name = self.md5FileName()
         if self.__md5sum != existingMd5sum:
@@ -413,12 +474,16 @@ class Voice(StrMixin):
         if not os.path.exists(self.directory):
             os.makedirs(self.directory)
         filelike = BytesIO(content)
-        tarFile = tarfile.open(mode='r|bz2', fileobj=filelike)
+        self.__extract(filelike)
+        filelike.close()
+
+    def __extract(self, fileobj):
+        """extract the archive from fileobj into our directory"""
+        tarFile = tarfile.open(mode='r|bz2', fileobj=fileobj)
         tarFile.extractall(path=self.directory)
         if Debug.sound:
             logDebug('extracted archive into %s' % self.directory)
         tarFile.close()
-        filelike.close()
 
     @property
     def archiveContent(self):
@@ -432,3 +497,101 @@ class Voice(StrMixin):
     def archiveContent(self, content):
         """new archive content"""
         self.__setArchiveContent(content)
+
+    def archiveSize(self):
+        """the size of the tarfile, 0 if there is none"""
+        self.__buildArchive()
+        if os.path.exists(self.archiveName()):
+            return os.path.getsize(self.archiveName())
+        return 0
+
+    def archiveDigest(self):
+        """the md5sum of the tarfile. Unlike md5sum, this changes
+        whenever the tarfile is built again"""
+        self.__buildArchive()
+        result = md5()
+        with open(self.archiveName(), 'rb') as archive:
+            for block in iter(lambda: archive.read(self.chunkSize), b''):
+                result.update(block)
+        return result.hexdigest()
+
+    def archiveChunk(self, offset):
+        """at most chunkSize bytes of the tarfile, starting at offset"""
+        self.__buildArchive()
+        with open(self.archiveName(), 'rb') as archive:
+            archive.seek(offset)
+            return archive.read(self.chunkSize)
+
+    @staticmethod
+    def partialName(md5sum, archiveDigest):
+        """the file collecting the chunks of a voice transfer"""
+        return os.path.join(cacheDir(), '{}-{}.part'.format(md5sum, archiveDigest))
+
+    @staticmethod
+    def __partialNames(md5sum):
+        """the partial files for md5sum, there should be at most one"""
+        return glob(os.path.join(escape(cacheDir()), md5sum + '-*.part'))
+
+    @staticmethod
+    def partialSize(md5sum):
+        """how much we already got, so the transfer can resume there"""
+        partialNames = Voice.__partialNames(md5sum)
+        if len(partialNames) == 1:
+            return os.path.getsize(partialNames[0])
+        for partialName in partialNames:
+            os.remove(partialName)
+        return 0
+
+    @staticmethod
+    def receiveChunk(md5sum, offset, chunk, size, archiveDigest=None):
+        """store a chunk of the tarfile. The first chunk of a transfer
+        comes with archiveDigest. If the tarfile is complete, verify and
+        extract it and return the Voice. Return None if more chunks are
+        needed and False if the transfer must start again at offset 0"""
+        partialNames = Voice.__partialNames(md5sum)
+        if archiveDigest:
+            partialName = Voice.partialName(md5sum, archiveDigest)
+            for stale in partialNames:
+                if stale != partialName:
+                    # the tarfile has been built again since
+                    os.remove(stale)
+        elif len(partialNames) == 1:
+            partialName = partialNames[0]
+        else:
+            logWarning('voice data %s: got offset %d but do not know the archive' % (md5sum, offset))
+            for partialName in partialNames:
+                os.remove(partialName)
+            return False
+        have = os.path.getsize(partialName) if os.path.exists(partialName) else 0
+        if offset > have:
+            logWarning('voice data %s: got offset %d but have only %d bytes' % (
+                md5sum, offset, have))
+            removeIfExists(partialName)
+            return False
+        with open(partialName, 'ab') as partial:
+            partial.truncate(offset)
+            partial.write(chunk)
+        if offset + len(chunk) < size:
+            return None
+        digest = md5()
+        with open(partialName, 'rb') as partial:
+            for block in iter(lambda: partial.read(Voice.chunkSize), b''):
+                digest.update(block)
+        if partialName != Voice.partialName(md5sum, digest.hexdigest()):
+            logWarning('voice data %s: %s has the wrong checksum %s' % (
+                md5sum, partialName, digest.hexdigest()))
+            os.remove(partialName)
+            return False
+        voice = Voice(md5sum)
+        if not os.path.exists(voice.directory):
+            os.makedirs(voice.directory)
+        try:
+            with open(partialName, 'rb') as partial:
+                voice.__extract(partial)
+        except tarfile.TarError as exc:
+            logWarning('voice data %s: cannot extract %s: %s' % (md5sum, partialName, exc))
+            shutil.rmtree(voice.directory, ignore_errors=True)
+            return False
+        finally:
+            os.remove(partialName)
+        return voice
@@ -235,6 +235,8 @@ class TileList(list):
 
     """a list that can only hold tiles"""
 
+    __slots__ = ('isRest', )
+
     def __init__(self, newContent=None):
         list.__init__(self)
         if newContent is None:
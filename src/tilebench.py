@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2009-2016 Wolfgang Rohdewald <wolfgang@rohdewald.de>
+
+SPDX-License-Identifier: GPL-2.0
+
+Measure how fast tiles are painted: render a board full of tiles
+without a window, once painting every tile directly from the SVG
+and once copying them from the tile atlas of the tileset.
+
+Every frame invalidates the pixmap Qt caches for each tile, like a
+resize of the window or a change of the light source does.
+"""
+
+import os
+import sys
+import time
+from optparse import OptionParser
+
+from common import Debug, Internal
+
+
+def parse_options():
+    """parse options"""
+    parser = OptionParser(usage='%prog [options]\n'
+                          'paints tiles offscreen, with and without the tile atlas')
+    parser.add_option(
+        '', '--frames', dest='frames',
+        help='render FRAMES frames for each method. Default is 50',
+        metavar='FRAMES', type=int, default=50)
+    parser.add_option(
+        '', '--size', dest='size',
+        help='render frames with WIDTHxHEIGHT pixels. Default is 1200x900',
+        metavar='WIDTHxHEIGHT', default='1200x900')
+    parser.add_option(
+        '', '--scale', dest='scale',
+        help='scale the board by SCALE. Default is 0.4',
+        metavar='SCALE', type=float, default=0.4)
+    parser.add_option(
+        '', '--noshadows', dest='noShadows', action='store_true',
+        default=False, help='paint tiles without borders and shadows')
+    parser.add_option(
+        '', '--debug', dest='debug',
+        help=Debug.help())
+    return parser.parse_args()
+
+
+class TileBench:
+
+    """a scene with a board full of tiles"""
+
+    def __init__(self, width, height, scale):
+        # pylint: disable=import-outside-toplevel
+        from qt import QImage
+        from tileset import Tileset
+        from uitile import UITile
+        from board import Board
+        from scene import SceneWithFocusRect
+        from tile import elements
+        self.image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+        self.scene = SceneWithFocusRect()
+        self.tileset = Tileset.current()
+        self.board = Board(18, 8, self.tileset)
+        self.board.setScale(scale)
+        self.scene.addItem(self.board)
+        names = sorted(elements.occurrence)
+        self.uiTiles = []
+        for idx in range(144):
+            uiTile = UITile(names[idx % len(names)])
+            uiTile.setBoard(self.board, idx % 18, idx // 18)
+            uiTile.dark = idx % 5 == 0
+            self.uiTiles.append(uiTile)
+
+    def frame(self):
+        """render one frame"""
+        # pylint: disable=import-outside-toplevel
+        from qt import QPainter, Qt, QRectF
+        for uiTile in self.uiTiles:
+            uiTile.update()
+        self.image.fill(Qt.transparent)
+        painter = QPainter(self.image)
+        self.scene.render(
+            painter, QRectF(self.image.rect()),
+            QRectF(self.image.rect()))
+        painter.end()
+
+    def measure(self, frames, noAtlas):
+        """returns frames per second"""
+        Debug.noAtlas = noAtlas
+        self.tileset.atlas.clear()
+        self.frame()
+        start = time.time()
+        for _ in range(frames):
+            self.frame()
+        return frames / (time.time() - start)
+
+
+def main():
+    """measure both ways"""
+    options, _ = parse_options()
+    if options.debug:
+        errorMessage = Debug.setOptions(options.debug)
+        if errorMessage:
+            print(errorMessage)
+            sys.exit(2)
+    try:
+        width, height = (int(x) for x in options.size.split('x'))
+    except ValueError:
+        raise SystemExit('--size: WIDTHxHEIGHT expected, got %s' % options.size)
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    # pylint: disable=import-outside-toplevel
+    from qt import QApplication
+    Internal.app = QApplication(sys.argv[:1])
+    from config import SetupPreferences
+    SetupPreferences()
+    Internal.Preferences.showShadows = not options.noShadows
+    bench = TileBench(width, height, options.scale)
+    direct = bench.measure(options.frames, noAtlas=True)
+    atlas = bench.measure(options.frames, noAtlas=False)
+    print('tileset {}, {}x{} pixels, scale {}, {}'.format(
+        bench.tileset.desktopFileName, width, height, options.scale,
+        'without shadows' if options.noShadows else 'with shadows'))
+    print('painted from SVG: {:8.1f} frames per second'.format(direct))
+    print('copied from atlas:{:8.1f} frames per second'.format(atlas))
+    print(bench.tileset.atlas)
+
+if __name__ == '__main__':
+    main()
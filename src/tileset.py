@@ -12,14 +12,77 @@ SPDX-License-Identifier: GPL-2.0
 
 """
 
-from qt import QSizeF, QSvgRenderer
-from log import logException, i18n
+from collections import OrderedDict
+
+from qt import Qt, QSizeF, QSvgRenderer, QPixmap, QPainter
+from log import logException, logDebug, i18n
 from mjresource import Resource
 
-from common import LIGHTSOURCES, Internal
+from common import LIGHTSOURCES, Internal, Debug
 from wind import East, South, West, North
 
 
+class TileAtlas:
+
+    """pixmaps of tiles as they appear on the screen, rendered from
+    the SVG only once for every combination of element, face, darkness,
+    light source and size in device pixels. The caller puts all of that
+    into the key. Holds at most maxCount pixmaps, dropping the least
+    recently used ones"""
+
+    maxCount = 1000
+
+    def __init__(self):
+        self.__pixmaps = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.__pixmaps)
+
+    def pixmap(self, key, size, render, devicePixelRatio=1.0):
+        """the pixmap for key. If we do not have it yet, render(painter)
+        paints it into a transparent pixmap of QSize size in device pixels"""
+        result = self.__pixmaps.get(key)
+        if result is not None:
+            self.hits += 1
+            self.__pixmaps.move_to_end(key)
+            return result
+        self.misses += 1
+        result = QPixmap(size)
+        result.fill(Qt.transparent)
+        painter = QPainter(result)
+        if not painter.isActive():
+            logException(
+                'painter is not active. Wanted size: %s' %
+                str(size))
+        try:
+            render(painter)
+        finally:
+            painter.end()
+        # not before painting: QPainter would scale by it, but render
+        # already paints in device pixels
+        result.setDevicePixelRatio(devicePixelRatio)
+        self.__pixmaps[key] = result
+        if len(self.__pixmaps) > self.maxCount:
+            self.__pixmaps.popitem(last=False)
+        return result
+
+    def byteCount(self):
+        """how much memory our pixmaps need"""
+        return sum(x.width() * x.height() * x.depth() // 8 for x in self.__pixmaps.values())
+
+    def clear(self):
+        """forget all pixmaps"""
+        if Debug.graphics and self.__pixmaps:
+            logDebug(str(self))
+        self.__pixmaps.clear()
+
+    def __str__(self):
+        return 'TileAtlas: {} pixmaps, {} hits, {} misses'.format(
+            len(self), self.hits, self.misses)
+
+
 class Tileset(Resource):
 
     """represents a complete tileset"""
@@ -36,6 +99,7 @@ class Tileset(Resource):
         self.faceSize = None
         self.__renderer = None
         self.__shadowOffsets = None
+        self.atlas = TileAtlas()
         self.darkenerAlpha = 120 if self.desktopFileName == 'jade' else 50
 
         graphName = self.group.readEntry("FileName")
@@ -68,6 +132,13 @@ class Tileset(Resource):
         """the currently wanted tileset. If not yet defined, do so"""
         return Tileset(Internal.Preferences.tilesetName)
 
+    @staticmethod
+    def clearAtlases():
+        """the view changed its size, so tiles will never again be
+        painted with most of the sizes we have"""
+        for tileset in set(Tileset.cache.values()):
+            tileset.atlas.clear()
+
     def shadowWidth(self):
         """the size of border plus shadow"""
         return self.tileSize.width() - self.faceSize.width()
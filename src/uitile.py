@@ -7,17 +7,19 @@ SPDX-License-Identifier: GPL-2.0
 
 """
 
-from qt import Qt, QRectF, QPointF, QSizeF, QSize
-from qt import QGraphicsObject, QGraphicsItem, QPixmap, QPainter, QColor
+from math import ceil
+
+from qt import Qt, QRectF, QPointF, QSizeF, QSize, QTransform
+from qt import QGraphicsObject, QGraphicsItem, QPainter, QColor
 
 from util import stack
-from log import logException, logDebug, id4
+from log import logDebug, id4
 from guiutil import Painter, sceneRotation
 from common import LIGHTSOURCES, ZValues, Internal, Debug
 from common import StrMixin, isAlive
 from tile import Tile
 from meld import Meld
-from animation import AnimatedMixin
+from animation import AnimatedMixin, LayoutScheduler
 
 
 class UITile(AnimatedMixin, QGraphicsObject, StrMixin):
@@ -175,9 +177,51 @@ class UITile(AnimatedMixin, QGraphicsObject, StrMixin):
         return "TILE_{}".format(lightSourceIndex % 4 + 1)
 
     def paint(self, painter, unusedOption, unusedWidget=None):
-        """paint the entire tile.
-        I tried to cache a pixmap for the tile and darkener but without face,
-        but that actually made it slower."""
+        """paint the entire tile. The tileset renders every variant only
+        once for every scale and rotation, here we just copy it to the
+        device pixels the tile covers"""
+        if Internal.sceneStats:
+            Internal.sceneStats.painted(self)
+        # deviceTransform maps to device pixels, on HiDPI screens a
+        # logical pixel covers more than one
+        dpr = painter.device().devicePixelRatioF()
+        transform = painter.deviceTransform()
+        if Debug.noAtlas or not transform.isAffine():
+            self.__renderTile(painter)
+        else:
+            linear = QTransform(transform.m11(), transform.m12(), transform.m21(), transform.m22(), 0, 0)
+            pixmapRect = linear.mapRect(self.boundingRect())
+            pmapSize = QSize(int(ceil(pixmapRect.width())), int(ceil(pixmapRect.height())))
+            if pmapSize.isEmpty():
+                return
+            linear *= QTransform.fromTranslate(-pixmapRect.left(), -pixmapRect.top())
+            key = self.__atlasKey(Internal.Preferences.showShadows) + tuple(
+                round(x, 4) for x in (linear.m11(), linear.m12(), linear.m21(), linear.m22(), dpr))
+
+            def render(pmapPainter):
+                """paint the tile like the view would"""
+                pmapPainter.setRenderHints(painter.renderHints())
+                pmapPainter.setWorldTransform(linear)
+                self.__renderTile(pmapPainter)
+            pixmap = self.tileset.atlas.pixmap(key, pmapSize, render, dpr)
+            deviceTopLeft = transform.mapRect(self.boundingRect()).topLeft()
+            with Painter(painter):
+                painter.setViewTransformEnabled(False)
+                painter.setWorldTransform(QTransform())
+                painter.drawPixmap(
+                    QPointF(round(deviceTopLeft.x()) / dpr, round(deviceTopLeft.y()) / dpr), pixmap)
+        if self.cross:
+            self.__paintCross(painter)
+
+    def __atlasKey(self, withBorders):
+        """everything the rendered tile depends on except the tileset and the size"""
+        return (
+            withBorders, self.__elementId(withBorders),
+            self.tileset.svgName[str(self.tile.exposed)] if self.showFace() else None,
+            self.dark, self.facePos(withBorders).x(), self.facePos(withBorders).y())
+
+    def __renderTile(self, painter):
+        """paint the tile from the SVG: body, darkener, face"""
         with Painter(painter):
             renderer = self.tileset.renderer()
             withBorders = Internal.Preferences.showShadows
@@ -196,8 +240,6 @@ class UITile(AnimatedMixin, QGraphicsObject, StrMixin):
                     renderer.render(
                         painter, self.tileset.svgName[str(self.tile.exposed)],
                         self.boundingRect())
-        if self.cross:
-            self.__paintCross(painter)
 
     def __paintCross(self, painter):
         """paint a cross on the tile"""
@@ -214,17 +256,16 @@ class UITile(AnimatedMixin, QGraphicsObject, StrMixin):
         and optional borders/shadows"""
         if withBorders is None:
             withBorders = Internal.Preferences.showShadows
+        key = ('svg', ) + self.__atlasKey(withBorders) + (pmapSize.width(), pmapSize.height())
+        return self.tileset.atlas.pixmap(
+            key, pmapSize, lambda painter: self.__renderPixmap(painter, pmapSize, withBorders))
+
+    def __renderPixmap(self, painter, pmapSize, withBorders):
+        """paint the tile for pixmapFromSvg"""
         if withBorders:
             originalSize = self.tileset.tileSize.toSize()
         else:
             originalSize = self.tileset.faceSize.toSize()
-        result = QPixmap(pmapSize)
-        result.fill(Qt.transparent)
-        painter = QPainter(result)
-        if not painter.isActive():
-            logException(
-                'painter is not active. Wanted size: %s' %
-                str(pmapSize))
         try:
             xScale = float(pmapSize.width()) / originalSize.width()
             yScale = float(pmapSize.height()) / originalSize.height()
@@ -247,7 +288,6 @@ class UITile(AnimatedMixin, QGraphicsObject, StrMixin):
             painter.translate(self.facePos(withBorders))
             renderer.render(painter, self.tileset.svgName[self.tile.exposed],
                             QRectF(QPointF(), QSizeF(faceSize)))
-        return result
 
     def _drawDarkness(self, painter):
         """if appropriate, make tiles darker. Mainly used for hidden tiles"""
@@ -274,6 +314,9 @@ class UITile(AnimatedMixin, QGraphicsObject, StrMixin):
         """change Position of tile in board"""
         placeDirty = False
         if self.__board != board:
+            # both boards must be up to date before a tile moves between them
+            LayoutScheduler.flush(self.__board)
+            LayoutScheduler.flush(board)
             oldBoard = self.__board
             self.__board = board
             if oldBoard:
@@ -304,7 +347,8 @@ class UITile(AnimatedMixin, QGraphicsObject, StrMixin):
     def tile(self, value):  # pylint: disable=arguments-differ
         """set tile name and update display"""
         if value is not self._tile:
-            assert not self._tile.isKnown or (self._tile.exposed == value.exposed)
+            # a known tile may only be hidden again, see UIWall.build
+            assert not value.isKnown or not self._tile.isKnown or (self._tile.exposed == value.exposed)
             self._tile = value
             self.setDrawingOrder() # because known tiles are above unknown tiles
             self.update()
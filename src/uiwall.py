@@ -20,6 +20,7 @@ from tileset import Tileset
 from uitile import UITile
 from animation import animate, afterQueuedAnimations, AnimationSpeed
 from animation import ParallelAnimationGroup, AnimatedMixin, animateAndDo
+from scenestats import timed
 
 
 class SideText(AnimatedMixin, QGraphicsObject, StrMixin, DrawOnTopMixin):
@@ -312,6 +313,7 @@ class UIWall(Wall):
             uiTile.dark = True
             uiTile.setBoard(discardBoard, *places[idx])
 
+    @timed('UIWall.build')
     def build(self, shuffleFirst=False):
         """builds the wall without dividing"""
         # recycle used tiles
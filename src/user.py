@@ -75,6 +75,9 @@ class User(pb.Avatar, StrMixin):
         self.voiceId = voiceId
         self.maxGameId = maxGameId
         serverVersion = str(Internal.defaultPort)
+        if clientVersion is not None:
+            # the client sends its Internal.defaultPort
+            clientVersion = str(clientVersion)
         if clientVersion != serverVersion:
             # we assume that versions x.y.* are compatible
             if clientVersion is None: